@@ -0,0 +1,66 @@
+"""
+Benchmarks
+Each benchmark runs its variants in a fresh process and reports wall time, throughput, and peak resident memory.
+Run all benchmarks with `python -m benchmarks`
+"""
+import time
+import random
+import pathlib
+import resource
+import multiprocessing
+from typing import Callable
+
+_context = multiprocessing.get_context('spawn')
+
+genome_path = pathlib.Path(__file__).parent.parent / 'test-data' / 'no_seq.gbff'
+
+
+def sequenced_records() -> list:
+    """
+    Records of the test genome, with a random sequence in place of the missing one
+    :return: list of SeqRecords
+    """
+    from Bio import SeqIO
+    from Bio.Seq import Seq
+    rand = random.Random(0)
+    records = list(SeqIO.parse(str(genome_path), 'genbank'))
+    for record in records:
+        record.seq = Seq(''.join(rand.choices('ACGT', k=len(record.seq))))
+    return records
+
+
+def _run(func: Callable, args: tuple, queue):
+    """
+    Child process entry point for measure()
+    """
+    start = time.perf_counter()
+    count = func(*args)
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, count, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def measure(func: Callable, *args) -> tuple:
+    """
+    Run func(*args) in a fresh process
+    :param func: module level function returning the number of items processed
+    :param args: arguments to pass to func
+    :return: (seconds, items, peak RSS in KiB)
+    """
+    queue = _context.Queue()
+    process = _context.Process(target=_run, args=(func, args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def report(name: str, seconds: float, items: int, maxrss: int, unit: str = 'records'):
+    """
+    Print a line of benchmark results
+    :param name: benchmark variant name
+    :param seconds: wall time
+    :param items: number of items processed
+    :param maxrss: peak RSS in KiB
+    :param unit: name of the items processed
+    """
+    print(f"{name:<40}{seconds:>10.3f}s{items / seconds if seconds else 0:>14.1f} {unit}/s{maxrss / 1024:>10.1f} MiB")
@@ -0,0 +1,12 @@
+from . import gff, shard, yaml_output, serialize, gff_output, compression, batch, query, suite
+
+if __name__ == "__main__":
+    gff.main()
+    shard.main()
+    yaml_output.main()
+    serialize.main()
+    gff_output.main()
+    compression.main()
+    batch.main()
+    query.main()
+    suite.main()
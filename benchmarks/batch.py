@@ -0,0 +1,66 @@
+"""
+Many small inputs: a biopython.convert process per input, with and without a --serve daemon, versus a single --batch run
+"""
+import os
+import sys
+import pathlib
+import time
+import tempfile
+import subprocess
+
+from . import measure, report, genome_path
+
+root = pathlib.Path(__file__).parent.parent
+
+
+def make_inputs(directory: pathlib.Path, count: int):
+    data = genome_path.read_bytes()
+    for i in range(count):
+        (directory / f"input{i}.gbff").write_bytes(data)
+
+
+def _env(socket_path: pathlib.Path) -> dict:
+    return dict(os.environ, PYTHONPATH=str(root), BIOPYTHON_CONVERT_SOCKET=str(socket_path))
+
+
+def _cli(*args, socket_path: pathlib.Path = pathlib.Path('none.sock')):
+    subprocess.run([sys.executable, '-m', 'biopython_convert', *args], env=_env(socket_path), check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def per_input(directory: pathlib.Path, count: int, socket_path: pathlib.Path = pathlib.Path('none.sock')) -> int:
+    for i in range(count):
+        _cli(str(directory / f"input{i}.gbff"), 'genbank', str(directory / f"output{i}.gff3"), 'gff3',
+             socket_path=socket_path)
+    return count
+
+
+def batched(directory: pathlib.Path, count: int, jobs: int) -> int:
+    _cli('--batch', '-j', str(jobs), str(directory / 'input*.gbff'), 'genbank', str(directory / '{stem}.gff3'),
+         'gff3')
+    return count
+
+
+def main(count: int = 50):
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = pathlib.Path(tmp)
+        make_inputs(directory, count)
+        print(f"GenBank to GFF3, {count} copies of {genome_path.name}")
+        report("process per input", *measure(per_input, directory, count, directory / 'none.sock'), unit='inputs')
+        socket_path = directory / 'daemon.sock'
+        daemon = subprocess.Popen([sys.executable, '-m', 'biopython_convert', '--serve'], env=_env(socket_path),
+                                  stderr=subprocess.DEVNULL)
+        try:
+            while not socket_path.exists():
+                time.sleep(0.1)
+            report("process per input, --serve daemon", *measure(per_input, directory, count, socket_path),
+                   unit='inputs')
+        finally:
+            daemon.terminate()
+            daemon.wait()
+        for jobs in sorted({1, os.cpu_count() or 1}):
+            report(f"--batch, {jobs} workers", *measure(batched, directory, count, jobs), unit='inputs')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,56 @@
+"""
+Compressed FASTA output and input: single threaded gzip versus BGZF with an increasing number of threads
+"""
+import os
+import sys
+import pathlib
+import tempfile
+
+from . import measure, report, sequenced_records
+
+
+def make_input(path: pathlib.Path, copies: int) -> int:
+    from Bio import SeqIO
+    SeqIO.write(sequenced_records() * copies, str(path), 'fasta')
+    return path.stat().st_size // 2**20
+
+
+def compress(path: pathlib.Path, output_path: pathlib.Path, compression: str, threads: int) -> int:
+    from biopython_convert import compression as compression_
+    with path.open('rb') as src, compression_.open_output(output_path, 'wb', compression, threads) as dst:
+        while True:
+            chunk = src.read(2**20)
+            if not chunk:
+                break
+            dst.write(chunk)
+    return path.stat().st_size // 2**20
+
+
+def decompress(path: pathlib.Path, threads: int) -> int:
+    from biopython_convert import compression
+    size = 0
+    with compression.open_input(path, 'rb', threads) as handle:
+        while True:
+            chunk = handle.read(2**20)
+            if not chunk:
+                break
+            size += len(chunk)
+    return size // 2**20
+
+
+def main(copies: int = 5):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = pathlib.Path(tmp, 'input.fasta')
+        make_input(path, copies)
+        print(f"FASTA compression, {path.stat().st_size / 2**20:.1f} MiB")
+        gzip_path = pathlib.Path(tmp, 'output.gzip.gz')
+        report("gzip compress", *measure(compress, path, gzip_path, 'gzip', 1), unit='MiB')
+        report("gzip decompress", *measure(decompress, gzip_path, 1), unit='MiB')
+        bgzf_path = pathlib.Path(tmp, 'output.bgzf.gz')
+        for threads in sorted({1, 2, 4, os.cpu_count() or 1}):
+            report(f"BGZF compress, {threads} threads", *measure(compress, path, bgzf_path, 'bgzf', threads), unit='MiB')
+            report(f"BGZF decompress, {threads} threads", *measure(decompress, bgzf_path, threads), unit='MiB')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,59 @@
+"""
+GFF3 input: streaming reader versus gffutils :memory: database
+"""
+import sys
+import pathlib
+import tempfile
+import itertools
+
+from . import measure, report
+
+input_path = pathlib.Path(__file__).parent.parent / 'test-data' / 'no_seq.gbff'
+
+
+def make_input(path: pathlib.Path, copies: int):
+    """
+    Write GFF3 of the test genome repeated under new seqids
+    :param path: output path
+    :param copies: number of times to repeat the input records
+    """
+    from Bio import SeqIO
+    from biopython_convert import gff_writer
+    records = list(SeqIO.parse(input_path, 'genbank'))
+    with path.open('w') as handle:
+        for i in range(copies):
+            for record in records:
+                record.id = f"{record.name}_{i}"
+                gff_writer((record,), handle, 'gff3')
+
+
+def read_stream(path: pathlib.Path) -> int:
+    from biopython_convert import gff
+    with path.open() as handle:
+        return sum(len(r.features) for r in gff.parse(handle))
+
+
+def read_memory_db(path: pathlib.Path) -> int:
+    import gffutils
+    from gffutils import biopython_integration
+    from gffutils.feature import feature_from_line
+    with path.open() as handle:
+        db = gffutils.create_db(map(feature_from_line, handle), ":memory:", merge_strategy="create_unique")
+    return sum(
+        len(list(features)) for _, features in itertools.groupby(
+            map(biopython_integration.to_seqfeature, db.all_features(order_by="seqid")), lambda x: x.qualifiers['seqid'][0]
+        )
+    )
+
+
+def main(copies: int = 5):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = pathlib.Path(tmp, 'input.gff3')
+        make_input(path, copies)
+        print(f"GFF3 input, {path.stat().st_size / 2**20:.1f} MiB")
+        for name, func in (('streaming reader', read_stream), ('gffutils :memory: database', read_memory_db)):
+            report(name, *measure(func, path), unit='features')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
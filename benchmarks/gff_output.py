@@ -0,0 +1,57 @@
+"""
+GFF3 output: converting each feature to a gffutils Feature versus formatting lines directly
+Times include parsing the input, given separately as a baseline.
+"""
+import sys
+import pathlib
+import tempfile
+
+from . import measure, report, genome_path
+
+
+def no_writer(records, handle):
+    pass
+
+
+def legacy_gff_writer(records, handle):
+    # biopython_convert.gff_writer before the native formatter
+    from gffutils import biopython_integration
+    for record in records:
+        for feature in record.features:
+            feature = biopython_integration.from_seqfeature(feature)
+            feature.seqid = record.id
+            feature.source = 'biopython.convert'
+            print(feature, file=handle)
+
+
+def native_gff_writer(records, handle):
+    from biopython_convert import gff
+    gff.gff_writer(records, handle, 'gff3')
+
+
+def native_directives_writer(records, handle):
+    from biopython_convert import gff
+    gff.gff_writer(records, handle, 'gff3', directives=True)
+
+
+def write(writer: str, path: pathlib.Path, copies: int) -> int:
+    from Bio import SeqIO
+    records = list(SeqIO.parse(str(genome_path), 'genbank'))
+    with path.open('w') as handle:
+        globals()[writer](records * copies, handle)
+    return sum(len(r.features) for r in records) * copies
+
+
+def main(copies: int = 10):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = pathlib.Path(tmp, 'output.gff3')
+        print(f"GFF3 output, {copies} copies of {genome_path.name}")
+        for name, writer in (('parse only', 'no_writer'),
+                             ('gffutils Feature per feature', 'legacy_gff_writer'),
+                             ('native formatter', 'native_gff_writer'),
+                             ('native formatter with directives', 'native_directives_writer')):
+            report(name, *measure(write, writer, path, copies), unit='features')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,73 @@
+"""
+JMESPath queries over synthetic records, comparing the tree-walking interpreter with compiled closures
+Records are generated before timing, so times are of the queries alone.
+"""
+import gc
+import sys
+import time
+import resource
+
+from . import report
+from .synthetic import Parameters, records
+
+queries = [
+    # (name, expression, per record)
+    ("filter records", "[?!(features[?type=='CDS' && qualifiers.pseudo])].id", False),
+    ("project features", "[*].features[?type=='CDS' && qualifiers.product].qualifiers.locus_tag[]", False),
+    ("let scope", "[*].let({rid: id}, &features[?type=='gene'].[rid, type])[]", False),
+    ("per record", "features[?type!='source'].{type: type, product: qualifiers.product[0]}", True),
+]
+
+
+def consume(value) -> int:
+    """
+    Generate every value of a result, as writing it would
+    :param value: JMESPath result
+    :return: number of values
+    """
+    from biopython_convert import JMESPathGen
+    if isinstance(value, JMESPathGen._array_types):
+        return sum(consume(v) for v in value)
+    return 1
+
+
+def timed(expression, items: list, per_record: bool, repeat: int) -> float:
+    """
+    Best time to search and consume the results of expression, with garbage collection disabled as by timeit
+    :param expression: ParsedResult
+    :param items: records to search
+    :param per_record: search each record rather than the list of records
+    :param repeat: number of repeats
+    :return: seconds
+    """
+    from biopython_convert import _jmespath_options
+    options = _jmespath_options()
+    best = float('inf')
+    for _ in range(repeat):
+        gc.disable()
+        start = time.perf_counter()
+        if per_record:
+            for item in items:
+                consume(expression.search(item, options))
+        else:
+            consume(expression.search((item for item in items), options))
+        best = min(best, time.perf_counter() - start)
+        gc.enable()
+    return best
+
+
+def main(record_count: int = 20, features: int = 5000, repeat: int = 3):
+    from biopython_convert import JMESPathGen
+    parameters = Parameters(record_count, features, 20000)
+    items = list(records(parameters))
+    feature_count = sum(len(record.features) for record in items)
+    print(f"JMESPath queries, {parameters}")
+    for name, expression, per_record in queries:
+        for variant, closures in (("interpreter", False), ("closures", True)):
+            compiled = JMESPathGen.compile(expression, closures)
+            report(f"{name} ({variant})", timed(compiled, items, per_record, repeat), feature_count,
+                   resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, unit='features')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
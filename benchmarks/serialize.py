@@ -0,0 +1,125 @@
+"""
+Conversion of records to dicts and strings, comparing the previous recursive helpers with the serializers
+Conversions are timed in this process, excluding the copying of the records needed by the previous helpers as they
+modify their input.
+"""
+import gc
+import sys
+import copy
+import time
+import types
+import resource
+from collections import OrderedDict
+
+from Bio import SeqIO, SeqFeature, Seq
+
+from . import report, sequenced_records
+
+
+def legacy_to_strings(v):
+    # biopython_convert.to_strings before the serializers
+    if isinstance(v, str):
+        return v
+
+    if isinstance(v, (types.GeneratorType, map, filter, tuple)):
+        v = list(v)
+
+    if hasattr(v, 'keys'):
+        keys = v.keys()
+    elif hasattr(v, '__getitem__'):
+        keys = range(len(v))
+    else:
+        return str(v)
+
+    for i in keys:
+        v[i] = legacy_to_strings(v[i])
+    return v
+
+
+def legacy_to_dicts(v):
+    # biopython_convert.to_dicts before the serializers
+    if isinstance(v, str):
+        try:
+            return int(v)
+        except ValueError:
+            pass
+        return v
+
+    if isinstance(v, Seq.Seq):
+        return str(v)
+
+    if isinstance(v, (types.GeneratorType, map, filter, tuple)):
+        v = list(v)
+
+    if isinstance(v, SeqIO.SeqRecord):
+        v = {
+            **v.__dict__,
+            'seq': str(v.seq)
+        }
+        del v['_seq']
+    elif isinstance(v, SeqFeature.FeatureLocation):
+        v = {
+            **v.__dict__,
+            'start': v.start,
+            'end': v.end,
+            'strand': v.strand,
+        }
+        del v['_start']
+        del v['_end']
+        del v['_strand']
+    elif isinstance(v, SeqFeature.AbstractPosition):
+        return legacy_to_dicts(str(v))
+    elif isinstance(v, OrderedDict):
+        v = dict(v)
+    elif hasattr(v, '__dict__'):
+        v = v.__dict__
+
+    if hasattr(v, 'keys'):
+        keys = v.keys()
+    elif hasattr(v, '__getitem__'):
+        keys = range(len(v))
+    else:
+        return v
+
+    for i in keys:
+        v[i] = legacy_to_dicts(v[i])
+    return v
+
+
+def timed(func, items: list, repeat: int) -> float:
+    """
+    Best time to apply func to each item, with garbage collection disabled as by timeit
+    :param func: conversion to time
+    :param items: values to convert, copied before each repeat
+    :param repeat: number of repeats
+    :return: seconds
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        items_copy = list(map(copy.deepcopy, items))
+        gc.disable()
+        start = time.perf_counter()
+        for item in items_copy:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+        gc.enable()
+    return best
+
+
+def main(copies: int = 4, repeat: int = 3):
+    from biopython_convert import serialize
+    records = sequenced_records() * copies
+    qualifiers = [[feature.qualifiers for feature in record.features] for record in records]
+    print(f"Serialise {len(records)} records, {sum(map(len, qualifiers))} features")
+    for name, func, items in (
+            ("to_dicts (previous)", legacy_to_dicts, records),
+            ("schema 1", serialize.schemas[1], records),
+            ("schema 2", serialize.schemas[2], records),
+            ("to_strings qualifiers (previous)", legacy_to_strings, qualifiers),
+            ("text qualifiers", serialize.text, qualifiers),
+    ):
+        report(name, timed(func, items, repeat), len(items), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
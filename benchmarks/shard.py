@@ -0,0 +1,42 @@
+"""
+Sharded conversion of a single input with an increasing number of processes
+"""
+import os
+import sys
+import pathlib
+import tempfile
+
+from . import measure, report
+
+input_path = pathlib.Path(__file__).parent.parent / 'test-data' / 'no_seq.gbff'
+
+
+def make_input(path: pathlib.Path, copies: int):
+    """
+    Write GenBank of the test genome repeated
+    :param path: output path
+    :param copies: number of times to repeat the input
+    """
+    data = input_path.read_bytes()
+    with path.open('wb') as handle:
+        for _ in range(copies):
+            handle.write(data)
+
+
+def run(path: pathlib.Path, output_path: pathlib.Path, jobs: int) -> int:
+    from biopython_convert import convert
+    convert(path, 'genbank', output_path, 'embl', jobs=jobs)
+    return path.stat().st_size // 2**20
+
+
+def main(copies: int = 20):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = pathlib.Path(tmp, 'input.gbff')
+        make_input(path, copies)
+        print(f"GenBank to EMBL, {path.stat().st_size / 2**20:.1f} MiB")
+        for jobs in sorted({1, 2, 4, os.cpu_count() or 1}):
+            report(f"{jobs} processes", *measure(run, path, pathlib.Path(tmp, 'output'), jobs), unit='MiB')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
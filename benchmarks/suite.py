@@ -0,0 +1,147 @@
+"""
+Conversion benchmark suite
+Converts synthetic inputs between each pair of formats, and with queries, split outputs, and record details, reporting
+throughput and peak memory. Results can be saved as a baseline, and later runs compared against it to catch
+regressions. Baselines are only comparable on the same machine with the same input parameters.
+
+python -m benchmarks.suite [-r records] [-f features] [-l length] [-q qualifiers] [-n repeats] [-k substring]
+    [--save baseline.json] [--compare baseline.json] [--tolerance fraction]
+"""
+import sys
+import json
+import getopt
+import pathlib
+import tempfile
+
+# Imported before timing in each benchmark process, so that times are of conversion rather than starting up
+from Bio import SeqIO
+from biopython_convert import convert
+
+from . import measure, report
+from . import synthetic
+
+summary_query = '[*].{id: id, features: length(features)}'
+
+# (name, input_type, output_type, keyword arguments of convert())
+scenarios = [
+    ('genbank to embl', 'genbank', 'embl', {}),
+    ('genbank to fasta', 'genbank', 'fasta', {}),
+    ('genbank to gff3', 'genbank', 'gff3', {}),
+    ('genbank to features-tsv', 'genbank', 'features-tsv', {}),
+    ('genbank to json', 'genbank', 'json', {}),
+    ('genbank to jsonl', 'genbank', 'jsonl', {}),
+    ('genbank to yaml', 'genbank', 'yaml', {}),
+    ('genbank to yaml-stream, safe, -q', 'genbank', 'yaml-stream', {'jpath': summary_query, 'yaml_safe': True}),
+    ('embl to genbank', 'embl', 'genbank', {}),
+    ('fasta to fasta', 'fasta', 'fasta', {}),
+    ('fastq to fasta', 'fastq', 'fasta', {}),
+    ('fastq to fastq-illumina', 'fastq', 'fastq-illumina', {}),
+    ('fastq to qual', 'fastq', 'qual', {}),
+    ('gff3 to gff3', 'gff3', 'gff3', {}),
+    ('gff3 to json', 'gff3', 'json', {}),
+    ('genbank to embl, -q filter', 'genbank', 'embl', {'jpath': "[?annotations.topology=='linear']"}),
+    ('genbank to embl, -q index', 'genbank', 'embl', {'jpath': '[-1]'}),
+    ('genbank to json, -q', 'genbank', 'json', {'jpath': summary_query}),
+    ('genbank to json, -r -q', 'genbank', 'json', {'jpath': '{id: id, features: length(features)}',
+                                                   'per_record': True}),
+    ('genbank to embl, -s', 'genbank', 'embl', {'split': True}),
+    ('genbank to embl, -i', 'genbank', 'embl', {'stats': True}),
+    ('genbank to embl, -I', 'genbank', 'embl', {'stats': True, 'composition': True}),
+]
+
+
+def generate(directory: pathlib.Path, input_type: str, parameters: synthetic.Parameters) -> pathlib.Path:
+    path = directory / f"input.{input_type}"
+    with path.open('w') as handle:
+        synthetic.write(handle, input_type, parameters)
+    return path
+
+
+def run(input_path: pathlib.Path, input_type: str, output_path: pathlib.Path, output_type: str, options: dict,
+        records: int) -> int:
+    import os
+    import warnings
+    options = dict(options)
+    with open(os.devnull, 'w') as devnull, warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        if options.get('stats'):
+            options['stats'] = devnull
+        convert(input_path, input_type, output_path, output_type, **options)
+    return records
+
+
+def benchmark(parameters: synthetic.Parameters, repeats: int = 1, selected: str = '') -> dict:
+    """
+    Run the scenarios
+    :param parameters: size of the synthetic inputs
+    :param repeats: number of times to run each scenario, keeping the fastest
+    :param selected: only run scenarios with names containing this
+    :return: dict of scenario name to dict of seconds, records, and peak RSS in KiB
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = pathlib.Path(tmp)
+        inputs = {}
+        print(f"Synthetic inputs, {parameters}")
+        for name, input_type, output_type, options in scenarios:
+            if selected not in name:
+                continue
+            if input_type not in inputs:
+                inputs[input_type] = generate(directory, input_type, parameters)
+            output_dir = directory / 'output'
+            output_dir.mkdir(exist_ok=True)
+            runs = [measure(run, inputs[input_type], input_type, output_dir / f"output.{output_type}", output_type,
+                            options, parameters.records) for _ in range(repeats)]
+            seconds, records, maxrss = min(runs)
+            report(name, seconds, records, maxrss)
+            results[name] = dict(seconds=seconds, records=records, maxrss=maxrss)
+            for path in output_dir.iterdir():
+                path.unlink()
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25) -> list:
+    """
+    Compare results against a baseline
+    :param results: results of benchmark()
+    :param baseline: results of an earlier benchmark()
+    :param tolerance: fraction by which time or memory may exceed the baseline
+    :return: names of scenarios exceeding the baseline by more than tolerance
+    """
+    regressions = []
+    print(f"{'Compared to baseline':<40}{'time':>11}{'memory':>14}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        time_ratio = result['seconds'] / baseline[name]['seconds']
+        memory_ratio = result['maxrss'] / baseline[name]['maxrss']
+        regressed = time_ratio > 1 + tolerance or memory_ratio > 1 + tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<40}{time_ratio:>10.2f}x{memory_ratio:>13.2f}x{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main(sysargs: list = ()) -> int:
+    opts, _ = getopt.gnu_getopt(list(sysargs), 'r:f:l:q:n:k:', ['save=', 'compare=', 'tolerance='])
+    opts = dict(opts)
+    parameters = synthetic.Parameters(int(opts.get('-r', 20)), int(opts.get('-f', 200)), int(opts.get('-l', 20000)),
+                                      int(opts.get('-q', 3)))
+    results = benchmark(parameters, int(opts.get('-n', 3)), opts.get('-k', ''))
+    status = 0
+    if '--compare' in opts:
+        with open(opts['--compare']) as handle:
+            baseline = json.load(handle)
+        if baseline['parameters'] != parameters.as_dict():
+            print(f"Baseline inputs differ, {synthetic.Parameters(**baseline['parameters'])}", file=sys.stderr)
+            return 1
+        if compare(results, baseline['results'], float(opts.get('--tolerance', 0.25))):
+            status = 1
+    if '--save' in opts:
+        with open(opts['--save'], 'w') as handle:
+            json.dump(dict(parameters=parameters.as_dict(), results=results), handle, indent=1)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
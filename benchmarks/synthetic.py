@@ -0,0 +1,122 @@
+"""
+Synthetic inputs
+Deterministic genomes and annotations of any size, so that benchmarks do not depend on the test data.
+The same parameters always generate the same records.
+"""
+import sys
+import random
+
+qualifier_names = ['locus_tag', 'gene', 'product', 'note', 'db_xref', 'inference', 'EC_number', 'protein_id']
+feature_types = ['gene', 'CDS', 'misc_feature', 'repeat_region']
+
+# Formats that can be generated
+input_types = ['genbank', 'embl', 'fasta', 'fastq', 'gff3']
+
+_bases = bytes(b'ACGT'[i % 4] for i in range(256))
+_qualities = bytes(i % 41 for i in range(256))
+
+
+class Parameters:
+    """
+    Size of a synthetic input
+    """
+    def __init__(self, records: int = 20, features: int = 200, length: int = 20000, qualifiers: int = 3, seed: int = 0):
+        """
+        :param records: number of records
+        :param features: features per record, in addition to the source feature
+        :param length: sequence length of each record
+        :param qualifiers: qualifiers per feature, the first of qualifier_names
+        :param seed: random seed
+        """
+        self.records = records
+        self.features = features
+        self.length = length
+        self.qualifiers = qualifiers
+        self.seed = seed
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+    def __str__(self):
+        return (f"{self.records} records of {self.length} bp with {self.features} features of {self.qualifiers} "
+                f"qualifiers")
+
+
+def _sequence(rand: random.Random, length: int) -> str:
+    return rand.getrandbits(8 * length).to_bytes(length, 'little').translate(_bases).decode() if length else ''
+
+
+def records(parameters: Parameters, qualities: bool = False):
+    """
+    Generate synthetic records
+    :param parameters: size of the input
+    :param qualities: add phred_quality letter annotations, needed for FASTQ
+    :return: generator of SeqRecords
+    """
+    from Bio.Seq import Seq
+    from Bio.SeqRecord import SeqRecord
+    from Bio.SeqFeature import SeqFeature, FeatureLocation, CompoundLocation
+
+    rand = random.Random(parameters.seed)
+    # Separate so that records are the same with or without qualities
+    quality_rand = random.Random(parameters.seed + 1)
+    names = qualifier_names[:parameters.qualifiers]
+    for i in range(parameters.records):
+        name = f"SYN{i:06d}"
+        length = parameters.length
+        record = SeqRecord(Seq(_sequence(rand, length)), id=f"{name}.1", name=name,
+                           description=f"Synthetic organism record {i}, complete sequence")
+        record.annotations.update(molecule_type='DNA', topology='linear', data_file_division='BCT',
+                                  date='01-JAN-2000', source='Synthetic organism', organism='Synthetic organism',
+                                  taxonomy=['Bacteria', 'Synthetic'])
+        record.features.append(SeqFeature(FeatureLocation(0, length, 1), type='source',
+                                          qualifiers={'organism': ['Synthetic organism'], 'mol_type': ['genomic DNA']}))
+        starts = sorted(rand.randrange(max(length - 1, 1)) for _ in range(parameters.features))
+        for j, start in enumerate(starts):
+            end = min(start + rand.randint(1, 3000), length)
+            strand = rand.choice((1, -1))
+            if j % 10 == 9 and end - start > 10:
+                # A join of two parts
+                middle = (start + end) // 2
+                location = CompoundLocation([FeatureLocation(start, middle - 5, strand),
+                                             FeatureLocation(middle, end, strand)])
+            else:
+                location = FeatureLocation(start, end, strand)
+            qualifiers = {q: [f"{name}_{q}_{j:05d}"] for q in names}
+            record.features.append(SeqFeature(location, type=feature_types[j % len(feature_types)],
+                                              qualifiers=qualifiers))
+        if qualities:
+            qualities = quality_rand.getrandbits(8 * length).to_bytes(length, 'little') if length else b''
+            record.letter_annotations['phred_quality'] = list(qualities.translate(_qualities))
+        yield record
+
+
+def write(handle, output_type: str, parameters: Parameters) -> int:
+    """
+    Write a synthetic input
+    :param handle: text file handle to write to
+    :param output_type: one of input_types
+    :param parameters: size of the input
+    :return: number of records
+    """
+    from Bio import SeqIO
+    from biopython_convert import gff
+    generated = records(parameters, output_type == 'fastq')
+    if output_type == 'gff3':
+        gff.gff_writer(generated, handle, output_type, directives=True)
+    else:
+        SeqIO.write(generated, handle, output_type)
+    return parameters.records
+
+
+def main(output_type: str = 'genbank', *sizes: int):
+    """
+    Write a synthetic input to stdout
+    :param output_type: one of input_types
+    :param sizes: arguments of Parameters
+    """
+    write(sys.stdout, output_type, Parameters(*map(int, sizes)))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
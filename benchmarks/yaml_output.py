@@ -0,0 +1,55 @@
+"""
+YAML output of whole records, comparing the previous single list dump with streamed output
+"""
+import sys
+import pathlib
+import tempfile
+
+from . import measure, report, sequenced_records
+
+
+def make_input(path: pathlib.Path, copies: int):
+    """
+    Write GenBank of the test genome repeated, with a random sequence in place of the missing one
+    :param path: output path
+    :param copies: number of times to repeat the input
+    """
+    from Bio import SeqIO
+    records = sequenced_records()
+    with path.open('w') as handle:
+        for _ in range(copies):
+            SeqIO.write(records, handle, 'genbank')
+
+
+def run_dump(path: pathlib.Path, output_path: pathlib.Path) -> int:
+    # Conversion before streaming, the entire document is built before any output
+    from Bio import SeqIO
+    from biopython_convert import get_yaml, to_dicts
+    records = list(SeqIO.parse(str(path), 'genbank'))
+    with output_path.open('w') as handle:
+        get_yaml().dump(to_dicts(records), handle)
+    return len(records)
+
+
+def run(path: pathlib.Path, output_path: pathlib.Path, output_type: str, yaml_safe: bool) -> int:
+    from Bio import SeqIO
+    from biopython_convert import convert
+    convert(path, 'genbank', output_path, output_type, yaml_safe=yaml_safe)
+    return sum(1 for _ in SeqIO.parse(str(path), 'genbank'))
+
+
+def main(copies: int = 4):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = pathlib.Path(tmp, 'input.gbff')
+        output_path = pathlib.Path(tmp, 'output')
+        make_input(path, copies)
+        print(f"GenBank to YAML, {path.stat().st_size / 2**20:.1f} MiB")
+        report("single dump", *measure(run_dump, path, output_path))
+        report("yaml", *measure(run, path, output_path, 'yaml', False))
+        report("yaml-stream", *measure(run, path, output_path, 'yaml-stream', False))
+        report("yaml --yaml-safe", *measure(run, path, output_path, 'yaml', True))
+        report("yaml-stream --yaml-safe", *measure(run, path, output_path, 'yaml-stream', True))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
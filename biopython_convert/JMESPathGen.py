@@ -3,12 +3,20 @@ import jmespath.visitor
 import jmespath.functions
 import jmespath.exceptions
 import itertools
+import pickle
+import tempfile
 import types
+import weakref
+import collections.abc
 
 # Register generator type in jmespath
 jmespath.functions.TYPES_MAP['generator'] = 'array'
 jmespath.functions.REVERSE_TYPES_MAP['array'] += ('generator',)
 
+# Register compiled expression references in jmespath
+jmespath.functions.TYPES_MAP['_CompiledExpression'] = 'expref'
+jmespath.functions.REVERSE_TYPES_MAP['expref'] += ('_CompiledExpression',)
+
 # Register biopython types in jmespath
 jmespath.functions.TYPES_MAP['Seq'] = 'string'
 jmespath.functions.REVERSE_TYPES_MAP['string'] += ('Seq',)
@@ -30,17 +38,164 @@ jmespath.functions.REVERSE_TYPES_MAP['number'] += ('OneOfPosition',)
 
 
 class Options(jmespath.Options):
-    def __init__(self, dict_cls=None, custom_functions=None, custom_slice_types=None):
+    def __init__(self, dict_cls=None, custom_functions=None, custom_slice_types=None, memory_budget=None):
+        """
+        :param memory_budget: bytes of the elements of each generator converted to a list to keep in memory, beyond
+            which they are kept in a temporary file, see SpillList. Unlimited if None.
+        """
         super().__init__(dict_cls, custom_functions)
         self.custom_slice_types = custom_slice_types
+        self.memory_budget = memory_budget
 
 
-def compile(expression):
-    return Parser().parse(expression)
+def compile(expression, closures=False):
+    """
+    Parse an expression once, to be searched or sent to other processes many times
+    :param expression: JMESPath expression string, or an already compiled ParsedResult which is returned as is
+    :param closures: search with a tree of Python closures built once by Compiler, rather than by walking the AST with
+        TreeInterpreterGenerator. Results are the same.
+    :return: ParsedResult, or CompiledResult if closures is True
+    """
+    if not isinstance(expression, ParsedResult):
+        expression = Parser().parse(expression)
+    if closures and not isinstance(expression, CompiledResult):
+        expression = CompiledResult(expression.expression, expression.parsed)
+    return expression
 
 
 def search(expression, data, options=None):
-    return Parser().parse(expression).search(data, options=options)
+    return compile(expression).search(data, options=options)
+
+
+def plan(expression, random_access=False):
+    """
+    Classify a query by whether it can be evaluated while streaming over the root list
+    :param expression: JMESPath expression string or ParsedResult
+    :param random_access: the root list is a RandomAccessList
+    :return: QueryPlan listing any nodes that force the root list into memory
+    """
+    root = QueryPlanner.RANDOM_ACCESS if random_access else QueryPlanner.STREAM
+    return QueryPlanner().plan(compile(expression), root)
+
+
+def root_filter(expression, fields: dict):
+    """
+    Find a filter of the root list whose condition only reads some fields of each element, so that elements can be
+    rejected after reading only those fields. Elements rejected by the condition are not read by the rest of the query.
+    :param expression: JMESPath expression string or ParsedResult
+    :param fields: dict of the field names that may be read to a container of their subfields that may not be, or None
+        if the field may be read whole
+    :return: AST of the filter condition, or None if there is no such filter
+    """
+    return FilterPushdown(fields).root_filter(compile(expression).parsed)
+
+
+def predicate(condition: dict, options=None):
+    """
+    Compile a filter condition found by root_filter()
+    :param condition: AST of the condition
+    :param options: Options as passed to search()
+    :return: Callable taking an element and returning True if the filter keeps it
+    """
+    compiled = Compiler().compile(condition)
+
+    def matches(value) -> bool:
+        interpreter = TreeInterpreterGenerator(options)
+        return not interpreter._is_false(compiled(value, interpreter, None))
+    return matches
+
+
+class RandomAccessList(collections.abc.Sequence):
+    """
+    Base for a root list that resolves indexes, slices, and length() without generating the preceding elements.
+    Subclasses implement __len__() and __getitem__() for integer indexes, and may override __iter__() to stream.
+    Slices are returned as generators.
+    """
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Register subclass as a jmespath array
+        jmespath.functions.TYPES_MAP[cls.__name__] = 'array'
+        jmespath.functions.REVERSE_TYPES_MAP['array'] += (cls.__name__,)
+
+    def slice(self, s: slice):
+        """
+        Generate the elements of a slice
+        :param s: slice with the same semantics as for a list
+        :return: generator of elements
+        """
+        for i in range(len(self))[s]:
+            yield self[i]
+
+
+class _Spilled:
+    """
+    Location of a pickled element in the file of a SpillList
+    """
+    __slots__ = ('offset', 'length')
+
+    def __init__(self, offset: int, length: int):
+        self.offset = offset
+        self.length = length
+
+
+class SpillList(RandomAccessList):
+    """
+    Elements of a generator that a query needs random access to, kept in memory up to a budget. Elements beyond the
+    budget are pickled to a temporary file, and loaded from it each time they are accessed.
+    The size of an element is the length of its pickle. Elements that can not be pickled are kept in memory.
+    """
+    def __init__(self, elements, budget: int):
+        """
+        :param elements: iterable of elements
+        :param budget: bytes of pickled elements to keep in memory
+        """
+        self._elements = []
+        self._file = None
+        size = 0
+        for element in elements:
+            try:
+                data = pickle.dumps(element, pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                self._elements.append(element)
+                continue
+            size += len(data)
+            if size <= budget:
+                self._elements.append(element)
+                continue
+            if self._file is None:
+                self._file = tempfile.TemporaryFile(prefix='biopython.convert-')
+            self._elements.append(_Spilled(self._file.tell(), len(data)))
+            self._file.write(data)
+
+    @property
+    def spilled(self) -> int:
+        """
+        Number of elements kept in the temporary file
+        """
+        return sum(isinstance(element, _Spilled) for element in self._elements)
+
+    def __len__(self) -> int:
+        return len(self._elements)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self.slice(i))
+        element = self._elements[i]
+        if isinstance(element, _Spilled):
+            self._file.seek(element.offset)
+            return pickle.loads(self._file.read(element.length))
+        return element
+
+    def close(self):
+        """
+        Delete the temporary file
+        """
+        if self._file is not None:
+            self._file.close()
+
+
+# Values treated as arrays by projections and flatten
+_array_types = (list, types.GeneratorType, map, filter, RandomAccessList)
 
 
 class Parser(jmespath.parser.Parser):
@@ -56,6 +211,25 @@ class ParsedResult(jmespath.parser.ParsedResult):
         return result
 
 
+class CompiledResult(ParsedResult):
+    """
+    ParsedResult searched by closures built by Compiler on first search. Closures are rebuilt after unpickling.
+    """
+    def __init__(self, expression, parsed):
+        super().__init__(expression, parsed)
+        self._compiled = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_compiled'] = None
+        return state
+
+    def search(self, value, options=None):
+        if self._compiled is None:
+            self._compiled = Compiler().compile(self.parsed)
+        return self._compiled(value, TreeInterpreterGenerator(options), None)
+
+
 class ExtendedFunctions(jmespath.functions.Functions):
     def call_function(self, function_name, resolved_args, **kwargs):
         try:
@@ -70,6 +244,8 @@ class ExtendedFunctions(jmespath.functions.Functions):
 
     @jmespath.functions.signature({'types': ['object']}, {'types': ['expref']})
     def _func_let(self, lexical_scope, expref, **kwargs):
+        # Variables may be read more than once, so generators are converted to lists
+        lexical_scope = {name: expref.interpreter._gen_to_list(value) for name, value in lexical_scope.items()}
         if 'scope' in kwargs:
             scope = dict(kwargs['scope'])
             scope.update(lexical_scope)
@@ -86,6 +262,32 @@ class ExtendedFunctions(jmespath.functions.Functions):
     def _func_extract(self, seq, feature):
         return feature.extract(seq)
 
+    # Arguments converted to a SpillList are arrays
+
+    @jmespath.functions.signature({'types': []})
+    def _func_to_array(self, arg):
+        if isinstance(arg, RandomAccessList):
+            return arg
+        return super()._func_to_array(arg)
+
+    @jmespath.functions.signature({'types': []})
+    def _func_type(self, arg):
+        if isinstance(arg, RandomAccessList):
+            return 'array'
+        return super()._func_type(arg)
+
+    @jmespath.functions.signature({'types': []})
+    def _func_to_string(self, arg):
+        if isinstance(arg, RandomAccessList):
+            arg = list(arg)
+        return super()._func_to_string(arg)
+
+    @jmespath.functions.signature({'types': []})
+    def _func_to_number(self, arg):
+        if isinstance(arg, RandomAccessList):
+            return None
+        return super()._func_to_number(arg)
+
 
 class _Expression(jmespath.visitor._Expression):
     def __init__(self, expression, interpreter, context):
@@ -95,37 +297,63 @@ class _Expression(jmespath.visitor._Expression):
 
 class TreeInterpreterGenerator(jmespath.visitor.TreeInterpreter):
     def __init__(self, options=None, *args, **kwargs):
-        options = options or jmespath.visitor.Options(custom_functions=ExtendedFunctions())
+        options = options or Options(custom_functions=ExtendedFunctions())
         super().__init__(*args, options=options, **kwargs)
-        self._generators = {}
+        # Generators that have been peeked or converted to a list, to what replaces them. Entries are released with
+        # the generator, once no node is evaluating it, so replacements must not refer to the generator.
+        self._generators = weakref.WeakKeyDictionary()
+
+    def _resolve(self, value):
+        """
+        Substitute a generator that has been peeked or converted to a list
+        :param value: any value
+        :return: value, or what replaces it
+        """
+        while isinstance(value, types.GeneratorType):
+            replacement = self._generators.get(value)
+            if replacement is None:
+                break
+            if isinstance(replacement, _Peeked):
+                return replacement.replace(self._generators, value)
+            value = replacement
+        return value
 
-    def _gen_to_list(self, gen, recurse=False):
+    def _gen_to_list(self, gen, recurse=False, spill=True):
         """
         Called when a jmespath operation requires random access to generator.
         Memoises already converted generators and returns the already generated list.
         :param gen: generator object
-        :return: list of values returned by generator
+        :param recurse: also convert generators that are elements of gen
+        :param spill: convert to a SpillList if the options have a memory_budget, otherwise to a list
+        :return: list, or SpillList, of values returned by generator
         """
-        if getattr(gen, '__hash__', None) is not None:
-            gen = self._generators.get(gen, gen)
-        if isinstance(gen, types.GeneratorType):
-            l = list(gen)
-            self._generators[gen] = l
-            if recurse:
-                for i in range(len(l)):
-                    if isinstance(l[i], types.GeneratorType):
-                        l[i] = self._gen_to_list(l[i])
-            return l
-        return gen
+        if not isinstance(gen, types.GeneratorType):
+            return gen
+        resolved = self._resolve(gen)
+        if not isinstance(resolved, types.GeneratorType):
+            return resolved
+        elements = resolved
+        if recurse:
+            # Elements are converted to lists, pickled with the SpillList
+            elements = (self._gen_to_list(element, spill=False) for element in elements)
+        budget = self._options.memory_budget if spill else None
+        converted = list(elements) if budget is None else SpillList(elements, budget)
+        self._generators[resolved] = converted
+        if resolved is not gen:
+            self._generators[gen] = converted
+        return converted
 
     def visit(self, node, *args, **kwargs):
         # if a visit caused list conversion, get list. Assume that 'value' is args[0].
         if len(args) and isinstance(args[0], types.GeneratorType):
             args = list(args)  # convert from tuple
-            args[0] = self._generators.get(args[0], args[0])
+            args[0] = self._resolve(args[0])
         return super().visit(node, *args, **kwargs)
 
     def visit_field(self, node, value, **kwargs):
+        return self._resolve(self._field(node, value, **kwargs))
+
+    def _field(self, node, value, **kwargs):
         try:
             return value.get(node['value'])
         except AttributeError:
@@ -157,7 +385,7 @@ class TreeInterpreterGenerator(jmespath.visitor.TreeInterpreter):
 
     def visit_filter_projection(self, node, value, **kwargs):
         base = self.visit(node['children'][0], value, **kwargs)
-        if not isinstance(base, (list, types.GeneratorType, map, filter)):
+        if not isinstance(base, _array_types):
             return None
         comparator_node = node['children'][2]
         for element in base:
@@ -169,11 +397,11 @@ class TreeInterpreterGenerator(jmespath.visitor.TreeInterpreter):
 
     def visit_flatten(self, node, value, **kwargs):
         base = self.visit(node['children'][0], value, **kwargs)
-        if not isinstance(base, (list, types.GeneratorType, map, filter)):
+        if not isinstance(base, _array_types):
             # Can't flatten the object if it's not a list.
             return None
         for element in base:
-            if isinstance(element, (list, types.GeneratorType, map, filter)):
+            if isinstance(element, _array_types):
                 for subelement in element:
                     yield subelement
             else:
@@ -181,12 +409,20 @@ class TreeInterpreterGenerator(jmespath.visitor.TreeInterpreter):
 
     def visit_index(self, node, value, **kwargs):
         value = self._gen_to_list(value)
+        if isinstance(value, RandomAccessList):
+            try:
+                return value[node['value']]
+            except IndexError:
+                return None
         return super().visit_index(node, value)
 
     def visit_slice(self, node, value, **kwargs):
         if self._options.custom_slice_types is not None and isinstance(value, self._options.custom_slice_types):
             return value[slice(*node['children'])]
-        return itertools.islice(value, *node['children'])
+        if isinstance(value, RandomAccessList):
+            return value.slice(slice(*node['children']))
+        # Generator rather than islice so that projections of the slice treat it as an array
+        return (element for element in itertools.islice(value, *node['children']))
 
     def visit_multi_select_list(self, node, value, **kwargs):
         if value is None:
@@ -196,7 +432,7 @@ class TreeInterpreterGenerator(jmespath.visitor.TreeInterpreter):
 
     def visit_projection(self, node, value, **kwargs):
         base = self.visit(node['children'][0], value, **kwargs)
-        if not isinstance(base, (list, types.GeneratorType, map, filter)):
+        if not isinstance(base, _array_types):
             return None
         for element in base:
             current = self.visit(node['children'][1], element, **kwargs)
@@ -215,16 +451,17 @@ class TreeInterpreterGenerator(jmespath.visitor.TreeInterpreter):
                 yield current
 
     def _is_false(self, value, **kwargs):
+        value = self._resolve(value)
         if isinstance(value, types.GeneratorType):
             # peek generator instead of _gen_to_list()
             try:
                 peek = next(value)
-                old_value = value
-                value = itertools.chain((peek,), value)
-                self._generators[id(old_value)] = value
-                return False
             except StopIteration:
                 return True
+            self._generators[value] = _Peeked(peek)
+            return False
+        if isinstance(value, RandomAccessList):
+            return not len(value)
         return super()._is_false(value)
 
     def visit_expref(self, node, value, **kwargs):
@@ -251,8 +488,8 @@ class TreeInterpreterGenerator(jmespath.visitor.TreeInterpreter):
             left = self.visit(node['children'][0], value, **kwargs)
             right = self.visit(node['children'][1], value, **kwargs)
             num_types = (int, float)
-            if not (jmespath._is_comparable(left) and
-                    jmespath._is_comparable(right)):
+            if not (jmespath.visitor._is_comparable(left) and
+                    jmespath.visitor._is_comparable(right)):
                 return None
             return comparator_func(left, right)
 
@@ -286,12 +523,12 @@ class TreeInterpreterGenerator(jmespath.visitor.TreeInterpreter):
         matched = self.visit(node['children'][0], value, **kwargs)
         if self._is_false(matched):
             matched = self.visit(node['children'][1], value, **kwargs)
-        return matched
+        return self._resolve(matched)
 
     def visit_and_expression(self, node, value, **kwargs):
         matched = self.visit(node['children'][0], value, **kwargs)
         if self._is_false(matched):
-            return matched
+            return self._resolve(matched)
         return self.visit(node['children'][1], value, **kwargs)
 
     def visit_pipe(self, node, value, **kwargs):
@@ -303,3 +540,591 @@ class TreeInterpreterGenerator(jmespath.visitor.TreeInterpreter):
     def _is_true(self, value, **kwargs):
         return super()._is_true(value)
 
+
+# Placeholder for a missing attribute, as None is a valid attribute value
+_missing = object()
+
+# Whether each type has a get() method, so that fields of objects without one do not raise AttributeError
+_get_types = {dict: True}
+
+
+class _Peeked:
+    """
+    First element taken from a generator by TreeInterpreterGenerator._is_false()
+    Refers to the generator that replaces its source weakly, as the source is the key of the entry holding it.
+    """
+    __slots__ = ('element', '_replacement')
+
+    def __init__(self, element):
+        self.element = element
+        self._replacement = None
+
+    def replace(self, generators, source):
+        """
+        :param generators: TreeInterpreterGenerator._generators holding self under source
+        :param source: peeked generator
+        :return: generator of the peeked element followed by the rest of source, the same one until it is released
+        """
+        replacement = self._replacement and self._replacement()
+        if replacement is None:
+            replacement = _prepend(self.element, generators, source)
+            self._replacement = weakref.ref(replacement)
+        return replacement
+
+
+def _prepend(first, generators, rest):
+    """
+    Generator of a peeked element followed by the rest of its generator
+    Once started, rest is no longer replaced, so that a later replacement does not generate first again.
+    """
+    generators.pop(rest, None)
+    yield first
+    yield from rest
+
+
+def _current(interpreter, value):
+    """
+    Substitute a generator already peeked or converted to a list, as TreeInterpreterGenerator.visit() does
+    """
+    if isinstance(value, types.GeneratorType):
+        return interpreter._resolve(value)
+    return value
+
+
+class _CompiledExpression(_Expression):
+    """
+    Expression reference to a compiled closure, visited by functions as an _Expression
+    """
+    def __init__(self, expression, compiled, interpreter, context):
+        super().__init__(expression, interpreter, context)
+        self.compiled = compiled
+
+    def visit(self, node, value, **kwargs):
+        return self.compiled(_current(self.interpreter, value), self.interpreter, kwargs.get('scope'))
+
+
+class Compiler(jmespath.visitor.Visitor):
+    """
+    Compiles a parsed AST once into a tree of closures mirroring TreeInterpreterGenerator, so that searching does not
+    dispatch on node types or forward keyword arguments at every node.
+    Each closure takes (value, interpreter, scope). interpreter is the TreeInterpreterGenerator of the search, holding
+    its options, functions, and generators converted to lists. scope is the let() scope, or None.
+    """
+    def compile(self, parsed: dict):
+        """
+        :param parsed: AST of ParsedResult.parsed
+        :return: closure of the root node
+        """
+        return self.visit(parsed)
+
+    def default_visit(self, node, *args, **kwargs):
+        # Node types without a closure, such as any added by later versions of jmespath, are walked by the interpreter
+
+        def interpret(value, interpreter, scope):
+            if scope is None:
+                return interpreter.visit(node, value)
+            return interpreter.visit(node, value, scope=scope)
+        return interpret
+
+    def _chain(self, node):
+        children = [self.visit(child) for child in node['children']]
+        if len(children) == 2:
+            first, second = children
+
+            def chain(value, interpreter, scope):
+                return second(first(value, interpreter, scope), interpreter, scope)
+            return chain
+
+        def chain(value, interpreter, scope):
+            for child in children:
+                value = child(value, interpreter, scope)
+            return value
+        return chain
+
+    def visit_subexpression(self, node):
+        return self._chain(node)
+
+    def visit_index_expression(self, node):
+        return self._chain(node)
+
+    def visit_pipe(self, node):
+        return self._chain(node)
+
+    def visit_field(self, node):
+        name = node['value']
+
+        def field(value, interpreter, scope):
+            cls = type(value)
+            has_get = _get_types.get(cls)
+            if has_get is None:
+                has_get = _get_types[cls] = hasattr(cls, 'get')
+            if has_get:
+                try:
+                    return _current(interpreter, value.get(name))
+                except AttributeError:
+                    pass
+            result = getattr(value, name, _missing)
+            if result is _missing:
+                result = scope.get(name, None) if scope is not None else None
+            return _current(interpreter, result)
+        return field
+
+    def visit_literal(self, node):
+        literal = node['value']
+        return lambda value, interpreter, scope: literal
+
+    def visit_current(self, node):
+        return lambda value, interpreter, scope: _current(interpreter, value)
+
+    def visit_identity(self, node):
+        return self.visit_current(node)
+
+    def visit_key_val_pair(self, node):
+        return self.visit(node['children'][0])
+
+    def visit_expref(self, node):
+        expression = node['children'][0]
+        compiled = self.visit(expression)
+
+        def expref(value, interpreter, scope):
+            return _CompiledExpression(expression, compiled, interpreter, _current(interpreter, value))
+        return expref
+
+    def visit_index(self, node):
+        index = node['value']
+
+        def index_(value, interpreter, scope):
+            value = interpreter._gen_to_list(_current(interpreter, value))
+            if isinstance(value, RandomAccessList):
+                try:
+                    return value[index]
+                except IndexError:
+                    return None
+            if not isinstance(value, list):
+                return None
+            try:
+                return value[index]
+            except IndexError:
+                return None
+        return index_
+
+    def visit_slice(self, node):
+        s = slice(*node['children'])
+        args = node['children']
+
+        def slice_(value, interpreter, scope):
+            value = _current(interpreter, value)
+            custom_slice_types = interpreter._options.custom_slice_types
+            if custom_slice_types is not None and isinstance(value, custom_slice_types):
+                return value[s]
+            if isinstance(value, RandomAccessList):
+                return value.slice(s)
+            return (element for element in itertools.islice(value, *args))
+        return slice_
+
+    def visit_function_expression(self, node):
+        name = node['value']
+        children = [self.visit(child) for child in node['children']]
+
+        def function(value, interpreter, scope):
+            resolved_args = [interpreter._gen_to_list(child(value, interpreter, scope), True) for child in children]
+            return interpreter._functions.call_function(name, resolved_args)
+        return function
+
+    def visit_comparator(self, node):
+        comparator_func = TreeInterpreterGenerator.COMPARATOR_FUNC[node['value']]
+        left_node, right_node = node['children']
+        left, right = self.visit(left_node), self.visit(right_node)
+        if node['value'] in TreeInterpreterGenerator._EQUALITY_OPS:
+            if right_node['type'] == 'literal':
+                # Common case: comparing a field to a literal
+                literal = right_node['value']
+
+                def comparator(value, interpreter, scope):
+                    return comparator_func(left(value, interpreter, scope), literal)
+                return comparator
+
+            def comparator(value, interpreter, scope):
+                return comparator_func(left(value, interpreter, scope), right(value, interpreter, scope))
+            return comparator
+
+        def comparator(value, interpreter, scope):
+            # Ordering operators are only valid for numbers
+            left_value = left(value, interpreter, scope)
+            right_value = right(value, interpreter, scope)
+            if not (jmespath.visitor._is_comparable(left_value) and jmespath.visitor._is_comparable(right_value)):
+                return None
+            return comparator_func(left_value, right_value)
+        return comparator
+
+    def visit_or_expression(self, node):
+        left, right = map(self.visit, node['children'])
+
+        def or_expression(value, interpreter, scope):
+            matched = left(value, interpreter, scope)
+            if interpreter._is_false(matched):
+                matched = right(value, interpreter, scope)
+            return _current(interpreter, matched)
+        return or_expression
+
+    def visit_and_expression(self, node):
+        left, right = map(self.visit, node['children'])
+
+        def and_expression(value, interpreter, scope):
+            matched = left(value, interpreter, scope)
+            if interpreter._is_false(matched):
+                return _current(interpreter, matched)
+            return right(value, interpreter, scope)
+        return and_expression
+
+    def visit_not_expression(self, node):
+        child = self.visit(node['children'][0])
+
+        def not_expression(value, interpreter, scope):
+            original_result = child(value, interpreter, scope)
+            if original_result == 0:
+                return False
+            return interpreter._is_false(original_result)
+        return not_expression
+
+    def visit_multi_select_dict(self, node):
+        children = [(child['value'], self.visit(child)) for child in node['children']]
+
+        def multi_select_dict(value, interpreter, scope):
+            if value is None:
+                return None
+            collected = interpreter._dict_cls()
+            for key, child in children:
+                collected[key] = child(value, interpreter, scope)
+            return collected
+        return multi_select_dict
+
+    # The following are generator functions, as in TreeInterpreterGenerator, so that their values are streamed and
+    # their children are only evaluated once iterated
+
+    def visit_multi_select_list(self, node):
+        children = [self.visit(child) for child in node['children']]
+
+        def multi_select_list(value, interpreter, scope):
+            if value is None:
+                return
+            for child in children:
+                yield child(value, interpreter, scope)
+        return multi_select_list
+
+    def visit_projection(self, node):
+        left, right = map(self.visit, node['children'])
+
+        def projection(value, interpreter, scope):
+            base = left(value, interpreter, scope)
+            if not isinstance(base, _array_types):
+                return
+            for element in base:
+                current = right(element, interpreter, scope)
+                if current is not None:
+                    yield current
+        return projection
+
+    def visit_filter_projection(self, node):
+        left, right, comparator = map(self.visit, node['children'])
+
+        def filter_projection(value, interpreter, scope):
+            base = left(value, interpreter, scope)
+            if not isinstance(base, _array_types):
+                return
+            is_false = interpreter._is_false
+            for element in base:
+                if not is_false(comparator(element, interpreter, scope)):
+                    current = right(element, interpreter, scope)
+                    if current is not None:
+                        yield current
+        return filter_projection
+
+    def visit_value_projection(self, node):
+        left, right = map(self.visit, node['children'])
+
+        def value_projection(value, interpreter, scope):
+            base = left(value, interpreter, scope)
+            try:
+                base = base.values()
+            except AttributeError:
+                return
+            for element in base:
+                current = right(element, interpreter, scope)
+                if current is not None:
+                    yield current
+        return value_projection
+
+    def visit_flatten(self, node):
+        child = self.visit(node['children'][0])
+
+        def flatten(value, interpreter, scope):
+            base = child(value, interpreter, scope)
+            if not isinstance(base, _array_types):
+                return
+            for element in base:
+                if isinstance(element, _array_types):
+                    yield from element
+                else:
+                    yield element
+        return flatten
+
+
+class MaterializationWarning(UserWarning):
+    """
+    Warning issued when a query must load the entire input into memory
+    """
+
+
+class Materialization:
+    """
+    AST node that forces a streamed value into a list
+    """
+    def __init__(self, node: dict, reason: str):
+        self.node = node
+        self.reason = reason
+
+    def __str__(self):
+        if self.node['type'] == 'function_expression':
+            name = f"{self.node['value']}()"
+        elif self.node['type'] == 'index':
+            name = f"[{self.node['value']}]"
+        else:
+            name = self.node['type']
+        return f"{name}: {self.reason}"
+
+
+class QueryPlan:
+    """
+    Result of QueryPlanner.plan()
+    """
+    def __init__(self, expression: str, parsed: dict, materializations: list):
+        self.expression = expression
+        self.parsed = parsed
+        self.materializations = materializations
+
+    @property
+    def streamable(self) -> bool:
+        """
+        True if the query never holds more than one root element in memory at a time
+        """
+        return not self.materializations
+
+    def __str__(self):
+        if self.streamable:
+            return f"{self.expression}: streamable"
+        return f"{self.expression}: materializes input at " + ', '.join(map(str, self.materializations))
+
+
+class QueryPlanner(jmespath.visitor.Visitor):
+    """
+    Walks a parsed AST mirroring TreeInterpreterGenerator, tracking whether the current value is the lazily generated
+    root list (STREAM), a RandomAccessList root (RANDOM_ACCESS), or anything else (VALUE). Records every node where
+    TreeInterpreterGenerator would call _gen_to_list() on the root stream.
+    """
+    STREAM = 'stream'
+    RANDOM_ACCESS = 'random_access'
+    VALUE = 'value'
+
+    def __init__(self):
+        super().__init__()
+        self._materializations = []
+        self._scope = {}
+
+    def plan(self, parsed: ParsedResult, root: str = STREAM) -> QueryPlan:
+        """
+        Plan a parsed expression
+        :param parsed: result of Parser().parse()
+        :param root: kind of the root value, STREAM for the list of input records, RANDOM_ACCESS for indexed input
+        :return: QueryPlan
+        """
+        self._materializations = []
+        self._scope = {}
+        self.visit(parsed.parsed, root)
+        return QueryPlan(parsed.expression, parsed.parsed, self._materializations)
+
+    def _materialize(self, node, reason):
+        self._materializations.append(Materialization(node, reason))
+
+    def _chain(self, node, kind):
+        for child in node['children']:
+            kind = self.visit(child, kind)
+        return kind
+
+    def _project(self, node, kind):
+        base = self.visit(node['children'][0], kind)
+        for child in node['children'][1:]:
+            self.visit(child, self.VALUE)
+        # Projecting a random access list generates its elements
+        return self.STREAM if base == self.RANDOM_ACCESS else base
+
+    def default_visit(self, node, kind):
+        return self.VALUE
+
+    def visit_subexpression(self, node, kind):
+        return self._chain(node, kind)
+
+    def visit_index_expression(self, node, kind):
+        return self._chain(node, kind)
+
+    def visit_pipe(self, node, kind):
+        return self._chain(node, kind)
+
+    def visit_field(self, node, kind):
+        # Fields of a generator resolve to None, unknown fields fall back to the let() scope
+        return self._scope.get(node['value'], self.VALUE)
+
+    def visit_index(self, node, kind):
+        if kind == self.STREAM:
+            self._materialize(node, "index requires random access")
+        return self.VALUE
+
+    def visit_slice(self, node, kind):
+        # Slicing is done with itertools.islice(), or RandomAccessList.slice()
+        return self.STREAM if kind == self.RANDOM_ACCESS else kind
+
+    def visit_identity(self, node, kind):
+        return kind
+
+    def visit_current(self, node, kind):
+        return kind
+
+    def visit_projection(self, node, kind):
+        return self._project(node, kind)
+
+    def visit_filter_projection(self, node, kind):
+        return self._project(node, kind)
+
+    def visit_value_projection(self, node, kind):
+        self._project(node, kind)
+        return self.VALUE
+
+    def visit_flatten(self, node, kind):
+        base = self.visit(node['children'][0], kind)
+        return self.STREAM if base == self.RANDOM_ACCESS else base
+
+    def visit_multi_select_list(self, node, kind):
+        kinds = [self.visit(child, kind) for child in node['children']]
+        return self.STREAM if self.STREAM in kinds or self.RANDOM_ACCESS in kinds else self.VALUE
+
+    def visit_multi_select_dict(self, node, kind):
+        for child in node['children']:
+            self.visit(child, kind)
+        return self.VALUE
+
+    def visit_key_val_pair(self, node, kind):
+        return self.visit(node['children'][0], kind)
+
+    def visit_expref(self, node, kind):
+        # Expression references are evaluated against the elements of the array argument
+        self.visit(node['children'][0], self.VALUE)
+        return self.VALUE
+
+    def visit_function_expression(self, node, kind):
+        if node['value'] == 'let':
+            # let() evaluates its expression against the current value rather than the elements of an argument
+            scope, expref = node['children']
+            outer = self._scope
+            self._scope = dict(outer)
+            if scope['type'] == 'multi_select_dict':
+                for child in scope['children']:
+                    bound = self.visit(child, kind)
+                    if bound == self.STREAM:
+                        self._materialize(node, "let() values are converted to lists")
+                        bound = self.VALUE
+                    self._scope[child['value']] = bound
+            elif self.visit(scope, kind) == self.STREAM:
+                self._materialize(node, "let() values are converted to lists")
+            try:
+                if expref['type'] == 'expref':
+                    return self.visit(expref['children'][0], kind)
+                self.visit(expref, kind)
+                return self.VALUE
+            finally:
+                self._scope = outer
+        kinds = [self.visit(child, kind) for child in node['children']]
+        if node['value'] == 'length' and kinds == [self.RANDOM_ACCESS]:
+            # Resolved by RandomAccessList.__len__()
+            return self.VALUE
+        if self.STREAM in kinds or self.RANDOM_ACCESS in kinds:
+            self._materialize(node, "function arguments are converted to lists")
+        return self.VALUE
+
+    def visit_comparator(self, node, kind):
+        for child in node['children']:
+            self.visit(child, kind)
+        return self.VALUE
+
+    def visit_or_expression(self, node, kind):
+        kinds = [self.visit(child, kind) for child in node['children']]
+        for k in (self.STREAM, self.RANDOM_ACCESS):
+            if k in kinds:
+                return k
+        return self.VALUE
+
+    def visit_and_expression(self, node, kind):
+        return self.visit_or_expression(node, kind)
+
+    def visit_not_expression(self, node, kind):
+        self.visit(node['children'][0], kind)
+        return self.VALUE
+
+
+class FilterPushdown:
+    """
+    Finds the filter of the root list at the start of a query, and checks that its condition only reads allowed fields
+    of the element being filtered
+    """
+    # Nodes whose first child is evaluated against the current value, and the remaining children against its result
+    _chains = ('subexpression', 'index_expression', 'pipe')
+    # Nodes evaluating every child against the current value
+    _operators = ('comparator', 'and_expression', 'or_expression', 'not_expression', 'multi_select_list',
+                  'multi_select_dict', 'key_val_pair', 'function_expression')
+    # Nodes taking the value to project or flatten from their first child
+    _projections = ('projection', 'filter_projection', 'value_projection', 'flatten')
+
+    def __init__(self, fields: dict):
+        """
+        :param fields: see root_filter()
+        """
+        self.fields = fields
+
+    def root_filter(self, node: dict):
+        """
+        :param node: AST of the query
+        :return: AST of the condition of a filter of the root list if it only reads allowed fields, otherwise None
+        """
+        # Follow the nodes that the root list flows into first
+        while node['type'] in ('pipe', 'projection', 'flatten', 'index_expression', 'subexpression'):
+            node = node['children'][0]
+        if node['type'] != 'filter_projection' or node['children'][0]['type'] not in ('identity', 'current'):
+            return None
+        condition = node['children'][2]
+        return condition if self.reads_allowed(condition) else None
+
+    def reads_allowed(self, node: dict) -> bool:
+        """
+        :param node: AST evaluated against the element being filtered
+        :return: True if node only reads allowed fields of the element
+        """
+        node_type = node['type']
+        if node_type == 'literal':
+            return True
+        if node_type == 'field':
+            return node['value'] in self.fields and self.fields[node['value']] is None
+        if node_type in self._chains:
+            first, *rest = node['children']
+            if first['type'] == 'field' and rest and rest[0]['type'] == 'field' and self.fields.get(first['value']):
+                # Subfield of a field that may not be read whole
+                return first['value'] in self.fields and rest[0]['value'] not in self.fields[first['value']]
+            return self.reads_allowed(first)
+        if node_type in self._projections:
+            return self.reads_allowed(node['children'][0])
+        if node_type == 'function_expression' and node['value'] == 'let':
+            # let() evaluates its expression reference against the element
+            return False
+        if node_type in self._operators:
+            # Expression references are evaluated against the elements of other arguments
+            return all(child['type'] == 'expref' or self.reads_allowed(child) for child in node['children'])
+        # The element itself, or an index or slice of it
+        return False
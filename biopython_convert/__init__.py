@@ -5,51 +5,157 @@ Provides a means of querying/filtering documents using JMESPath query language.
 """
 import sys
 import pathlib
-import itertools
-import types
-from collections import defaultdict
+import warnings
+import functools
+import importlib
+import contextlib
+import collections
 
 import getopt
-from typing import Callable, Generator, OrderedDict
+from typing import Callable, Generator, NamedTuple, TYPE_CHECKING
 
-from Bio import SeqIO, StreamModeError, SeqFeature, Seq
-import gffutils
-from gffutils import biopython_integration
+from . import table, formats, writers, compression
+from .writers import gff_writer, text_writer, json_writer, jsonl_writer, get_yaml, yaml_writer, yaml_stream_writer
 
-from . import JMESPathGen
+if TYPE_CHECKING:
+    from Bio import SeqIO
+    from . import gff, seqindex
+
+# Imported on first use, so that starting up only imports Biopython, gffutils, and jmespath when the conversion needs them
+_lazy_submodules = ('JMESPathGen', 'gff', 'shard', 'serialize', 'info', 'seqindex', 'batch', 'serve', 'instrument',
+                    'progress', 'staged', 'fasta', 'fastq')
 
 gff_types = ['gff', 'gff3']
-extended_types = ['text', 'json', 'yaml', 'yml']
+extended_types = [name for name, f in formats.registry.items() if f.accepts != 'records']
 SeqIO_types = ['abi', 'abi-trim', 'ace', 'cif-atom', 'cif-seqres', 'clustal', 'embl', 'fasta', 'fasta-2line',
                'fastq-sanger', 'fastq', 'fastq-solexa', 'fastq-illumina', 'genbank', 'gb', 'ig', 'imgt', 'nexus',
                'pdb-seqres', 'pdb-atom', 'phd', 'phylip', 'pir', 'seqxml', 'sff', 'sff-trim', 'stockholm', 'swiss',
                'tab', 'qual', 'uniprot-xml']
-stat_annotations = ['molecule_type', 'topology', 'data_file_division', 'date', 'accessions', 'sequence_version', 'gi',
-                    'keywords', 'source', 'organism']
 
-JMESPathGenOptions = JMESPathGen.Options(custom_functions=JMESPathGen.ExtendedFunctions(), custom_slice_types=(SeqIO.SeqRecord,))
+
+def __getattr__(name: str):
+    # Module attributes that import their dependencies on first use
+    if name in _lazy_submodules:
+        return importlib.import_module(f".{name}", __name__)
+    if name == 'JMESPathGenOptions':
+        return _jmespath_options()
+    if name == 'stat_annotations':
+        from .info import stat_annotations
+        return stat_annotations
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@functools.lru_cache()
+def _jmespath_options(memory_budget: int = None):
+    from Bio import SeqIO
+    from . import JMESPathGen
+    return JMESPathGen.Options(custom_functions=JMESPathGen.ExtendedFunctions(), custom_slice_types=(SeqIO.SeqRecord,),
+                               memory_budget=memory_budget)
+
 
 usage = """\
-Use: biopython.convert [-s] [-v] [-i] [-q JMESPath] input_file input_type output_file output_type
+Use: biopython.convert [-s] [-v] [-i] [-I] [-r] [-x] [-j jobs] [-c cache_dir] [--yaml-safe] [--schema version] [--qualifiers names] [--gff-directives] [--gff-fasta] [--compress type] [--metrics report.json] [--profile profiler] [--progress] [--progress-json] [--query-memory MiB] [--cache-size MiB] [-q JMESPath] input_file input_type output_file output_type
+     biopython.convert --batch [options] manifest
+     biopython.convert --batch [options] input_glob input_type output_template output_type
+     biopython.convert --serve [-j jobs] [--socket path]
 \t-s Split records into seperate files
+\t-j Number of parallel processes. Default 1
 \t-q JMESPath to select records. Must return list of SeqIO records. Root is list of input SeqIO records.
+\t-r Apply the JMESPath to each input record individually. Root is a single SeqIO record.
+\t-x Keep an index of record offsets next to the input, or in the -c directory, so that JMESPath indexes, slices, and length(@) of the root only parse the records needed
+\t-c Directory to keep databases built from GFF input, to be reused by later runs on the same input
 \t-i Print out details of records during conversion
+\t-I As -i, also including the sequence composition of each record, followed by a summary of all records
 \t-v Print version and exit
-""" + "\nValid types: " + ', '.join(SeqIO_types + gff_types + extended_types) + "\n"
-
-
-def get_args(sysargs: list):
+\t--yaml-safe Use the faster YAML safe representer for yaml output. Output must only contain mappings, lists, and scalars.
+\t--schema Version of the json and yaml representation of records. Default 1
+\t--qualifiers Comma separated qualifiers to output as columns of feature tables. Default locus_tag,gene,product
+\t--gff-directives Include ##gff-version and ##sequence-region directives in gff3 output, and output a line per part of compound locations
+\t--gff-fasta As --gff-directives, also ending gff3 output with a ##FASTA section of the record sequences
+\t--compress Compression of outputs, one of none, gzip, bgzf, bz2, zstd. Default bgzf for .gz or .bgz, bz2 for .bz2, zstd for .zst, otherwise none
+\t--metrics Write a JSON report of the time taken by each stage of the conversion, counts of records, features, and bytes, and peak memory
+\t--profile Include a profile in the --metrics report, one of cprofile, tracemalloc
+\t--progress Print progress through the input, records and MB per second, and the time remaining to stderr
+\t--progress-json As --progress, printing a JSON line every 10 seconds
+\t--query-memory MiB of records to keep in memory when the JMESPath needs random access to them, beyond which they are kept in a temporary file. Default unlimited
+\t--cache-size MiB of databases to keep in the -c directory, beyond which the least recently used are removed. Default 10240
+""" + "\nInput types: " + ', '.join(formats.input_types()) + "\n" \
+    + "\nOutput types: " + ', '.join(formats.output_types()) + "\n"
+
+
+class Arguments(NamedTuple):
+    """
+    Command line arguments, see get_args(). Other than mode and socket_path, fields are the arguments of convert().
+    """
+    input_path: pathlib.Path
+    input_type: str
+    output_path: pathlib.Path
+    output_type: str
+    split: bool
+    jpath: str
+    stats: object
+    per_record: bool
+    cache: pathlib.Path
+    jobs: int
+    yaml_safe: bool
+    schema: int
+    qualifiers: tuple
+    composition: bool
+    gff_directives: bool
+    gff_fasta: bool
+    index: bool
+    compress: str
+    metrics: pathlib.Path
+    profile: str
+    progress: str
+    query_memory: int
+    cache_size: int
+    # One of 'convert', 'batch', or 'serve', selecting whether the arguments are passed to serve.client_main(),
+    # batch.main(), or only jobs to serve.serve()
+    mode: str
+    # Socket of the daemon, defaults to serve.default_socket_path()
+    socket_path: pathlib.Path
+
+    def convert_arguments(self) -> dict:
+        """
+        :return: keyword arguments of convert(), batch.main(), and serve.client_main()
+        """
+        arguments = self._asdict()
+        del arguments['mode'], arguments['socket_path']
+        return arguments
+
+
+def get_args(sysargs: list) -> Arguments:
     """
-    Parse command line arguments
+    Parse command line arguments. Prints the usage and exits if they are invalid.
     :param sysargs: list of command line arguments (sys.argv[1:])
-    :return: (input_path, input_type, output_path, output_type, split, jmespath, stats)
+    :return: Arguments. For a batch manifest or the daemon, input_path is the manifest or None and the other paths and
+        types are None.
     """
     split = False
     jpath = None
     stats = None
+    composition = False
+    per_record = False
+    cache = None
+    jobs = 1
+    yaml_safe = False
+    schema = 1
+    qualifiers = table.default_qualifiers
+    gff_directives = False
+    gff_fasta = False
+    index = False
+    compress = None
+    metrics = None
+    profile = None
+    progress = None
+    query_memory = None
+    cache_size = None
+    mode = 'convert'
+    socket_path = None
     # Parse arguments
     try:
-        opts, args = getopt.gnu_getopt(sysargs, 'vsiq:')
+        opts, args = getopt.gnu_getopt(sysargs, 'vsiIrxq:c:j:', ['yaml-safe', 'schema=', 'qualifiers=', 'gff-directives', 'gff-fasta', 'compress=', 'metrics=', 'profile=', 'progress', 'progress-json', 'query-memory=', 'cache-size=', 'batch', 'serve', 'socket='])
         for opt, val in opts:
             if opt == '-v':
                 from . import __version
@@ -63,13 +169,106 @@ def get_args(sysargs: list):
                 jpath = val
             elif opt == '-i':
                 stats = sys.stdout
+            elif opt == '-I':
+                stats = sys.stdout
+                composition = True
+            elif opt == '-r':
+                per_record = True
+            elif opt == '-x':
+                index = True
+            elif opt == '-c':
+                if not val:
+                    raise getopt.GetoptError("Cache directory must not be empty", "-c")
+                cache = pathlib.Path(val)
+            elif opt == '-j':
+                try:
+                    jobs = int(val)
+                except ValueError:
+                    jobs = 0
+                if jobs < 1:
+                    raise getopt.GetoptError("Number of jobs must be a positive integer", "-j")
+            elif opt == '--yaml-safe':
+                yaml_safe = True
+            elif opt == '--schema':
+                try:
+                    schema = int(val)
+                except ValueError:
+                    schema = 0
+                from . import serialize
+                if schema not in serialize.schemas:
+                    raise getopt.GetoptError("Schema must be one of " + ', '.join(map(str, serialize.schemas)), "--schema")
+            elif opt == '--qualifiers':
+                qualifiers = tuple(filter(None, val.split(',')))
+            elif opt == '--gff-directives':
+                gff_directives = True
+            elif opt == '--gff-fasta':
+                gff_directives = True
+                gff_fasta = True
+            elif opt == '--compress':
+                if val not in compression.compression_types:
+                    raise getopt.GetoptError("Compression must be one of " + ', '.join(compression.compression_types), "--compress")
+                compress = val
+            elif opt == '--metrics':
+                if not val:
+                    raise getopt.GetoptError("Metrics path must not be empty", "--metrics")
+                metrics = pathlib.Path(val)
+            elif opt == '--profile':
+                from . import instrument
+                if val not in instrument.profilers:
+                    raise getopt.GetoptError("Profiler must be one of " + ', '.join(instrument.profilers), "--profile")
+                profile = val
+            elif opt == '--progress':
+                progress = 'text'
+            elif opt == '--progress-json':
+                progress = 'json'
+            elif opt == '--query-memory':
+                try:
+                    query_memory = int(val)
+                except ValueError:
+                    query_memory = 0
+                if query_memory < 1:
+                    raise getopt.GetoptError("Query memory must be a positive integer", "--query-memory")
+                query_memory <<= 20
+            elif opt == '--cache-size':
+                try:
+                    cache_size = int(val)
+                except ValueError:
+                    cache_size = -1
+                if cache_size < 0:
+                    raise getopt.GetoptError("Cache size must be a non-negative integer", "--cache-size")
+                cache_size <<= 20
+            elif opt == '--batch':
+                mode = 'batch'
+            elif opt == '--serve':
+                mode = 'serve'
+            elif opt == '--socket':
+                if not val:
+                    raise getopt.GetoptError("Socket path must not be empty", "--socket")
+                socket_path = pathlib.Path(val)
+        if mode == 'batch' and stats:
+            raise getopt.GetoptError("Record details are not supported with --batch", "-i")
+        if mode == 'batch' and metrics:
+            raise getopt.GetoptError("Metrics are not supported with --batch", "--metrics")
+        if mode == 'batch' and progress:
+            raise getopt.GetoptError("Progress is not supported with --batch, which reports each job", "--progress")
+        if profile and not metrics:
+            raise getopt.GetoptError("Profiles are written to the --metrics report", "--profile")
+        if cache_size is not None and not cache:
+            raise getopt.GetoptError("Cache size limits the -c directory", "--cache-size")
 
     except getopt.GetoptError as err:
         print("Argument error(" + str(err.opt) + "): " + err.msg, file=sys.stderr)
-        args = []
+        print(usage, file=sys.stderr)
+        exit(1)
+
+    if (mode == 'batch' and len(args) == 1) or (mode == 'serve' and not args):
+        # Manifest, or daemon
+        return Arguments(pathlib.Path(args[0]) if args else None, None, None, None, split, jpath, stats, per_record,
+                         cache, jobs, yaml_safe, schema, qualifiers, composition, gff_directives, gff_fasta, index,
+                         compress, metrics, profile, progress, query_memory, cache_size, mode, socket_path)
 
     # Check for minimum number of arguments
-    if len(args) < 4:
+    if len(args) < 4 or (mode != 'convert' and len(args) > 4) or mode == 'serve':
         print(usage, file=sys.stderr)
         exit(1)
 
@@ -78,48 +277,28 @@ def get_args(sysargs: list):
     output_path = pathlib.Path(args[2])
     output_type = args[3]
 
-    return input_path, input_type, output_path, output_type, split, jpath, stats
+    if not formats.get(input_type).readable:
+        print(f"Unsupported input type: {input_type}", file=sys.stderr)
+        print(usage, file=sys.stderr)
+        exit(1)
+    if not formats.get(output_type).writable:
+        print(f"Unsupported output type: {output_type}", file=sys.stderr)
+        print(usage, file=sys.stderr)
+        exit(1)
+
+    return Arguments(input_path, input_type, output_path, output_type, split, jpath, stats, per_record, cache, jobs,
+                     yaml_safe, schema, qualifiers, composition, gff_directives, gff_fasta, index, compress, metrics,
+                     profile, progress, query_memory, cache_size, mode, socket_path)
 
 
-def to_stats(record: SeqIO.SeqRecord) -> str:
+def to_stats(record: 'SeqIO.SeqRecord') -> str:
     """
     Build GFF record representing summary of SeqRecord
     :param record: SeqIO.SeqRecord to represent
     :return: string containing GFF record
     """
-    # 'if' statements can be removed after https://github.com/daler/gffutils/pull/144
-    if record.name:
-        attributes = {'Name': [record.name]}
-    else:
-        attributes = {}
-    for k, v in record.annotations.items():
-        if k in stat_annotations:
-            if isinstance(v, list):
-                v = [str(a) for a in v]
-            else:
-                v = [str(v)]
-            if v:
-                attributes[k] = v
-
-    feat_count = defaultdict(int)
-    for f in record.features:
-        if f.type == 'source':
-            # Include source coordinate
-            attributes[f"source__location"] = [str(part) for part in f.location.parts]
-            # Include source qualifiers
-            for k, v in f.qualifiers.items():
-                attr = attributes.get(f"source_{k}", [])
-                if not isinstance(attr, list):
-                    attr = [attr]
-                attr.append(v)
-                attributes[f"source_{k}"] = attr
-        # Count features of each type
-        feat_count[f.type] += 1
-    attributes['features'] = [f"{k}:{v}" for k, v in feat_count.items()]
-
-    if record.description:
-        attributes['desc'] = [record.description]
-    return str(gffutils.Feature(record.id, "biopython.convert", "sequence", start=1, end=len(record), attributes=attributes))
+    from . import info
+    return info.format_line(record.id, 1, len(record), info.record_attributes(record))
 
 
 def _allow_single(records):
@@ -128,6 +307,7 @@ def _allow_single(records):
     :param records: SeqIO.SeqRecord instance
     :return: tuple containing SeqIO.SeqRecord
     """
+    from Bio import SeqIO
     if isinstance(records, SeqIO.SeqRecord):
         # Support returning single record from JMESPath
         return (records,)
@@ -140,6 +320,7 @@ def _to_SeqRecord(record):
     :param record: dict of SeqRecord constructor parameters
     :return: SeqRecord
     """
+    from Bio import SeqIO, Seq
     seq = record.get('seq', {})
     del record['seq']
     if isinstance(seq, str):
@@ -162,7 +343,36 @@ def _to_SeqRecords(records):
 
     return map(lambda r: _to_SeqRecord(r) if isinstance(r, dict) else r, records)
 
-def get_records(input_handle, input_type: str, jpath: str = '', xform: Callable = _to_SeqRecords):
+
+def _as_item(result):
+    """
+    Helper to treat each per-record JMESPath result as a single output item
+    :param result: JMESPath result
+    :return: tuple containing result
+    """
+    return (result,)
+
+
+def _search_each(records, jpath: str, xform: Callable, query_memory: int = None):
+    """
+    Apply JMESPath to each record individually, keeping at most one input record in memory
+    :param records: iterable of SeqIO.SeqRecord
+    :param jpath: JMESPath to apply to each record. The root is a single record.
+    :param xform: Callable applied to each result to produce an iterable of output records
+    :param query_memory: see get_records()
+    :return: generator of output records
+    """
+    from . import JMESPathGen
+    expression = JMESPathGen.compile(jpath, closures=True)
+    options = _jmespath_options(query_memory)
+    for record in records:
+        result = expression.search(record, options)
+        if result is not None:
+            yield from xform(result)
+
+
+def get_records(input_handle, input_type: str, jpath: str = '', xform: Callable = _to_SeqRecords, per_record: bool = False,
+                gff_cache: 'gff.DBCache' = None, indexed: 'seqindex.IndexedRecords' = None, query_memory: int = None):
     """
     Read in records and apply optional jmespath
     :param input_handle: File handle to read data from
@@ -170,7 +380,13 @@ def get_records(input_handle, input_type: str, jpath: str = '', xform: Callable
         fastq-solexa,fastq-illumina,genbank,gb,ig,imgt,nexus,pdb-seqres,pdb-atom,phd,phylip,pir,seqxml,sff,sff-trim,
         stockholm,swiss,tab,qual,uniprot-xml,gff3
     :param jpath: JMESPath selecting records to keep. The root is the list of records. The path must return a list of records.
+        May be compiled with JMESPathGen.compile().
     :param xform: Callable that takes the result of the jmespath and does anything necessary to convert to a iterable of output records
+    :param per_record: Apply jpath to each record individually rather than the list of all records. xform is applied to each result.
+    :param gff_cache: gff.DBCache to load GFF input from
+    :param indexed: seqindex.IndexedRecords of the input, used as the root of jpath instead of parsing input_handle
+    :param query_memory: Bytes of pickled records to keep in memory when jpath needs random access to them, beyond which
+        they are kept in a temporary file. Unlimited if None.
     :return: iterable of resulting records
     """
     def gentype(x):
@@ -178,23 +394,48 @@ def get_records(input_handle, input_type: str, jpath: str = '', xform: Callable
         for a in x:
             yield a
 
-    if input_type in gff_types:
-        # If input is GFF load with gffutils library
-        db = gffutils.create_db(input_handle, ":memory:", merge_strategy="create_unique")
-        # Wrap features in generator that converts to BioPython SeqRecords
-        input_records = map(
-            lambda x: SeqIO.SeqRecord("", features=list(x)),
-            itertools.groupby(
-                map(biopython_integration.to_seqfeature, db.all_features(order_by="seqid")),
-                lambda x: x.id
-            )
-        )
+    if indexed is not None:
+        input_records = indexed
+    elif input_type in gff_types:
+        if gff_cache:
+            input_records = gff_cache.parse(input_handle)
+        else:
+            # If input is GFF stream a record per seqid, falling back to a gffutils database if not grouped by seqid
+            from . import gff
+            input_records = gff.parse(input_handle)
     else:
-        input_records = SeqIO.parse(input_handle, input_type)
+        keep = None
+        if jpath and not per_record:
+            # Skip the features and sequence of records rejected by a filter of their header
+            from . import staged
+            keep = staged.header_filter(jpath, input_type, _jmespath_options())
+        if keep:
+            input_records = staged.parse(input_handle, input_type, keep)
+        else:
+            from Bio import SeqIO
+            input_records = SeqIO.parse(input_handle, input_type)
+    if indexed is None:
+        from . import instrument, progress
+        input_records = progress.counted(instrument.timed(input_records, 'parse', instrument.count_input))
 
     # Wrap input in JMESPath selector if provided
+    if jpath and per_record:
+        return _search_each(input_records, jpath, xform, query_memory)
     if jpath:
-        input_records = JMESPathGen.search(jpath, gentype(input_records), JMESPathGenOptions)
+        from . import JMESPathGen
+        expression = JMESPathGen.compile(jpath, closures=True)
+        random_access = isinstance(input_records, JMESPathGen.RandomAccessList)
+        plan = JMESPathGen.plan(expression, random_access)
+        if not plan.streamable and query_memory is None:
+            warnings.warn(f"Query loads all input records into memory, consider -r or --query-memory. {plan}",
+                          JMESPathGen.MaterializationWarning)
+        input_records = expression.search(input_records if random_access else gentype(input_records),
+                                          _jmespath_options(query_memory))
+        if isinstance(input_records, JMESPathGen.RandomAccessList):
+            # The root list itself is output, stream it
+            input_records = gentype(input_records)
+    elif indexed is not None:
+        input_records = gentype(input_records)
 
     # Apply xform to both entire return value
     input_records = xform(input_records)
@@ -215,32 +456,19 @@ def _generate_suffixes(path: pathlib.Path) -> Generator[pathlib.Path, None, None
         i += 1
 
 
-def gff_writer(records: [SeqIO.SeqRecord], handle, output_type: str):
-    """
-    Convert SeqRecord to gffutils GFF3 record and output to handle
-    :param handle: file handle to write to
-    :param records: iterable of SeqRecord instances
-    :param output_type: output format, ignored
-    :return: None
-    """
-    for record in records:
-        # TODO extend gffutils SeqFeature support
-        for feature in record.features:
-            feature = biopython_integration.from_seqfeature(feature)
-            feature.seqid = record.id
-            feature.source = 'biopython.convert'
-            print(feature, file=handle)
-
-
 def _print_stats(record, stats):
     """
     Helper to print stats of record
     :param record: SeqRecord to print stats of
-    :param stats: IO handle or None
+    :param stats: info.Report or None
     :return: record, unaltered
     """
-    if stats and isinstance(record, SeqIO.SeqRecord):
-        print(to_stats(record), file=stats)
+    if stats:
+        from Bio import SeqIO
+        from . import instrument
+        if isinstance(record, SeqIO.SeqRecord):
+            with instrument.stage('stats'):
+                stats.add(record)
     return record
 
 
@@ -248,81 +476,143 @@ def to_strings(v):
     """
     Helper to recursively convert Generators to lists, stringifing all else
     :param v: Parent object/list
-    :return: list/dict with all children converted to the same or a string
+    :return: list/dict with all children converted to the same or a string. v is not modified.
     """
-    if isinstance(v, str):
-        return v
+    from . import serialize
+    return serialize.text(v)
 
-    if isinstance(v, (types.GeneratorType, map, filter, tuple)):
-        v = list(v)
 
-    if hasattr(v, 'keys'):
-        keys = v.keys()
-    elif hasattr(v, '__getitem__'):
-        keys = range(len(v))
-    else:
-        return str(v)
+def to_dicts(v, schema: int = 1):
+    """
+    Helper to recursively convert Objects and Generators to dicts and lists
+    :param v: Parent object/list
+    :param schema: version of the representation of records, see serialize
+    :return: list/dict with all children converted to the same. v is not modified.
+    """
+    from . import serialize
+    return serialize.schemas[schema](v)
+
 
-    for i in keys:
-        v[i] = to_strings(v[i])
-    return v
+def _get_xform(output_type: str, per_record: bool = False) -> Callable:
+    """
+    Select the conversion of query results to what the writer of output_type accepts
+    :param output_type: Format of output dataset
+    :param per_record: JMESPath is applied to each input record individually
+    :return: xform to pass to get_records()
+    """
+    accepts = formats.get(output_type).accepts
+    if accepts == 'records':
+        return _to_SeqRecords
+    if per_record:
+        return _as_item
+    if accepts == 'results':
+        return _allow_single
+    return lambda x: x
 
 
-def to_dicts(v):
+def _write_split(record, path: pathlib.Path, output_type: str, options: writers.Options = writers.Options()):
     """
-    Helper to recursively convert Objects and Generators to dicts and lists
-    :param v: Parent object/list
-    :return: list/dict with all children converted to the same
+    Write a single record to its own output file. Outputs of records without a defined sequence are removed.
+    :param record: output record
+    :param path: output path
+    :param output_type: Format of output dataset
+    :param options: writer options
+    :return: None
     """
-    if isinstance(v, str):
-        try:
-            return int(v)
-        except ValueError:
-            pass
-        return v
-
-    if isinstance(v, Seq.Seq):
-        return str(v)
-
-    if isinstance(v, (types.GeneratorType, map, filter, tuple)):
-        v = list(v)
-
-    if isinstance(v, SeqIO.SeqRecord):
-        v = {
-            **v.__dict__,
-            'seq': str(v.seq)
-        }
-        del v['_seq']
-    elif isinstance(v, SeqFeature.FeatureLocation):
-        v = {
-            **v.__dict__,
-            'start': v.start,
-            'end': v.end,
-            'strand': v.strand,
-        }
-        del v['_start']
-        del v['_end']
-        del v['_strand']
-    elif isinstance(v, SeqFeature.AbstractPosition):
-        return to_dicts(str(v))
-    elif isinstance(v, OrderedDict):
-        v = dict(v)
-    elif hasattr(v, '__dict__'):
-        v = v.__dict__
-
-    if hasattr(v, 'keys'):
-        keys = v.keys()
-    elif hasattr(v, '__getitem__'):
-        keys = range(len(v))
-    else:
-        return v
+    from Bio import Seq
+    output_format = formats.get(output_type)
+    try:
+        with compression.open_output(path, 'w' + output_format.mode, options.compression) as output_handle:
+            output_format.writer((record,), output_handle, output_type, options)
+    except Seq.UndefinedSequenceError:
+        path.unlink(True)
 
-    for i in keys:
-        v[i] = to_dicts(v[i])
-    return v
+
+def _write(records, path: pathlib.Path, output_type: str, stats=None, options: writers.Options = writers.Options()) -> bool:
+    """
+    Write all records to a single output file. Output stops at the first record without a defined sequence.
+    :param records: iterable of output records
+    :param path: output path
+    :param output_type: Format of output dataset
+    :param stats: info.Report of output records
+    :param options: writer options
+    :return: False if output stopped at a record without a defined sequence, otherwise True
+    """
+    from Bio import Seq
+    output_format = formats.get(output_type)
+    try:
+        with compression.open_output(path, 'w' + output_format.mode, options.compression) as output_handle:
+            output_format.writer(
+                map(
+                    lambda r: _print_stats(r, stats),
+                    records
+                ),
+                output_handle,
+                output_type,
+                options
+            )
+    except Seq.UndefinedSequenceError:
+        return False
+    return True
 
 
-def convert(input_path: pathlib.Path, input_type: str, output_path: pathlib.Path, output_type: str, split: bool = False, jpath: str = '', stats=None):
+def _picklable(record, output_type: str, options: writers.Options = writers.Options()):
+    """
+    Helper to convert generators within query results so that they can be sent to another process
+    :param record: output record
+    :param output_type: Format of output dataset
+    :param options: writer options
+    :return: record, or record converted the same way the writer of output_type would
+    """
+    from Bio import SeqIO
+    accepts = formats.get(output_type).accepts
+    if accepts != 'records' and not isinstance(record, SeqIO.SeqRecord):
+        return to_strings(record) if accepts == 'text' else to_dicts(record, options.schema)
+    return record
+
+
+def _progress(handle, style: str = None):
+    """
+    :param handle: input file handle
+    :param style: one of progress.styles, or None
+    :return: context reporting the progress of reading handle if style is given
+    """
+    if not style:
+        return contextlib.nullcontext()
+    from . import progress
+    return progress.report(handle, style)
+
+
+def _write_split_parallel(records, paths, output_type: str, jobs: int, stats=None,
+                          options: writers.Options = writers.Options()):
+    """
+    Write each record to its own output file using a pool of worker processes
+    At most 2 * jobs records are queued at any time. Stats are printed in input order as records are queued.
+    :param records: iterable of output records
+    :param paths: iterable of output paths
+    :param output_type: Format of output dataset
+    :param jobs: number of worker processes
+    :param stats: info.Report of output records
+    :param options: writer options
+    :return: None
+    """
+    import concurrent.futures
+    pending = collections.deque()
+    with concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+        for record, path in zip(records, paths):
+            _print_stats(record, stats)
+            pending.append(pool.submit(_write_split, _picklable(record, output_type, options), path, output_type, options))
+            if len(pending) >= 2 * jobs:
+                # Raise worker exceptions in input order
+                pending.popleft().result()
+        while pending:
+            pending.popleft().result()
+
+
+def convert(input_path: pathlib.Path, input_type: str, output_path: pathlib.Path, output_type: str, split: bool = False, jpath: str = '', stats=None, per_record: bool = False, cache: pathlib.Path = None, jobs: int = 1, yaml_safe: bool = False, schema: int = 1,
+            qualifiers: tuple = table.default_qualifiers, composition: bool = False, gff_directives: bool = False,
+            gff_fasta: bool = False, index: bool = False, compress: str = None, metrics: pathlib.Path = None,
+            profile: str = None, progress: str = None, query_memory: int = None, cache_size: int = None):
     """
     Convert document from one format to another, optionally querying via JMESPath or splitting into separate outputs
     :param input_path: Path to input dataset
@@ -330,67 +620,130 @@ def convert(input_path: pathlib.Path, input_type: str, output_path: pathlib.Path
     :param output_path: Path to output dataset
     :param output_type: Format of output dataset
     :param split: Split each record into a different output dataset. Adds index suffix to output path.
-    :param jpath: JMESPath query to apply to input dataset before outputting
+    :param jpath: JMESPath query to apply to input dataset before outputting, or the result of JMESPathGen.compile()
     :param stats: File handle to output GFF3 summary of output records
+    :param per_record: Apply jpath to each input record individually
+    :param cache: Directory to keep databases built from GFF input between runs
+    :param jobs: Number of worker processes. Used to write split outputs, or to convert ranges of the input in parallel.
+    :param yaml_safe: Use the faster YAML safe representer. Output must only contain mappings, lists, and scalars.
+    :param schema: Version of the json and yaml representation of records, see serialize
+    :param qualifiers: Qualifiers to output as columns of feature tables
+    :param composition: Include the sequence composition of each record in the GFF3 summary, followed by a summary of all
+        records
+    :param gff_directives: Include ##gff-version and ##sequence-region directives in GFF3 output, and output a line per part
+        of compound locations
+    :param gff_fasta: End GFF3 output with a ##FASTA section of the record sequences. Implies gff_directives.
+    :param index: Keep an index of record offsets next to the input, or in cache, for jpath to access records by position
+    :param compress: Compression of outputs, one of compression.compression_types. Chosen by the output suffix if None.
+        The compression of the input is detected.
+    :param metrics: Path to write a JSON report of the time taken by each stage, counts of records, features, and bytes,
+        and peak memory, see instrument. Written even if the conversion fails.
+    :param profile: Include a profile of the conversion in the metrics report, one of instrument.profilers
+    :param progress: Report progress through the input on stderr, one of progress.styles. Not reported for sharded
+        conversions.
+    :param query_memory: Bytes of pickled records to keep in memory when jpath needs random access to them, beyond which
+        they are kept in a temporary file. Unlimited if None.
+    :param cache_size: Bytes of databases to keep in cache, see gff.DBCache. 10 GiB if None.
     :return: None
     """
-    xform = _to_SeqRecords
-    with input_path.open("r") as handle:
-        if output_type == 'text':
-            writer = lambda records, fh, t: fh.write("\n".join(map(str, to_strings(records))) + "\n")
-            xform = lambda x: x
-        elif output_type == 'json':
-            import json
-            writer = lambda records, fh, t: json.dump(to_dicts(records), fh, skipkeys=True, indent=True)
-            xform = _allow_single
-        elif output_type in ('yml', 'yaml'):
-            from ruamel.yaml import YAML
-            yml = YAML(typ='unsafe')
-            writer = lambda records, fh, t: yml.dump(to_dicts(records), fh)
-            xform = _allow_single
-        elif output_type in gff_types:
-            writer = gff_writer
-        else:
-            writer = SeqIO.write
-
-        if stats:
-            print("##gff-version 3", file=stats)
-
-        seq_records = get_records(handle, input_type, jpath, xform)
-        binary = ''
-        if split:
-            for record, path in zip(seq_records, _generate_suffixes(output_path)):
-                _print_stats(record, stats)
-                while True:
-                    try:
-                        with path.open('w' + binary) as output_handle:
-                            writer((record,), output_handle, output_type)
-                    except StreamModeError:
-                        if binary == 'b':
-                            raise
-                        binary = 'b'
-                        continue
-                    except Seq.UndefinedSequenceError:
-                        path.unlink(True)
-                    break
-        else:
-            while True:
-                try:
-                    with output_path.open('w' + binary) as output_handle:
-                        writer(
-                            map(
-                                lambda r: _print_stats(r, stats),
-                                seq_records
-                            ),
-                            output_handle,
-                            output_type
-                        )
-                except StreamModeError:
-                    if binary == 'b':
-                        raise
-                    binary = 'b'
-                    continue
-                except Seq.UndefinedSequenceError:
-                    pass
-                break
+    if metrics:
+        from . import instrument
+        measured = instrument.Metrics(profile)
+        try:
+            with measured.measure():
+                _convert(input_path, input_type, output_path, output_type, split, jpath, stats, per_record, cache,
+                         jobs, yaml_safe, schema, qualifiers, composition, gff_directives, gff_fasta, index, compress,
+                         progress, query_memory, cache_size)
+        except Exception as e:
+            measured.write(metrics, input_path, input_type, output_path, output_type, f"{type(e).__name__}: {e}")
+            raise
+        measured.write(metrics, input_path, input_type, output_path, output_type)
+    else:
+        _convert(input_path, input_type, output_path, output_type, split, jpath, stats, per_record, cache, jobs,
+                 yaml_safe, schema, qualifiers, composition, gff_directives, gff_fasta, index, compress, progress,
+                 query_memory, cache_size)
 
+
+def _convert(input_path: pathlib.Path, input_type: str, output_path: pathlib.Path, output_type: str, split: bool,
+             jpath: str, stats, per_record: bool, cache: pathlib.Path, jobs: int, yaml_safe: bool, schema: int,
+             qualifiers: tuple, composition: bool, gff_directives: bool, gff_fasta: bool, index: bool, compress: str,
+             progress: str, query_memory: int, cache_size: int):
+    """
+    Implementation of convert(), see its parameters
+    """
+    from . import instrument
+    input_format = formats.get(input_type)
+    output_format = formats.get(output_type)
+    options = writers.Options(yaml_safe, schema, tuple(qualifiers), gff_directives or gff_fasta, gff_fasta, compress)
+    if not jpath and not input_format.sequence and output_format.sequence:
+        warnings.warn(f"{input_type} input has no sequences, {output_type} output stops at the first record")
+
+    if stats:
+        from . import info
+        stats = info.Report(stats, composition)
+
+    if not (jpath or split or stats or progress):
+        from . import fasta, fastq
+        for fast_path in (fasta, fastq):
+            if fast_path.supported(input_path, input_type, output_type):
+                instrument.output(output_path)
+                with instrument.stage('write'):
+                    count = fast_path.convert(input_path, input_type, output_path, output_type, options.compression)
+                instrument.count(records_in=count, records_out=count)
+                return
+
+    if jobs > 1 and not split:
+        from . import shard
+        if shard.supported(input_path, input_type, output_type, jpath, per_record, options):
+            if stats:
+                print("##gff-version 3", file=stats.handle)
+            with instrument.stage('shard'):
+                shard.convert_sharded(input_path, input_type, output_path, output_type, jpath, stats, per_record, jobs,
+                                      options)
+            instrument.output(output_path)
+            if stats:
+                stats.write_summary()
+            return
+
+    xform = _get_xform(output_type, per_record)
+    indexed = None
+    if index and jpath and not per_record and input_type not in gff_types:
+        from . import seqindex
+        try:
+            with instrument.stage('index'):
+                indexed = seqindex.IndexedRecords(input_path, input_type, seqindex.index_path(input_path, cache))
+        except (ValueError, OSError) as e:
+            warnings.warn(f"Unable to index {input_type} input, reading sequentially: {e}")
+    try:
+        with compression.open_input(input_path, 'r' + input_format.mode) as handle, _progress(handle, progress):
+            if stats:
+                print("##gff-version 3", file=stats.handle)
+
+            with warnings.catch_warnings():
+                if jpath and not output_format.streaming:
+                    # The writer loads all records regardless of the query
+                    from . import JMESPathGen
+                    warnings.simplefilter('ignore', JMESPathGen.MaterializationWarning)
+                gff_cache = None
+                if cache:
+                    from . import gff
+                    gff_cache = gff.DBCache(cache) if cache_size is None else gff.DBCache(cache, cache_size)
+                seq_records = get_records(handle, input_type, jpath, xform, per_record, gff_cache, indexed,
+                                          query_memory)
+            seq_records = instrument.timed(seq_records, 'query' if jpath else None, instrument.count_output)
+            paths = instrument.timed(_generate_suffixes(output_path), counter=instrument.add_output)
+            with instrument.stage('write'):
+                if split and jobs > 1:
+                    _write_split_parallel(seq_records, paths, output_type, jobs, stats, options)
+                elif split:
+                    for record, path in zip(seq_records, paths):
+                        _print_stats(record, stats)
+                        _write_split(record, path, output_type, options)
+                else:
+                    instrument.output(output_path)
+                    _write(seq_records, output_path, output_type, stats, options)
+    finally:
+        if indexed is not None:
+            indexed.close()
+    if stats:
+        stats.write_summary()
@@ -1,10 +1,16 @@
 #!/usr/bin/env python
 import sys
 
-from . import get_args, convert
+from . import get_args, batch, serve
 
 def main():
-    convert(*get_args(sys.argv[1:]))
+    arguments = get_args(sys.argv[1:])
+    if arguments.mode == 'batch':
+        exit(batch.main(**arguments.convert_arguments()))
+    if arguments.mode == 'serve':
+        serve.serve(arguments.socket_path, arguments.jobs)
+        return
+    exit(serve.client_main(arguments.socket_path, **arguments.convert_arguments()))
 
 if __name__ == "__main__":
     main()
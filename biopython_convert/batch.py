@@ -0,0 +1,200 @@
+"""
+Batch conversion
+Converts many inputs in one invocation, paying for imports and query compilation once rather than per input. Jobs are
+listed in a manifest or expanded from a glob, and run by a pool of worker processes. A job that fails is reported and
+the batch continues.
+"""
+import sys
+import csv
+import glob
+import json
+import time
+import pathlib
+import collections
+from typing import NamedTuple, List
+
+columns = ('input_file', 'input_type', 'output_file', 'output_type')
+report_columns = ('input_file', 'output_file', 'status', 'seconds', 'error')
+
+
+class Job(NamedTuple):
+    input_path: pathlib.Path
+    input_type: str
+    output_path: pathlib.Path
+    output_type: str
+
+
+class Result(NamedTuple):
+    job: Job
+    ok: bool
+    seconds: float
+    error: str = ''
+
+    def row(self) -> tuple:
+        """
+        :return: values of report_columns
+        """
+        # Keep the report one line per job
+        error = ' '.join(self.error.split())
+        return (str(self.job.input_path), str(self.job.output_path), 'ok' if self.ok else 'failed',
+                f"{self.seconds:.3f}", error)
+
+
+def read_manifest(path: pathlib.Path) -> List[Job]:
+    """
+    Read the jobs listed in a manifest
+    JSON manifests (.json) are a list of objects with the keys input_file, input_type, output_file, and output_type.
+    Otherwise the manifest is tab separated values in that column order. Blank lines and lines starting with # are
+    skipped.
+    :param path: path to manifest
+    :return: list of jobs
+    :raises ValueError: if an entry is missing a column
+    """
+    if path.suffix.lower() == '.json':
+        with path.open() as handle:
+            entries = json.load(handle)
+        try:
+            rows = [tuple(entry[column] for column in columns) for entry in entries]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"{path}: every entry must be an object with the keys {', '.join(columns)}") from e
+    else:
+        rows = []
+        with path.open(newline='') as handle:
+            for line, row in enumerate(csv.reader(handle, delimiter='\t'), 1):
+                if not row or not ''.join(row).strip() or row[0].startswith('#'):
+                    continue
+                if len(row) != len(columns):
+                    raise ValueError(f"{path}:{line}: expected {len(columns)} tab separated columns, {', '.join(columns)}")
+                rows.append(row)
+    return _check([Job(pathlib.Path(i), it, pathlib.Path(o), ot) for i, it, o, ot in rows])
+
+
+def glob_jobs(pattern: str, input_type: str, output_template: str, output_type: str) -> List[Job]:
+    """
+    Create a job for each file matching a glob
+    :param pattern: glob of input paths, ** matches any number of directories
+    :param input_type: Format of inputs
+    :param output_template: output path, formatted with {name}, {stem}, and {parent} of each input path
+    :param output_type: Format of outputs
+    :return: list of jobs in sorted input path order
+    :raises ValueError: if the template has other fields, or more than one input maps to the same output path
+    """
+    jobs = []
+    for input_file in sorted(glob.glob(pattern, recursive=True)):
+        input_path = pathlib.Path(input_file)
+        if not input_path.is_file():
+            continue
+        try:
+            output_path = pathlib.Path(output_template.format(name=input_path.name, stem=input_path.stem,
+                                                              parent=input_path.parent))
+        except (KeyError, IndexError) as e:
+            raise ValueError(f"Output template {output_template} may only contain {{name}}, {{stem}}, and {{parent}}") from e
+        jobs.append(Job(input_path, input_type, output_path, output_type))
+    return _check(jobs)
+
+
+def _check(jobs: List[Job]) -> List[Job]:
+    seen = {}
+    for job in jobs:
+        if job.output_path in seen:
+            raise ValueError(f"{seen[job.output_path]} and {job.input_path} are both output to {job.output_path}")
+        seen[job.output_path] = job.input_path
+    return jobs
+
+
+def run_job(job: Job, options: dict) -> Result:
+    """
+    Convert a single job, catching any failure. The directory of the output is created if missing.
+    :param job: job to convert
+    :param options: keyword arguments to pass to convert()
+    :return: Result
+    """
+    from . import convert
+    start = time.perf_counter()
+    try:
+        job.output_path.parent.mkdir(parents=True, exist_ok=True)
+        convert(job.input_path, job.input_type, job.output_path, job.output_type, **options)
+    except Exception as e:
+        return Result(job, False, time.perf_counter() - start, f"{type(e).__name__}: {e}")
+    return Result(job, True, time.perf_counter() - start)
+
+
+def run(jobs: List[Job], workers: int = 1, report=None, jpath: str = '', **options) -> List[Result]:
+    """
+    Run jobs, in a pool of worker processes if workers > 1
+    At most 2 * workers jobs are queued at any time. Results are reported in job order as they complete.
+    :param jobs: list of jobs
+    :param workers: number of worker processes
+    :param report: file handle to write a tab separated line of report_columns per job to, following a header line
+    :param jpath: JMESPath query applied to every job, compiled once
+    :param options: keyword arguments to pass to convert() for every job
+    :return: list of Result in job order
+    """
+    import concurrent.futures
+    from . import JMESPathGen
+    if jpath:
+        options['jpath'] = JMESPathGen.compile(jpath)
+    if report:
+        print(*report_columns, sep='\t', file=report)
+
+    results = []
+
+    def record(result: Result):
+        results.append(result)
+        if report:
+            print(*result.row(), sep='\t', file=report, flush=True)
+
+    if workers <= 1:
+        for job in jobs:
+            record(run_job(job, options))
+        return results
+    pending = collections.deque()
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        for job in jobs:
+            pending.append(pool.submit(run_job, job, options))
+            if len(pending) >= 2 * workers:
+                record(pending.popleft().result())
+        while pending:
+            record(pending.popleft().result())
+    return results
+
+
+def main(input_path: pathlib.Path, input_type: str, output_path: pathlib.Path, output_type: str, split: bool = False,
+         jpath: str = '', stats=None, per_record: bool = False, cache: pathlib.Path = None, jobs: int = 1,
+         yaml_safe: bool = False, schema: int = 1, qualifiers: tuple = None, composition: bool = False,
+         gff_directives: bool = False, gff_fasta: bool = False, index: bool = False, compress: str = None,
+         metrics: pathlib.Path = None, profile: str = None, progress: str = None,
+         query_memory: int = None, cache_size: int = None) -> int:
+    """
+    Run a batch from the command line arguments returned by get_args()
+    Arguments are those of convert(), other than:
+    :param input_path: manifest if input_type is None, otherwise a glob of inputs, see glob_jobs()
+    :param output_path: output template, see glob_jobs()
+    :param stats: not supported, must be None
+    :param metrics: not supported, must be None
+    :param profile: not supported, must be None
+    :param progress: not supported, must be None
+    :param jobs: number of worker processes
+    :return: exit status, 1 if any job failed. The report is written to stdout.
+    """
+    try:
+        if input_type is None:
+            batch = read_manifest(input_path)
+        else:
+            batch = glob_jobs(str(input_path), input_type, str(output_path), output_type)
+    except (ValueError, OSError) as e:
+        print(f"Unable to read batch: {e}", file=sys.stderr)
+        return 1
+    if not batch:
+        print(f"No jobs in batch {input_path}", file=sys.stderr)
+        return 1
+    options = dict(split=split, per_record=per_record, cache=cache, yaml_safe=yaml_safe, schema=schema,
+                   gff_directives=gff_directives, gff_fasta=gff_fasta, index=index, compress=compress,
+                   query_memory=query_memory, cache_size=cache_size)
+    if qualifiers is not None:
+        options['qualifiers'] = qualifiers
+    results = run(batch, jobs, sys.stdout, jpath, **options)
+    failed = sum(not result.ok for result in results)
+    if failed:
+        print(f"{failed} of {len(results)} jobs failed", file=sys.stderr)
+    return 1 if failed else 0
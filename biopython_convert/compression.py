@@ -0,0 +1,344 @@
+"""
+Compressed input and output
+Input compression is detected from the leading bytes of the file, output compression is chosen by the output suffix or
+explicitly. BGZF, the blocked gzip format used by samtools and Biopython, is compressed and decompressed a block at a
+time across a pool of threads, zlib releasing the GIL while it works. BGZF output is also valid gzip, and can be
+indexed by Bio.SeqIO.index_db().
+"""
+import io
+import os
+import bz2
+import gzip
+import zlib
+import struct
+import pathlib
+import collections
+
+compression_types = ['none', 'gzip', 'bgzf', 'bz2', 'zstd']
+
+suffixes = {
+    '.gz': 'bgzf',
+    '.bgz': 'bgzf',
+    '.bz2': 'bz2',
+    '.zst': 'zstd',
+}
+
+_gzip_magic = b'\x1f\x8b'
+_bz2_magic = b'BZh'
+_zstd_magic = b'\x28\xb5\x2f\xfd'
+
+# Largest block of uncompressed data in a BGZF block, leaving room for incompressible data, the same as Bio.bgzf
+bgzf_block_size = 65280
+_bgzf_header = b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00'
+_bgzf_eof = b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+
+
+def default_threads() -> int:
+    return os.cpu_count() or 1
+
+
+def detect(path: pathlib.Path) -> str:
+    """
+    Detect the compression of a file from its leading bytes
+    :param path: path to file
+    :return: one of compression_types
+    """
+    with path.open('rb') as handle:
+        header = handle.read(18)
+    if header.startswith(_gzip_magic):
+        return 'bgzf' if _bgzf_extra(header) else 'gzip'
+    if header.startswith(_bz2_magic):
+        return 'bz2'
+    if header.startswith(_zstd_magic):
+        return 'zstd'
+    return 'none'
+
+
+def from_suffix(path: pathlib.Path) -> str:
+    """
+    Choose the compression of an output from its suffix
+    :param path: output path
+    :return: one of compression_types
+    """
+    return suffixes.get(path.suffix.lower(), 'none')
+
+
+def _bgzf_extra(header: bytes) -> bool:
+    # FEXTRA flag set with a BC subfield, which samtools always writes first
+    return len(header) >= 16 and header[3] & 4 and header[12:14] == b'BC'
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstd compression requires zstandard, install biopython.convert[zstd]") from e
+    return zstandard
+
+
+def _inflate(block: bytes) -> bytes:
+    """
+    Decompress a BGZF block
+    :param block: whole block including header and trailer
+    :return: uncompressed data
+    """
+    xlen, = struct.unpack_from('<H', block, 10)
+    crc, size = struct.unpack_from('<II', block, len(block) - 8)
+    try:
+        data = zlib.decompress(block[12 + xlen:-8], -15)
+    except zlib.error as e:
+        raise ValueError(f"Corrupt BGZF block, {e}") from e
+    if len(data) != size or zlib.crc32(data) != crc:
+        raise ValueError("Corrupt BGZF block, CRC or length mismatch")
+    return data
+
+
+def _deflate(data: bytes, level: int) -> bytes:
+    """
+    Compress a BGZF block
+    :param data: at most bgzf_block_size bytes
+    :param level: zlib compression level
+    :return: whole block including header and trailer
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    return b''.join((_bgzf_header, struct.pack('<H', len(compressed) + 25), compressed,
+                     struct.pack('<II', zlib.crc32(data), len(data))))
+
+
+class BgzfReader(io.RawIOBase):
+    """
+    Read BGZF, decompressing blocks ahead of the reader in a thread pool
+    Seeking is supported by decompressing from the start of the file, to allow the input to be scanned more than once.
+    """
+    def __init__(self, path: pathlib.Path, threads: int = None):
+        """
+        :param path: path of BGZF file
+        :param threads: number of decompression threads, defaults to the number of CPUs
+        """
+        import concurrent.futures
+        super().__init__()
+        self.name = str(path)
+        self._handle = path.open('rb')
+        self._threads = threads or default_threads()
+        self._pool = concurrent.futures.ThreadPoolExecutor(self._threads)
+        self._pending = collections.deque()
+        self._buffer = memoryview(b'')
+        self._position = 0
+        self._eof = False
+
+    def _read_block(self):
+        header = self._handle.read(12)
+        if not header:
+            return None
+        if len(header) < 12:
+            raise ValueError(f"Truncated BGZF block at the end of {self.name}")
+        xlen, = struct.unpack_from('<H', header, 10)
+        extra = self._handle.read(xlen)
+        # Find the BC subfield giving the block size
+        i = 0
+        while i + 4 <= len(extra):
+            sub_id, sub_len = extra[i:i + 2], struct.unpack_from('<H', extra, i + 2)[0]
+            if sub_id == b'BC':
+                bsize, = struct.unpack_from('<H', extra, i + 4)
+                return header + extra + self._handle.read(bsize + 1 - 12 - xlen)
+            i += 4 + sub_len
+        raise ValueError(f"Not a BGZF block at offset {self._handle.tell() - 12 - xlen} of {self.name}")
+
+    def _fill(self):
+        while not self._eof and len(self._pending) < 4 * self._threads:
+            block = self._read_block()
+            if block is None:
+                self._eof = True
+            else:
+                self._pending.append(self._pool.submit(_inflate, block))
+
+    def readable(self) -> bool:
+        return True
+
+    def fileno(self) -> int:
+        # The compressed file, for its position and size
+        return self._handle.fileno()
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            self._fill()
+            if not self._pending:
+                return 0
+            self._buffer = memoryview(self._pending.popleft().result())
+        count = min(len(b), len(self._buffer))
+        b[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        self._position += count
+        return count
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("BGZF input can only be seeked from the start or current position")
+        if offset < self._position:
+            for future in self._pending:
+                future.cancel()
+            self._pending.clear()
+            self._buffer = memoryview(b'')
+            self._handle.seek(0)
+            self._position = 0
+            self._eof = False
+        skip = bytearray(2**16)
+        while self._position < offset:
+            if not self.readinto(memoryview(skip)[:offset - self._position]):
+                break
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            for future in self._pending:
+                future.cancel()
+            self._pool.shutdown()
+            self._handle.close()
+        super().close()
+
+
+class ZstdReader(io.RawIOBase):
+    """
+    Read Zstandard, exposing the file descriptor of the compressed file
+    """
+    def __init__(self, path: pathlib.Path):
+        super().__init__()
+        self.name = str(path)
+        self._handle = path.open('rb')
+        self._reader = _zstandard().ZstdDecompressor().stream_reader(self._handle, read_across_frames=True)
+
+    def readable(self) -> bool:
+        return True
+
+    def fileno(self) -> int:
+        return self._handle.fileno()
+
+    def readinto(self, b) -> int:
+        return self._reader.readinto(b)
+
+    def close(self):
+        if not self.closed:
+            self._reader.close()
+            self._handle.close()
+        super().close()
+
+
+class BgzfWriter(io.RawIOBase):
+    """
+    Write BGZF, compressing blocks in a thread pool and writing them in order
+    """
+    def __init__(self, path: pathlib.Path, threads: int = None, level: int = 6):
+        """
+        :param path: output path
+        :param threads: number of compression threads, defaults to the number of CPUs
+        :param level: zlib compression level
+        """
+        import concurrent.futures
+        super().__init__()
+        self.name = str(path)
+        self._handle = path.open('wb')
+        self._threads = threads or default_threads()
+        self._pool = concurrent.futures.ThreadPoolExecutor(self._threads)
+        self._pending = collections.deque()
+        self._buffer = bytearray()
+        self._level = level
+
+    def _submit(self, data: bytes):
+        self._pending.append(self._pool.submit(_deflate, data, self._level))
+        # Bound memory by writing out the oldest block once enough are queued
+        while len(self._pending) > 4 * self._threads:
+            self._handle.write(self._pending.popleft().result())
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._buffer += b
+        if len(self._buffer) >= bgzf_block_size:
+            view = memoryview(self._buffer)
+            end = len(view) - len(view) % bgzf_block_size
+            for i in range(0, end, bgzf_block_size):
+                self._submit(bytes(view[i:i + bgzf_block_size]))
+            view.release()
+            del self._buffer[:end]
+        return len(b)
+
+    def close(self):
+        if not self.closed:
+            try:
+                if self._buffer:
+                    self._submit(bytes(self._buffer))
+                while self._pending:
+                    self._handle.write(self._pending.popleft().result())
+                self._handle.write(_bgzf_eof)
+            finally:
+                self._pool.shutdown()
+                self._handle.close()
+        super().close()
+
+
+def _binary_input(path: pathlib.Path, compression: str, threads: int = None):
+    if compression == 'bgzf':
+        return io.BufferedReader(BgzfReader(path, threads), 2**16)
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'bz2':
+        return bz2.open(path, 'rb')
+    if compression == 'zstd':
+        return io.BufferedReader(ZstdReader(path))
+    return path.open('rb')
+
+
+def _binary_output(path: pathlib.Path, compression: str, threads: int = None):
+    if compression == 'bgzf':
+        return io.BufferedWriter(BgzfWriter(path, threads), bgzf_block_size)
+    if compression == 'gzip':
+        return gzip.open(path, 'wb', compresslevel=6)
+    if compression == 'bz2':
+        return bz2.open(path, 'wb')
+    if compression == 'zstd':
+        handle = path.open('wb')
+        return _zstandard().ZstdCompressor(threads=threads or default_threads()).stream_writer(handle, closefd=True)
+    return path.open('wb')
+
+
+def open_input(path: pathlib.Path, mode: str = 'r', threads: int = None):
+    """
+    Open a possibly compressed input, detecting the compression
+    Uncompressed input is opened as path.open(mode).
+    :param path: input path
+    :param mode: 'r' or 'rb'
+    :param threads: number of BGZF decompression threads, defaults to the number of CPUs
+    :return: file handle
+    """
+    compression = detect(path) if path.is_file() else 'none'
+    if compression == 'none':
+        return path.open(mode)
+    handle = _binary_input(path, compression, threads)
+    return handle if 'b' in mode else io.TextIOWrapper(handle)
+
+
+def open_output(path: pathlib.Path, mode: str = 'w', compression: str = None, threads: int = None):
+    """
+    Open a possibly compressed output
+    Uncompressed output is opened as path.open(mode).
+    :param path: output path
+    :param mode: 'w' or 'wb'
+    :param compression: one of compression_types, defaults to from_suffix(path)
+    :param threads: number of BGZF or zstd compression threads, defaults to the number of CPUs
+    :return: file handle
+    """
+    compression = compression or from_suffix(path)
+    if compression == 'none':
+        return path.open(mode)
+    handle = _binary_output(path, compression, threads)
+    return handle if 'b' in mode else io.TextIOWrapper(handle)
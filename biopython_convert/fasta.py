@@ -0,0 +1,191 @@
+"""
+FASTA fast path
+Converts plain FASTA between fasta and fasta-2line without building a SeqRecord per record. The input is memory mapped
+and records are found with find(). Sequences already wrapped as the output are written straight from the mapped buffer,
+others are re-wrapped as the rows of a matrix rather than line by line.
+Output is the same as reading and writing with Bio.SeqIO.
+"""
+import mmap
+import pathlib
+
+from . import compression
+
+input_types = ('fasta', 'fasta-2line')
+
+# Line width of each output type, None for a single line
+output_widths = {'fasta': 60, 'fasta-2line': None}
+
+# Bytes that Bio.SeqIO removes from sequence lines, other than line ends: str whitespace and anything not ASCII, which is
+# decoded first
+_unclean = b' \t\x0b\x0c\x1c\x1d\x1e\x1f' + bytes(range(0x80, 0x100))
+# Deleted to find any unclean bytes
+_clean = bytes(b for b in range(256) if b not in _unclean)
+
+
+def supported(input_path: pathlib.Path, input_type: str, output_type: str) -> bool:
+    """
+    Check if a conversion can use the fast path
+    :param input_path: Path to input dataset
+    :param input_type: Format of input dataset
+    :param output_type: Format of output dataset
+    :return: True if convert() will produce the same output as parsing and writing with Bio.SeqIO
+    """
+    if input_type not in input_types or output_type not in output_widths:
+        return False
+    if not input_path.is_file() or compression.detect(input_path) != 'none':
+        return False
+    if not input_path.stat().st_size:
+        return True
+    with input_path.open('rb') as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        # Text mode reads a lone \r as a line end
+        return data.find(b'\r') == -1
+
+
+def _title(title: bytes) -> bytes:
+    if title.isascii():
+        return title.rstrip()
+    return title.decode().rstrip().encode()
+
+
+def wrap(seq: bytes, width: int) -> bytes:
+    """
+    :param seq: sequence
+    :param width: line width
+    :return: lines of seq, each followed by a line end
+    """
+    full = len(seq) // width
+    if full < width:
+        return b''.join(seq[i:i + width] + b'\n' for i in range(0, len(seq), width))
+    # Copy the full lines as the rows of a matrix with a column of line ends
+    import numpy
+    lines = numpy.empty((full, width + 1), dtype=numpy.uint8)
+    lines[:, :width] = numpy.frombuffer(seq, dtype=numpy.uint8, count=full * width).reshape(full, width)
+    lines[:, width] = ord('\n')
+    rest = seq[full * width:]
+    return lines.tobytes() + (rest + b'\n' if rest else b'')
+
+
+def _wrapped(lines: bytes, length: int, width: int) -> bool:
+    """
+    :param lines: sequence lines, without anything other than sequence and line ends
+    :param length: length of the sequence
+    :param width: line width
+    :return: True if lines are the sequence wrapped at width, each followed by a line end
+    """
+    return (len(lines) == length + -(-length // width) and lines.endswith(b'\n')
+            and not lines[width::width + 1].strip(b'\n'))
+
+
+def records(data, input_type: str):
+    """
+    Find the records of FASTA input
+    :param data: input bytes, such as a mmap
+    :param input_type: one of input_types
+    :return: generator of (title, start, end) of each record, where title is its title line without > and trailing
+        whitespace, and data[start:end] are its sequence lines
+    :raises ValueError: if fasta-2line input does not have two lines per record
+    """
+    size = len(data)
+    if data[:1] == b'>':
+        start = 0
+    elif input_type == 'fasta-2line':
+        raise ValueError("Expected FASTA record starting with '>' character")
+    else:
+        # Skip any text before the first record
+        start = data.find(b'\n>') + 1
+        if not start:
+            return
+    while start < size:
+        eol = data.find(b'\n', start)
+        if eol == -1:
+            eol = size
+        title = _title(data[start + 1:eol])
+        following = data.find(b'\n>', eol)
+        end = size if following == -1 else following + 1
+        sequence_start = min(eol + 1, size)
+        if input_type == 'fasta-2line':
+            line_end = data.find(b'\n', sequence_start, end)
+            if sequence_start == end:
+                raise ValueError(f"Missing sequence line for title line '>{title.decode()}' if this is strict "
+                                 f"two-line-per-record FASTA format")
+            if line_end not in (-1, end - 1):
+                raise ValueError(f"Expected FASTA record starting with '>' character following '>{title.decode()}'. "
+                                 f"Perhaps this file is using FASTA line wrapping?")
+        yield title, sequence_start, end
+        start = end
+
+
+def sequence(data, start: int, end: int, input_type: str) -> bytes:
+    """
+    :param data: input bytes
+    :param start: start of the sequence lines of a record, see records()
+    :param end: end of the sequence lines
+    :param input_type: one of input_types
+    :return: sequence as parsed by Bio.SeqIO
+    """
+    lines = data[start:end]
+    if not lines.translate(None, _clean):
+        return lines.replace(b'\n', b'')
+    lines = lines.decode()
+    if input_type == 'fasta-2line':
+        return lines.strip().encode()
+    return ''.join(line.rstrip() for line in lines.split('\n')).replace(' ', '').encode()
+
+
+def write(data, handle, input_type: str, output_type: str) -> int:
+    """
+    Write FASTA input as FASTA
+    :param data: input bytes, such as a mmap
+    :param handle: binary file handle to write to
+    :param input_type: one of input_types
+    :param output_type: one of output_widths
+    :return: number of records
+    """
+    width = output_widths[output_type]
+    view = memoryview(data)
+    count = 0
+    try:
+        for title, start, end in records(data, input_type):
+            handle.write(b'>' + title + b'\n')
+            lines = data[start:end]
+            if not lines.translate(None, _clean):
+                newlines = lines.count(b'\n')
+                if width is None:
+                    direct = newlines == 1 and lines.endswith(b'\n')
+                else:
+                    direct = _wrapped(lines, len(lines) - newlines, width)
+                if direct:
+                    # Already formatted as the output
+                    handle.write(view[start:end])
+                    count += 1
+                    continue
+                seq = lines.replace(b'\n', b'')
+            else:
+                seq = sequence(data, start, end, input_type)
+            if width is None:
+                handle.write(seq + b'\n')
+            elif seq:
+                handle.write(wrap(seq, width))
+            count += 1
+    finally:
+        view.release()
+    return count
+
+
+def convert(input_path: pathlib.Path, input_type: str, output_path: pathlib.Path, output_type: str,
+            compress: str = None) -> int:
+    """
+    Convert FASTA input to FASTA output, see supported()
+    :param input_path: Path to input dataset
+    :param input_type: one of input_types
+    :param output_path: Path to output dataset
+    :param output_type: one of output_widths
+    :param compress: compression of the output, see compression.open_output()
+    :return: number of records
+    """
+    with compression.open_output(output_path, 'wb', compress) as handle:
+        if not input_path.stat().st_size:
+            return 0
+        with input_path.open('rb') as input_handle, \
+                mmap.mmap(input_handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return write(data, handle, input_type, output_type)
@@ -0,0 +1,411 @@
+"""
+FASTQ fast path
+Converts FASTQ between its quality encodings, or to fasta, fasta-2line, or qual, without building a SeqRecord per read.
+The input is memory mapped and the lines of a block of reads are found together. The qualities of the block are
+re-encoded through a lookup table of each quality character, built by converting that character with Bio.SeqIO, and
+the output is assembled from the input by index. Reads not laid out as four lines are split one at a time.
+Output is the same as reading and writing with Bio.SeqIO.
+"""
+import functools
+import io
+import mmap
+import pathlib
+import warnings
+
+from . import compression, fasta
+
+input_types = ('fastq', 'fastq-sanger', 'fastq-solexa', 'fastq-illumina')
+output_types = input_types + tuple(fasta.output_widths) + ('qual',)
+
+# Bytes of input split into reads together
+block_size = 1 << 22
+
+# Number of reads converted together that are not laid out as four lines
+batch_size = 10000
+
+# Lines of qual output are shorter than this, as Bio.SeqIO.QualityIO.as_qual()
+qual_width = 60
+
+# Whitespace that str.rstrip() removes from ASCII
+_whitespace = b' \t\n\x0b\x0c\x1c\x1d\x1e\x1f'
+
+
+def supported(input_path: pathlib.Path, input_type: str, output_type: str) -> bool:
+    """
+    Check if a conversion can use the fast path
+    :param input_path: Path to input dataset
+    :param input_type: Format of input dataset
+    :param output_type: Format of output dataset
+    :return: True if convert() will produce the same output as parsing and writing with Bio.SeqIO
+    """
+    if input_type not in input_types or output_type not in output_types:
+        return False
+    if not input_path.is_file() or compression.detect(input_path) != 'none':
+        return False
+    if not input_path.stat().st_size:
+        return True
+    with input_path.open('rb') as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        # Text mode reads a lone \r as a line end, and str.rstrip() removes whitespace beyond ASCII
+        return data.find(b'\r') == -1 and _ascii(data)
+
+
+def _ascii(data) -> bool:
+    import numpy
+    return int(numpy.frombuffer(data, dtype=numpy.uint8).max()) < 0x80
+
+
+def _lines(data, start: int):
+    """
+    :return: generator of (start, line) of each line of data from start
+    """
+    size = len(data)
+    while start < size:
+        end = data.find(b'\n', start) + 1 or size
+        yield start, data[start:end]
+        start = end
+
+
+def _indices(starts, ends):
+    """
+    :param starts: numpy array of the starts of ranges
+    :param ends: numpy array of the ends of the ranges
+    :return: numpy array of the indices within each range, in order
+    """
+    import numpy
+    lengths = ends - starts
+    offsets = numpy.repeat(starts - (numpy.cumsum(lengths) - lengths), lengths)
+    return offsets + numpy.arange(len(offsets))
+
+
+def _block(data, start: int):
+    """
+    Find the reads at start that are laid out as four lines: title, sequence, + with or without the title, and quality,
+    none with trailing whitespace
+    :param data: ASCII input bytes
+    :param start: start of a read
+    :return: (block, lines) where block is up to block_size bytes of data from start and lines is a numpy array of the
+        (start, end) in block of the title, sequence, + and quality lines of each read, with shape (reads, 4, 2)
+    """
+    import numpy
+    block = data[start:start + block_size]
+    at_end = start + len(block) == len(data)
+    array = numpy.frombuffer(block, dtype=numpy.uint8)
+    # Line ends and whitespace are the only bytes below !
+    low = numpy.flatnonzero(array < ord('!'))
+    ends = low[array[low] == ord('\n')]
+    whitespace = numpy.zeros(256, dtype=bool)
+    whitespace[list(_whitespace.replace(b'\n', b''))] = True
+    spaces = low[whitespace[array[low]]]
+    if at_end and block[-1:] != b'\n':
+        ends = numpy.append(ends, len(block))
+    count = len(ends) // 4
+    if not count:
+        return block, numpy.empty((0, 4, 2), dtype=numpy.intp)
+    starts = numpy.concatenate(([0], ends[:-1] + 1))
+    lines = numpy.stack((starts[:count * 4], ends[:count * 4]), axis=-1).reshape(count, 4, 2)
+    (title_start, title_end), (sequence_start, sequence_end), (plus_start, plus_end), (quality_start, quality_end) = \
+        lines.transpose(1, 2, 0)
+
+    # The line following a read must start a read, or the input must end
+    following = quality_end + 1
+    following_read = numpy.where(following < len(block), array[numpy.minimum(following, len(block) - 1)] == ord('@'),
+                                 at_end & (following >= len(block)))
+    valid = ((array[title_start] == ord('@')) & (title_end - title_start > 1) & ~whitespace[array[title_end - 1]]
+             & (sequence_end > sequence_start) & (array[sequence_start] != ord('+'))
+             & (numpy.searchsorted(spaces, sequence_start) == numpy.searchsorted(spaces, sequence_end))
+             & (array[plus_start] == ord('+'))
+             & (quality_end - quality_start == sequence_end - sequence_start)
+             & (numpy.searchsorted(spaces, quality_start) == numpy.searchsorted(spaces, quality_end))
+             & following_read)
+    for read in numpy.flatnonzero(valid & (plus_end - plus_start > 1)).tolist():
+        title = block[title_start[read] + 1:title_end[read]]
+        valid[read] = block[plus_start[read] + 1:plus_end[read]].rstrip(_whitespace) == title
+    invalid = numpy.flatnonzero(~valid)
+    if len(invalid):
+        lines = lines[:invalid[0]]
+    return block, lines
+
+
+def _read(data, start: int):
+    """
+    Split a read the same as Bio.SeqIO.QualityIO.FastqGeneralIterator
+    :param data: ASCII input bytes
+    :param start: start of the read
+    :return: (title, sequence, quality, end) of the read
+    :raises ValueError: if the input is not FASTQ
+    """
+    lines = _lines(data, start)
+    _, line = next(lines)
+    if line[:1] != b'@':
+        raise ValueError("Records in Fastq files should start with '@' character")
+    title = line[1:].rstrip(_whitespace)
+    if not title:
+        raise ValueError("Records in Fastq files should have a title")
+    sequence = []
+    for _, line in lines:
+        if line[:1] == b'+':
+            break
+        sequence.append(line.rstrip(_whitespace))
+    else:
+        raise ValueError("End of file without quality information." if any(sequence) else "Unexpected end of file")
+    second_title = line[1:].rstrip(_whitespace)
+    if second_title and second_title != title:
+        raise ValueError("Sequence and quality captions differ.")
+    sequence = b''.join(sequence)
+    if b' ' in sequence or b'\t' in sequence:
+        raise ValueError("Whitespace is not allowed in the sequence.")
+
+    # A line starting with @ is quality until the quality is as long as the sequence
+    quality = []
+    length = 0
+    for end, line in lines:
+        if line[:1] == b'@' and length >= len(sequence):
+            break
+        quality.append(line.rstrip(_whitespace))
+        length += len(quality[-1])
+    else:
+        if not quality:
+            raise ValueError("Unexpected end of file")
+        end = len(data)
+    if length != len(sequence):
+        raise ValueError(f"Lengths of sequence and quality values differs for {title.decode()} "
+                         f"({len(sequence)} and {length}).")
+    return title, sequence, b''.join(quality), end
+
+
+def reads(data):
+    """
+    Split FASTQ input into reads, the same as Bio.SeqIO.QualityIO.FastqGeneralIterator
+    :param data: ASCII input bytes, such as a mmap
+    :return: generator of (title, sequence, quality) bytes of each read
+    :raises ValueError: if the input is not FASTQ
+    """
+    start, size = 0, len(data)
+    while start < size:
+        title, sequence, quality, start = _read(data, start)
+        yield title, sequence, quality
+
+
+@functools.lru_cache(maxsize=None)
+def encoding(input_type: str, output_type: str):
+    """
+    Convert each quality character of input_type with Bio.SeqIO
+    :param input_type: one of input_types
+    :param output_type: one of output_types
+    :return: (table, lossy, warning) where table is a numpy array of the output of each input character, -1 if the
+        character is not valid in input_type. The output is a character of FASTQ output, a PHRED score of qual output,
+        or 0 for FASTA output. lossy is a boolean array of the characters that Bio.SeqIO warns truncate, with the
+        (message, category) of that warning, or None.
+    """
+    import numpy
+    from Bio import SeqIO
+    table = numpy.full(256, -1, dtype=numpy.int16)
+    lossy = numpy.zeros(256, dtype=bool)
+    warning = None
+    for character in range(ord('!'), ord('~') + 1):
+        try:
+            record = SeqIO.read(io.StringIO(f"@q\nA\n+\n{chr(character)}\n"), input_type)
+        except ValueError:
+            continue
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            output = record.format(output_type).split('\n')
+        if output_type == 'qual':
+            table[character] = int(output[1])
+        elif output_type in fasta.output_widths:
+            table[character] = 0
+        else:
+            table[character] = ord(output[3])
+        if caught:
+            lossy[character] = True
+            warning = (str(caught[0].message), caught[0].category)
+    return table, lossy, warning
+
+
+def _wrap_scores(scores: bytes) -> bytes:
+    """
+    :param scores: space separated scores
+    :return: scores wrapped the same as Bio.SeqIO qual output, each line followed by a line end
+    """
+    if not scores:
+        return b''
+    lines = []
+    while len(scores) >= qual_width:
+        i = scores.rfind(b' ', 0, qual_width)
+        lines.append(scores[:i])
+        scores = scores[i + 1:]
+    lines.append(scores)
+    return b'\n'.join(lines) + b'\n'
+
+
+def _scores(values, batch: list):
+    """
+    :param values: numpy array of the PHRED scores of all reads in batch
+    :param batch: list of (title, sequence, quality) of each read
+    :return: generator of the space separated scores of each read
+    """
+    import numpy
+    # Each score is written as its tens digit, if any, its ones digit, and a space
+    tens = values >= 10
+    cells = numpy.empty((len(values), 3), dtype=numpy.uint8)
+    cells[:, 0] = ord('0') + values // 10
+    cells[:, 1] = ord('0') + values % 10
+    cells[:, 2] = ord(' ')
+    keep = numpy.ones(cells.shape, dtype=bool)
+    keep[:, 0] = tens
+    text = cells[keep].tobytes()
+    ends = numpy.cumsum(2 + tens).tolist()
+    index = start = 0
+    for _, _, quality in batch:
+        if not quality:
+            yield b''
+            continue
+        index += len(quality)
+        end = ends[index - 1]
+        yield text[start:end - 1]
+        start = end
+
+
+def _format(batch: list, input_type: str, output_type: str) -> bytes:
+    """
+    :param batch: list of (title, sequence, quality) of each read
+    :param input_type: one of input_types
+    :param output_type: one of output_types
+    :return: batch written as output_type
+    :raises ValueError: if a quality is not valid in input_type
+    """
+    import numpy
+    table, lossy, warning = encoding(input_type, output_type)
+    qualities = numpy.frombuffer(b''.join(quality for _, _, quality in batch), dtype=numpy.uint8)
+    values = table[qualities]
+    if (values < 0).any():
+        raise ValueError("Invalid character in quality string")
+    if warning and lossy[qualities].any():
+        warnings.warn(*warning)
+
+    if output_type in fasta.output_widths:
+        width = fasta.output_widths[output_type]
+        if width is None:
+            return b''.join(b'>%s\n%s\n' % (title, sequence) for title, sequence, _ in batch)
+        return b''.join(b'>%s\n%s' % (title, fasta.wrap(sequence, width) if sequence else b'')
+                        for title, sequence, _ in batch)
+    if output_type == 'qual':
+        return b''.join(b'>%s\n%s' % (title, _wrap_scores(scores))
+                        for (title, _, _), scores in zip(batch, _scores(values, batch)))
+    encoded = values.astype(numpy.uint8).tobytes()
+    output = []
+    start = 0
+    for title, sequence, quality in batch:
+        end = start + len(quality)
+        output.append(b'@%s\n%s\n+\n%s\n' % (title, sequence, encoded[start:end]))
+        start = end
+    return b''.join(output)
+
+
+def _fasta_block(array, lines, width: int) -> bytes:
+    """
+    :param array: numpy array of input bytes
+    :param lines: numpy array of reads in array, see _block()
+    :param width: line width of the sequence, None for a single line
+    :return: reads written as FASTA
+    """
+    import numpy
+    (title_start, title_end), (sequence_start, sequence_end) = lines[:, :2].transpose(1, 2, 0)
+    title_length = title_end - title_start
+    length = sequence_end - sequence_start
+    sequence_lines = 1 if width is None else -(-length // width)
+    output_length = title_length + 1 + length + sequence_lines
+    output_start = numpy.cumsum(output_length) - output_length
+    output = numpy.full(int(output_length.sum()), ord('\n'), dtype=numpy.uint8)
+    output[_indices(output_start, output_start + title_length)] = array[_indices(title_start, title_end)]
+    output[output_start] = ord('>')
+    # Each sequence follows its title line, with a line end after every width bytes
+    offset = _indices(numpy.zeros_like(length), length)
+    if width is not None:
+        offset += offset // width
+    output[numpy.repeat(output_start + title_length + 1, length) + offset] = array[_indices(sequence_start,
+                                                                                          sequence_end)]
+    return output.tobytes()
+
+
+def _format_block(block: bytes, lines, input_type: str, output_type: str) -> bytes:
+    """
+    :param block: input bytes
+    :param lines: numpy array of reads in block, see _block()
+    :param input_type: one of input_types
+    :param output_type: one of output_types
+    :return: reads written as output_type
+    :raises ValueError: if a quality is not valid in input_type
+    """
+    import numpy
+    if output_type == 'qual':
+        return _format([(block[title_start + 1:title_end], block[sequence_start:sequence_end],
+                         block[quality_start:quality_end])
+                        for (title_start, title_end), (sequence_start, sequence_end), _, (quality_start, quality_end)
+                        in lines.tolist()], input_type, output_type)
+
+    table, lossy, warning = encoding(input_type, output_type)
+    end = int(lines[-1, 3, 1])
+    output = numpy.frombuffer(block, dtype=numpy.uint8, count=end).copy()
+    quality = _indices(lines[:, 3, 0], lines[:, 3, 1])
+    qualities = output[quality]
+    values = table[qualities]
+    if (values < 0).any():
+        raise ValueError("Invalid character in quality string")
+    if warning and lossy[qualities].any():
+        warnings.warn(*warning)
+
+    if output_type in fasta.output_widths:
+        return _fasta_block(output, lines, fasta.output_widths[output_type])
+    # The input with its qualities re-encoded and any title following + removed
+    output[quality] = values
+    if (lines[:, 2, 1] - lines[:, 2, 0] > 1).any():
+        output = numpy.delete(output, _indices(lines[:, 2, 0] + 1, lines[:, 2, 1]))
+    return output.tobytes() + b'\n'
+
+
+def write(data, handle, input_type: str, output_type: str) -> int:
+    """
+    Write FASTQ input as output_type
+    Blocks of reads laid out as four lines are converted together, any others a batch at a time.
+    :param data: ASCII input bytes, such as a mmap
+    :param handle: binary file handle to write to
+    :param input_type: one of input_types
+    :param output_type: one of output_types
+    :return: number of records
+    """
+    count = 0
+    start, size = 0, len(data)
+    while start < size:
+        block, lines = _block(data, start)
+        if len(lines):
+            handle.write(_format_block(block, lines, input_type, output_type))
+            count += len(lines)
+            start += int(lines[-1, 3, 1]) + 1
+            continue
+        batch = []
+        while start < size and len(batch) < batch_size:
+            title, sequence, quality, start = _read(data, start)
+            batch.append((title, sequence, quality))
+        handle.write(_format(batch, input_type, output_type))
+        count += len(batch)
+    return count
+
+
+def convert(input_path: pathlib.Path, input_type: str, output_path: pathlib.Path, output_type: str,
+            compress: str = None) -> int:
+    """
+    Convert FASTQ input, see supported()
+    :param input_path: Path to input dataset
+    :param input_type: one of input_types
+    :param output_path: Path to output dataset
+    :param output_type: one of output_types
+    :param compress: compression of the output, see compression.open_output()
+    :return: number of records
+    """
+    with compression.open_output(output_path, 'wb', compress) as handle:
+        if not input_path.stat().st_size:
+            return 0
+        with input_path.open('rb') as input_handle, \
+                mmap.mmap(input_handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return write(data, handle, input_type, output_type)
@@ -0,0 +1,126 @@
+"""
+Format registry
+Capabilities of every supported input and output type. Handles are opened in the mode given here, so that the input
+is only ever read once, and writers are selected from here rather than by trial.
+"""
+from typing import Callable
+
+from . import writers
+
+
+class Format:
+    """
+    Capabilities of an input and/or output type
+    """
+    def __init__(self, name: str, readable: bool = True, writer: Callable = writers.seqio_writer, binary: bool = False,
+                 streaming: bool = True, sequence: bool = True, concatenable: bool = False, accepts: str = 'records'):
+        """
+        :param name: type name as given on the command line
+        :param readable: the type can be read as input
+        :param writer: Callable(records, handle, output_type, options) to output the type, None if it can not be output
+        :param binary: handles must be opened in binary mode
+        :param streaming: records are written as they are produced, otherwise the writer reads all records first
+        :param sequence: records read have sequences, and records written must have sequences
+        :param concatenable: concatenating the outputs of consecutive parts of the input gives the output of the whole input
+        :param accepts: what the writer accepts.
+            'records' - SeqRecords, query results are converted to SeqRecords
+            'results' - any query result, a single SeqRecord is output as a list of one
+            'text' - any query result, output as is
+        """
+        self.name = name
+        self.readable = readable
+        self.writer = writer
+        self.binary = binary
+        self.streaming = streaming
+        self.sequence = sequence
+        self.concatenable = concatenable
+        self.accepts = accepts
+
+    @property
+    def writable(self) -> bool:
+        return self.writer is not None
+
+    @property
+    def mode(self) -> str:
+        """
+        Mode suffix to pass to open()
+        """
+        return 'b' if self.binary else ''
+
+    def __repr__(self):
+        return f"Format({self.name!r})"
+
+
+registry = {f.name: f for f in [
+    # Biopython SeqIO
+    Format('abi', binary=True, writer=None),
+    Format('abi-trim', binary=True, writer=None),
+    Format('ace', writer=None),
+    Format('cif-atom', writer=None),
+    Format('cif-seqres', writer=None),
+    Format('clustal', streaming=False),
+    Format('embl', concatenable=True),
+    Format('fasta', concatenable=True),
+    Format('fasta-2line', concatenable=True),
+    Format('fastq-sanger', concatenable=True),
+    Format('fastq', concatenable=True),
+    Format('fastq-solexa', concatenable=True),
+    Format('fastq-illumina', concatenable=True),
+    Format('genbank', concatenable=True),
+    Format('gb', concatenable=True),
+    Format('ig', writer=None),
+    Format('imgt', concatenable=True),
+    Format('nexus', streaming=False),
+    Format('pdb-seqres', writer=None),
+    Format('pdb-atom', writer=None),
+    Format('phd'),
+    Format('phylip', streaming=False),
+    Format('pir'),
+    Format('seqxml'),
+    Format('sff', binary=True),
+    Format('sff-trim', binary=True, writer=None),
+    Format('stockholm', streaming=False),
+    Format('swiss', writer=None),
+    Format('tab', concatenable=True),
+    Format('qual', concatenable=True),
+    Format('uniprot-xml', writer=None),
+    # GFF3 via gffutils
+    Format('gff', writer=writers.gff_writer, sequence=False, concatenable=True),
+    Format('gff3', writer=writers.gff_writer, sequence=False, concatenable=True),
+    # Query results
+    Format('text', readable=False, writer=writers.text_writer, sequence=False, accepts='text'),
+    Format('json', readable=False, writer=writers.json_writer, accepts='results'),
+    Format('jsonl', readable=False, writer=writers.jsonl_writer, concatenable=True, accepts='results'),
+    Format('ndjson', readable=False, writer=writers.jsonl_writer, concatenable=True, accepts='results'),
+    Format('yaml', readable=False, writer=writers.yaml_writer, accepts='results'),
+    Format('yml', readable=False, writer=writers.yaml_writer, accepts='results'),
+    Format('yaml-stream', readable=False, writer=writers.yaml_stream_writer, concatenable=True, accepts='results'),
+    Format('yml-stream', readable=False, writer=writers.yaml_stream_writer, concatenable=True, accepts='results'),
+    # Feature tables
+    Format('features-tsv', readable=False, writer=writers.tsv_writer, sequence=False),
+    Format('features-arrow', readable=False, writer=writers.arrow_writer, binary=True, sequence=False),
+    Format('features-parquet', readable=False, writer=writers.arrow_writer, binary=True, sequence=False),
+]}
+
+
+def get(name: str) -> Format:
+    """
+    Look up a type in the registry
+    :param name: type name
+    :return: registered Format, or a Format assuming a text based Biopython SeqIO type for any other name
+    """
+    return registry.get(name) or Format(name)
+
+
+def input_types() -> list:
+    """
+    :return: names of all types that can be read
+    """
+    return [name for name, f in registry.items() if f.readable]
+
+
+def output_types() -> list:
+    """
+    :return: names of all types that can be written
+    """
+    return [name for name, f in registry.items() if f.writable]
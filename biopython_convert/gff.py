@@ -0,0 +1,605 @@
+"""
+Streaming GFF3 reader and writer
+Builds one SeqRecord per seqid as soon as the block of lines for that seqid ends, without loading the file into a database.
+Input where a seqid reappears falls back to a temporary on-disk gffutils database.
+DBCache optionally keeps gffutils databases between runs.
+Output is formatted directly from SeqFeatures, identical to printing gffutils Features, and written in batches of lines.
+"""
+import os
+import re
+import fcntl
+import shutil
+import hashlib
+import pathlib
+import tempfile
+import warnings
+import functools
+import itertools
+from collections import defaultdict
+from typing import Callable, Generator, Iterable
+from urllib.parse import unquote
+
+from Bio import SeqIO, SeqFeature, Seq
+import gffutils
+from gffutils.feature import feature_from_line
+
+from . import instrument
+
+# Same mapping as gffutils.biopython_integration
+STRANDS = {'+': 1, '-': -1, '.': None, '?': 0}
+STRAND_SYMBOLS = {v: k for k, v in STRANDS.items()}
+
+# Qualifiers output as GFF columns rather than attributes, as gffutils.biopython_integration.from_seqfeature()
+column_qualifiers = ('source', 'score', 'seqid', 'frame')
+
+# Characters escaped in attribute values, the same as gffutils
+_escapes = {c: f"%{ord(c):02X}" for c in "\n\t\r%;=&," + ''.join(map(chr, range(32))) + chr(127)}
+_escape_table = str.maketrans(_escapes)
+_reserved = re.compile(f"[{re.escape(''.join(_escapes))}]")
+
+# Number of lines formatted before each write to the output handle
+write_batch = 4096
+
+
+def parse_attributes(attributes: str) -> dict:
+    """
+    Parse GFF3 column 9 into a dict of lists, splitting and unescaping values the same way gffutils does
+    :param attributes: attribute column string
+    :return: dict of attribute name to list of values
+    """
+    quals = {}
+    for part in attributes.strip(';').split(';'):
+        if not part:
+            continue
+        key, _, val = part.partition('=')
+        vals = quals.setdefault(key, [])
+        if val:
+            # gffutils does not split values containing ', ' as they are assumed to be free text
+            vals.extend(map(unquote, (val,) if ', ' in val else val.split(',')))
+    return quals
+
+
+def to_seqfeature(seqid: str, source: str, featuretype: str, start: int, end: int, score: str, strand: str, frame: str,
+                  attributes: dict, id: str) -> SeqFeature.SeqFeature:
+    """
+    Build a SeqFeature from GFF fields, equivalent to gffutils.biopython_integration.to_seqfeature()
+    :return: SeqFeature with the GFF source, score, seqid, and frame stored as qualifiers
+    """
+    qualifiers = {
+        'source': [source],
+        'score': [score],
+        'seqid': [seqid],
+        'frame': [frame],
+    }
+    qualifiers.update(attributes)
+    return SeqFeature.SeqFeature(
+        SeqFeature.FeatureLocation(start - 1, end, strand=STRANDS[strand]),
+        id=id,
+        type=featuretype,
+        qualifiers=qualifiers,
+    )
+
+
+def to_record(seqid: str, features: list, length: int = None) -> SeqIO.SeqRecord:
+    """
+    Build a SeqRecord with an undefined sequence to hold the features of a seqid
+    :param seqid: GFF seqid
+    :param features: list of SeqFeature
+    :param length: sequence length from ##sequence-region, defaults to the greatest feature end
+    :return: SeqRecord
+    """
+    if length is None:
+        length = max((int(f.location.end) for f in features), default=0)
+    return SeqIO.SeqRecord(Seq.Seq(None, length), id=seqid, name=seqid, description='', features=features)
+
+
+def _lines(handle) -> Generator[str, None, None]:
+    """
+    Helper to yield feature lines and directives, stopping at the ##FASTA section
+    :param handle: text file handle
+    :return: generator of stripped lines
+    """
+    for line in handle:
+        line = line.rstrip('\r\n')
+        if line.startswith('##FASTA'):
+            return
+        if not line or (line[0] == '#' and not line.startswith('##')):
+            continue
+        yield line
+
+
+def _sequence_region(line: str) -> tuple:
+    """
+    Parse ##sequence-region directive
+    :param line: directive line
+    :return: (seqid, length) or None if the directive is malformed
+    """
+    parts = line.split()
+    if len(parts) == 4:
+        try:
+            return parts[1], int(parts[3])
+        except ValueError:
+            pass
+    return None
+
+
+class _UniqueIds:
+    """
+    Helper to assign feature ids following the gffutils "create_unique" merge strategy: the ID attribute, suffixed on
+    repeats, or the feature type with an incrementing number.
+    Ids are unique across the whole input, as in a gffutils database, so every id assigned is kept.
+    """
+    def __init__(self):
+        self.autoincrements = defaultdict(int)
+        self.ids = set()
+
+    def __call__(self, featuretype: str, attributes) -> str:
+        """
+        :param featuretype: GFF feature type
+        :param attributes: mapping of attribute name to list of values
+        :return: unique feature id
+        """
+        id = attributes.get('ID', (None,))[0]
+        if not id:
+            self.autoincrements[featuretype] += 1
+            id = f"{featuretype}_{self.autoincrements[featuretype]}"
+        elif id in self.ids:
+            self.autoincrements[id] += 1
+            id = f"{id}_{self.autoincrements[id]}"
+        self.ids.add(id)
+        return id
+
+
+def _contiguous(handle, ended: set, seqid: str) -> bool:
+    """
+    Helper to check that no seqid reappears in the rest of the input. The handle is returned to its position.
+    :param handle: seekable text file handle, read with readline() so that its position can be told
+    :param ended: seqids whose lines have ended
+    :param seqid: seqid of the last line read
+    :return: True if no seqid reappears after a different seqid
+    """
+    position = handle.tell()
+    ended = set(ended)
+    try:
+        for line in _lines(iter(handle.readline, '')):
+            if line[0] == '#':
+                continue
+            next_seqid = line[:line.find('\t')]
+            if next_seqid != seqid:
+                if next_seqid in ended:
+                    return False
+                ended.add(seqid)
+                seqid = next_seqid
+        return True
+    finally:
+        handle.seek(position)
+
+
+def _grouped(lines: Iterable[str], lengths: dict, ids: _UniqueIds,
+             check: Callable[[set, str], bool] = None) -> Generator[SeqIO.SeqRecord, None, str]:
+    """
+    Helper to stream records while the lines of each seqid are contiguous
+    A record is yielded as soon as a line for another seqid is read. ### directives are not treated as the end of a
+    seqid, as writers such as Ensembl separate every gene of a seqid with one.
+    :param lines: iterator of lines from _lines(), left at the line after a reappearing seqid
+    :param lengths: dict of seqid to sequence length, updated from ##sequence-region directives
+    :param ids: feature id assignment, shared with any fallback over the remaining lines
+    :param check: called as _contiguous() once the lines of the first seqid end, before any record is yielded
+    :return: generator of SeqRecord, one per seqid, returning the first line of a seqid that reappears after its
+        record was yielded, or of the second seqid if check fails, or None at the end of the input
+    """
+    emitted = set()
+    seqid = None
+    features = []
+    for line in lines:
+        if line[0] == '#':
+            if line.startswith('##sequence-region'):
+                region = _sequence_region(line)
+                if region:
+                    lengths[region[0]] = region[1]
+            continue
+        fields = line.split('\t')
+        if len(fields) != 9:
+            raise ValueError(f"Malformed GFF3 line, expected 9 columns: {line}")
+        if fields[0] != seqid:
+            if seqid is not None and check is not None:
+                if not check({seqid}, fields[0]):
+                    return line
+                check = None
+            if seqid is not None:
+                yield to_record(seqid, features, lengths.get(seqid))
+                emitted.add(seqid)
+            if fields[0] in emitted:
+                return line
+            seqid = fields[0]
+            features = []
+        attributes = parse_attributes(fields[8])
+        features.append(to_seqfeature(fields[0], fields[1], fields[2], int(fields[3]), int(fields[4]), fields[5],
+                                      fields[6], fields[7], attributes, ids(fields[2], attributes)))
+    if seqid is not None:
+        yield to_record(seqid, features, lengths.get(seqid))
+    return None
+
+
+def parse_grouped(handle) -> Generator[SeqIO.SeqRecord, None, None]:
+    """
+    Stream records from GFF3 where all lines of a seqid are contiguous
+    Feature ids follow the gffutils "create_unique" merge strategy, see _UniqueIds.
+    :param handle: text file handle
+    :return: generator of SeqRecord, one per seqid
+    :raises ValueError: if a seqid reappears after its record was output
+    """
+    reappeared = yield from _grouped(_lines(handle), {}, _UniqueIds())
+    if reappeared is not None:
+        seqid = reappeared.split('\t', 1)[0]
+        raise ValueError(f"GFF3 input is not grouped by seqid, {seqid} reappears after its record was output")
+
+
+def parse_db(db: gffutils.FeatureDB) -> Generator[SeqIO.SeqRecord, None, None]:
+    """
+    Read records from gffutils database created by create_db(), ordered by seqid
+    :param db: gffutils.FeatureDB
+    :return: generator of SeqRecord, one per seqid
+    """
+    lengths = dict(db.execute("SELECT seqid, length FROM sequence_regions"))
+    # Features are inserted in file order, so rowid keeps the order of the streaming reader within a seqid. gffutils only
+    # validates a sequence of order_by columns, and its indexes otherwise order a seqid by start.
+    for seqid, features in itertools.groupby(db.all_features(order_by='seqid, rowid'), lambda f: f.seqid):
+        yield to_record(seqid, [
+            to_seqfeature(f.seqid, f.source, f.featuretype, f.start, f.end, f.score, f.strand, f.frame, dict(f.attributes), f.id)
+            for f in features
+        ], lengths.get(seqid))
+
+
+def _create_db(lines: Iterable[str], dbfn: str, lengths: dict, ids: _UniqueIds = None):
+    """
+    Helper to load GFF3 lines into a gffutils database
+    Sequence lengths are stored in an additional sequence_regions table.
+    :param lines: lines from _lines()
+    :param dbfn: path to database file to create
+    :param lengths: dict of seqid to sequence length, updated from ##sequence-region directives
+    :param ids: feature id assignment to continue, or None to let gffutils assign ids
+    :return: None
+    """
+    def features():
+        for line in lines:
+            if line[0] == '#':
+                if line.startswith('##sequence-region'):
+                    region = _sequence_region(line)
+                    if region:
+                        lengths[region[0]] = region[1]
+                continue
+            feature = feature_from_line(line)
+            if ids is not None:
+                feature.id = ids(feature.featuretype, feature.attributes)
+            yield feature
+
+    options = {} if ids is None else {'id_spec': lambda f: f.id}
+    with instrument.stage('gff-db'):
+        db = gffutils.create_db(features(), dbfn, merge_strategy="create_unique", **options)
+        db.conn.execute("CREATE TABLE sequence_regions (seqid TEXT PRIMARY KEY, length INT)")
+        db.conn.executemany("INSERT INTO sequence_regions VALUES (?, ?)", lengths.items())
+        db.conn.commit()
+        db.conn.close()
+
+
+def create_db(handle, dbfn: str):
+    """
+    Load GFF3 into a gffutils database
+    Sequence lengths from ##sequence-region directives are stored in an additional sequence_regions table.
+    :param handle: text file handle
+    :param dbfn: path to database file to create
+    :return: None
+    """
+    _create_db(_lines(handle), dbfn, {})
+
+
+def _parse_temporary_db(lines: Iterable[str], lengths: dict,
+                        ids: _UniqueIds = None) -> Generator[SeqIO.SeqRecord, None, None]:
+    """
+    Helper to read records from GFF3 lines by loading them into a temporary on-disk gffutils database
+    :param lines: lines from _lines()
+    :param lengths: dict of seqid to sequence length, updated from ##sequence-region directives
+    :param ids: feature id assignment to continue, or None to let gffutils assign ids
+    :return: generator of SeqRecord, one per seqid, ordered by seqid
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        dbfn = str(pathlib.Path(tmp, 'features.db'))
+        _create_db(lines, dbfn, lengths, ids)
+        db = gffutils.FeatureDB(dbfn)
+        try:
+            yield from parse_db(db)
+        finally:
+            db.conn.close()
+
+
+def parse_unsorted(handle) -> Generator[SeqIO.SeqRecord, None, None]:
+    """
+    Read records from GFF3 in any order by loading it into a temporary on-disk gffutils database
+    :param handle: text file handle
+    :return: generator of SeqRecord, one per seqid, ordered by seqid
+    """
+    yield from _parse_temporary_db(_lines(handle), {})
+
+
+class DBCache:
+    """
+    Directory of gffutils databases built from GFF3 files, to be reused by later runs on the same input.
+    Entries are keyed by a hash of the input content. A small key file maps the input path, size, and modification time
+    to the content hash, so that the input is only hashed when it is new or has changed.
+    Least recently used entries are removed once the total size of the cache exceeds max_size.
+    Concurrent processes share entries using advisory file locks. Entries are built under a temporary name and renamed
+    into place so that a partially built database is never opened. Lock files are never removed, as a process may be
+    waiting on one.
+    """
+    def __init__(self, directory: pathlib.Path, max_size: int = 10 * 2**30):
+        """
+        :param directory: cache directory, created if it does not exist
+        :param max_size: maximum total size of cached databases in bytes
+        """
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+
+    @staticmethod
+    def key(handle) -> str:
+        """
+        Build cache key for a file handle, without reading the file
+        :param handle: file handle opened from a path
+        :return: hex digest identifying the file at its path, or None if the handle is not backed by a file
+        """
+        path = getattr(handle, 'name', None)
+        if not isinstance(path, str) or not os.path.isfile(path):
+            return None
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        return hashlib.sha256(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}".encode()).hexdigest()
+
+    @staticmethod
+    def content_key(handle) -> str:
+        """
+        Hash the contents of the file of a handle, see key()
+        :param handle: file handle opened from a path
+        :return: hex digest of the file contents
+        """
+        content = hashlib.sha256()
+        with open(handle.name, 'rb') as file:
+            for chunk in iter(lambda: file.read(2**20), b''):
+                content.update(chunk)
+        return content.hexdigest()
+
+    def _paths(self, key: str) -> tuple:
+        return self.directory / f"{key}.db", self.directory / f"{key}.lock"
+
+    def _entry(self, handle, key: str) -> str:
+        """
+        Look up the content key of the input, hashing it if the key file is missing or its entry was evicted
+        :param handle: file handle opened from a path
+        :param key: key() of handle
+        :return: content key
+        """
+        key_path = self.directory / f"{key}.key"
+        try:
+            content = key_path.read_text()
+            if self._paths(content)[0].exists():
+                return content
+        except FileNotFoundError:
+            pass
+        content = self.content_key(handle)
+        tmp = key_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(content)
+        os.replace(tmp, key_path)
+        return content
+
+    def _build(self, handle, dbfn: pathlib.Path):
+        """
+        Build database for handle at dbfn, atomically replacing any existing file
+        """
+        tmp = dbfn.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            create_db(handle, str(tmp))
+            os.replace(tmp, dbfn)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    def evict(self, keep: str = None):
+        """
+        Remove least recently used entries until the cache fits within max_size, and key files of removed entries.
+        Entries in use by other processes are skipped.
+        :param keep: content key of an entry never to remove
+        :return: None
+        """
+        with open(self.directory / '.evict.lock', 'a') as evict_lock:
+            try:
+                fcntl.flock(evict_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another process is already evicting
+                return
+            entries = []
+            for dbfn in self.directory.glob('*.db'):
+                try:
+                    stat = dbfn.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, dbfn))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            for _, size, dbfn in entries:
+                if total <= self.max_size:
+                    break
+                if dbfn.stem == keep:
+                    continue
+                _, lock_path = self._paths(dbfn.stem)
+                with open(lock_path, 'a') as lock:
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+                    dbfn.unlink(True)
+                total -= size
+            for key_path in self.directory.glob('*.key'):
+                try:
+                    if not self._paths(key_path.read_text())[0].exists():
+                        key_path.unlink(True)
+                except FileNotFoundError:
+                    pass
+
+    def parse(self, handle) -> Generator[SeqIO.SeqRecord, None, None]:
+        """
+        Read records from GFF3 via the cached database for the input, building it if needed
+        Falls back to parse() if the handle is not backed by a file.
+        :param handle: text file handle
+        :return: generator of SeqRecord, one per seqid, ordered by seqid
+        """
+        key = self.key(handle)
+        if key is None:
+            yield from parse(handle)
+            return
+        content = self._entry(handle, key)
+        dbfn, lock_path = self._paths(content)
+        with open(lock_path, 'a') as lock:
+            # Hold a shared lock while reading so that the entry is not evicted
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            if not dbfn.exists():
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                if not dbfn.exists():
+                    self._build(handle, dbfn)
+                fcntl.flock(lock, fcntl.LOCK_SH)
+                self.evict(content)
+            # Update modification time to track least recently used
+            os.utime(dbfn)
+            db = gffutils.FeatureDB(str(dbfn))
+            try:
+                yield from parse_db(db)
+            finally:
+                db.conn.close()
+
+
+def parse(handle) -> Generator[SeqIO.SeqRecord, None, None]:
+    """
+    Read records from GFF3, streaming each record as soon as the lines for its seqid end
+    Seekable input is checked for seqids that reappear once the lines of the first seqid end, reading only the seqid of
+    the remaining lines. If one does, the whole input is loaded into a temporary gffutils database and output ordered by
+    seqid, as parse_unsorted(). Unseekable input can not be rewound, so if a seqid reappears after its record was output
+    only the remaining input is loaded into the database, and the features of the seqid are split between two records
+    sharing its id. Feature ids follow the gffutils "create_unique" merge strategy across the whole input.
+    :param handle: text file handle
+    :return: generator of SeqRecord
+    """
+    lengths = {}
+    ids = _UniqueIds()
+    if handle.seekable():
+        start = handle.tell()
+        # Read by readline() rather than iteration, which disables tell()
+        lines = _lines(iter(handle.readline, ''))
+        if (yield from _grouped(lines, lengths, ids, functools.partial(_contiguous, handle))) is not None:
+            handle.seek(start)
+            yield from parse_unsorted(handle)
+        return
+    lines = _lines(handle)
+    reappeared = yield from _grouped(lines, lengths, ids)
+    if reappeared is not None:
+        seqid = reappeared.split('\t', 1)[0]
+        warnings.warn(f"GFF3 input is not grouped by seqid, {seqid} reappears after its record was output. The remaining "
+                      f"input is loaded into a database, and output as further records per seqid. Sort the input by "
+                      f"seqid, or read it from a file, for a single record per seqid.")
+        yield from _parse_temporary_db(itertools.chain((reappeared,), lines), lengths, ids)
+
+
+def escape(value) -> str:
+    """
+    Escape an attribute value the same way gffutils does
+    :param value: string, or list of strings
+    :return: escaped string
+    """
+    if isinstance(value, str):
+        # Most values have nothing to escape, and searching is faster than translating
+        return value.translate(_escape_table) if _reserved.search(value) else value
+    # gffutils escapes the items of a list value only if the item is itself a reserved character, and concatenates them
+    return ''.join(_escapes.get(item, item) for item in value)
+
+
+def format_line(seqid: str, source: str, featuretype: str, start: int, end: int, score: str, strand: str, frame: str,
+                attributes: dict) -> str:
+    """
+    Format a GFF3 line, identical to str(gffutils.Feature(...))
+    :param attributes: dict of attribute names to lists of values
+    :return: line without line terminator
+    """
+    parts = []
+    for key, values in attributes.items():
+        value = ','.join(map(escape, values)) if values else ''
+        parts.append(f"{key}={value}" if value else key)
+    return f"{seqid}\t{source}\t{featuretype}\t{start}\t{end}\t{score}\t{strand}\t{frame}\t{';'.join(parts)}"
+
+
+def feature_lines(seqid: str, feature: SeqFeature.SeqFeature, index: int = 0, parts: bool = False) -> Generator[str, None, None]:
+    """
+    Format a SeqFeature as GFF3, the same as printing gffutils.biopython_integration.from_seqfeature(feature)
+    :param seqid: GFF seqid
+    :param feature: SeqFeature to format
+    :param index: index of the feature in its record, to build an ID for compound locations
+    :param parts: output a line per part of a compound location, sharing an ID, rather than a single line spanning it
+    :return: generator of lines without line terminators
+    """
+    qualifiers = feature.qualifiers
+    score = qualifiers.get('score', '.')[0]
+    frame = qualifiers.get('frame', '.')[0]
+    attributes = {k: v for k, v in qualifiers.items() if k not in column_qualifiers}
+    location = feature.location
+    if parts and len(location.parts) > 1:
+        if 'ID' not in attributes:
+            attributes = {'ID': [f"{seqid}:{index}"], **attributes}
+        for part in location.parts:
+            yield format_line(seqid, 'biopython.convert', feature.type, int(part.start) + 1, int(part.end), score,
+                              STRAND_SYMBOLS[part.strand], frame, attributes)
+    else:
+        yield format_line(seqid, 'biopython.convert', feature.type, int(location.start) + 1, int(location.end), score,
+                          STRAND_SYMBOLS[location.strand], frame, attributes)
+
+
+def gff_writer(records: Iterable[SeqIO.SeqRecord], handle, output_type: str, directives: bool = False,
+               fasta: bool = False):
+    """
+    Write the features of records as GFF3
+    :param records: iterable of SeqRecord instances
+    :param handle: text file handle to write to
+    :param output_type: output format, ignored
+    :param directives: start with ##gff-version, precede the features of each record with ##sequence-region, and output
+        a line per part of compound locations
+    :param fasta: end with a ##FASTA section of the record sequences. Records without a defined sequence are left out.
+    :return: None
+    """
+    lines = ['##gff-version 3'] if directives else []
+    # Sequences are kept on disk until all features are written
+    sequences = tempfile.TemporaryFile('w+') if fasta else None
+    try:
+        for record in records:
+            if directives:
+                lines.append(f"##sequence-region {record.id} 1 {len(record)}")
+            for index, feature in enumerate(record.features):
+                lines.extend(feature_lines(record.id, feature, index, directives))
+                if len(lines) >= write_batch:
+                    handle.write('\n'.join(lines))
+                    handle.write('\n')
+                    lines.clear()
+            if sequences:
+                try:
+                    sequence = str(record.seq)
+                except Seq.UndefinedSequenceError:
+                    continue
+                sequences.write(f">{record.id}\n")
+                if sequence:
+                    sequences.write('\n'.join(sequence[i:i + 60] for i in range(0, len(sequence), 60)))
+                    sequences.write('\n')
+        if lines:
+            handle.write('\n'.join(lines))
+            handle.write('\n')
+        if sequences and sequences.tell():
+            handle.write('##FASTA\n')
+            sequences.seek(0)
+            shutil.copyfileobj(sequences, handle)
+    finally:
+        if sequences:
+            sequences.close()
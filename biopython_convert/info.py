@@ -0,0 +1,203 @@
+"""
+Record information report
+Summarises each record as a GFF3 line, optionally with the composition of its sequence, followed by a summary of all
+records. Sequence composition is counted with NumPy over the bytes of each sequence during conversion.
+"""
+from collections import defaultdict
+
+from Bio import SeqIO, Seq
+
+from . import gff
+
+stat_annotations = ['molecule_type', 'topology', 'data_file_division', 'date', 'accessions', 'sequence_version', 'gi',
+                    'keywords', 'source', 'organism']
+
+
+def format_line(seqid: str, start: int, end: int, attributes: dict, source: str = 'biopython.convert',
+                featuretype: str = 'sequence') -> str:
+    """
+    Format a GFF3 line without score, strand, or frame
+    :param seqid: sequence id
+    :param start: 1 based start
+    :param end: end, inclusive
+    :param attributes: dict of attribute names to lists of values
+    :param source: source column
+    :param featuretype: type column
+    :return: GFF3 line without line terminator
+    """
+    return gff.format_line(seqid, source, featuretype, start, end, '.', '.', '.', attributes)
+
+
+def record_attributes(record: SeqIO.SeqRecord) -> dict:
+    """
+    Summarise annotations, source feature, and feature counts of a record
+    :param record: SeqIO.SeqRecord to summarise
+    :return: dict of GFF3 attribute names to lists of values
+    """
+    if record.name:
+        attributes = {'Name': [record.name]}
+    else:
+        attributes = {}
+    for k, v in record.annotations.items():
+        if k in stat_annotations:
+            if isinstance(v, list):
+                v = [str(a) for a in v]
+            else:
+                v = [str(v)]
+            if v:
+                attributes[k] = v
+
+    feat_count = defaultdict(int)
+    for f in record.features:
+        if f.type == 'source':
+            # Include source coordinate
+            attributes[f"source__location"] = [str(part) for part in f.location.parts]
+            # Include source qualifiers
+            for k, v in f.qualifiers.items():
+                attr = attributes.get(f"source_{k}", [])
+                if not isinstance(attr, list):
+                    attr = [attr]
+                attr.append(v)
+                attributes[f"source_{k}"] = attr
+        # Count features of each type
+        feat_count[f.type] += 1
+    attributes['features'] = [f"{k}:{v}" for k, v in feat_count.items()]
+
+    if record.description:
+        attributes['desc'] = [record.description]
+    return attributes
+
+
+def byte_counts(seq: Seq.Seq):
+    """
+    Count each byte value of a sequence
+    :param seq: sequence to count
+    :return: numpy array of 256 counts, or None if the sequence is undefined
+    """
+    import numpy
+    try:
+        data = bytes(seq)
+    except Seq.UndefinedSequenceError:
+        return None
+    return numpy.bincount(numpy.frombuffer(data, dtype=numpy.uint8), minlength=256)
+
+
+class Composition:
+    """
+    Sequence composition derived from byte counts
+    """
+    def __init__(self, counts):
+        """
+        :param counts: numpy array of the count of each byte value, see byte_counts()
+        """
+        upper = counts[ord('A'):ord('Z') + 1] + counts[ord('a'):ord('z') + 1]
+
+        def count(bases):
+            return int(sum(upper[ord(b) - ord('A')] for b in bases))
+
+        self.length = int(counts.sum())
+        # Ambiguous S (G or C) and W (A or T) are counted, other ambiguous bases are excluded, as Bio.SeqUtils.gc_fraction
+        acgt = count('ACGTUSW')
+        self.gc = count('GCS') / acgt if acgt else 0.0
+        self.n = count('N')
+        self.ambiguous = int(upper.sum()) - count('ACGTUN')
+        # Soft masked bases are lower case
+        self.masked = int(counts[ord('a'):ord('z') + 1].sum()) / self.length if self.length else 0.0
+
+    def attributes(self) -> dict:
+        """
+        :return: dict of GFF3 attribute names to lists of values
+        """
+        return {
+            'gc': [f"{self.gc:.4f}"],
+            'N': [str(self.n)],
+            'ambiguous': [str(self.ambiguous)],
+            'masked': [f"{self.masked:.4f}"],
+        }
+
+
+class Summary:
+    """
+    Totals over all records, can be combined with the totals of other records
+    """
+    def __init__(self):
+        import numpy
+        self.lengths = []
+        self.counts = numpy.zeros(256, dtype=numpy.int64)
+        # Number of records whose sequence was counted
+        self.counted = 0
+
+    def add(self, length: int, counts=None):
+        """
+        :param length: length of a record
+        :param counts: byte counts of the record sequence, None if undefined
+        """
+        self.lengths.append(length)
+        if counts is not None:
+            self.counts += counts
+            self.counted += 1
+
+    def merge(self, other: 'Summary'):
+        """
+        Add the totals of other records
+        :param other: Summary of the other records
+        """
+        self.lengths.extend(other.lengths)
+        self.counts += other.counts
+        self.counted += other.counted
+
+    def attributes(self) -> dict:
+        """
+        :return: dict of GFF3 attribute names to lists of values
+        """
+        import numpy
+        lengths = numpy.sort(numpy.array(self.lengths, dtype=numpy.int64))[::-1]
+        total = int(lengths.sum())
+        attributes = {'records': [str(len(lengths))], 'length': [str(total)]}
+        if total:
+            # The shortest of the longest records that together cover half the total length
+            l50 = int(numpy.searchsorted(numpy.cumsum(lengths), total / 2)) + 1
+            attributes['N50'] = [str(lengths[l50 - 1])]
+            attributes['L50'] = [str(l50)]
+            # Number of records in each power of 10 of length
+            decades, counts = numpy.unique(10 ** numpy.floor(numpy.log10(lengths[lengths > 0])).astype(numpy.int64),
+                                           return_counts=True)
+            attributes['length_histogram'] = [f"{d}:{c}" for d, c in zip(decades, counts)]
+        if self.counted:
+            attributes.update(Composition(self.counts).attributes())
+        return attributes
+
+
+class Report:
+    """
+    Writes a GFF3 line per record to a handle, accumulating a Summary
+    """
+    def __init__(self, handle, composition: bool = False):
+        """
+        :param handle: file handle to write to
+        :param composition: include sequence composition of each record, and enable the summary
+        """
+        self.handle = handle
+        self.composition = composition
+        self.summary = Summary()
+
+    def add(self, record: SeqIO.SeqRecord):
+        """
+        Write the line of a record
+        :param record: SeqRecord to summarise
+        """
+        attributes = record_attributes(record)
+        if self.composition:
+            counts = byte_counts(record.seq)
+            self.summary.add(len(record), counts)
+            if counts is not None:
+                attributes.update(Composition(counts).attributes())
+        print(format_line(record.id, 1, len(record), attributes), file=self.handle)
+
+    def write_summary(self):
+        """
+        Write the summary of all records as a comment, if composition is enabled
+        """
+        if self.composition:
+            attributes = self.summary.attributes()
+            print(f"#summary {';'.join(k + '=' + ','.join(v) for k, v in attributes.items())}", file=self.handle)
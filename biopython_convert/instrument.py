@@ -0,0 +1,265 @@
+"""
+Conversion metrics
+Times each stage of a conversion, counts records, features, and bytes in and out, and records peak memory, for a JSON
+report that job schedulers can collect. Optionally profiles the conversion with cProfile or tracemalloc.
+
+Conversions are pipelines of generators, so stages are timed exclusively: while the writer waits for the next record,
+the time spent parsing it counts towards parse, not write. The stages of a report add up to its seconds.
+The hooks stage(), timed(), and timed_function() do nothing unless a conversion is being measured.
+
+Stages:
+    setup: importing dependencies, opening the input and output, and anything else outside the other stages
+    index: building or loading the record index of the input
+    parse: reading records from the input
+    gff-db: loading GFF3 input that is not grouped by seqid into a gffutils database
+    query: evaluating JMESPath and converting its results to output records
+    serialize: converting records to the json and yaml representation
+    stats: record details, -i and -I
+    write: formatting and writing output, including compression
+    shard: converting ranges of the input in worker processes, which are not measured in detail
+"""
+import json
+import time
+import pathlib
+import contextlib
+import contextvars
+from typing import Callable
+
+# Version of the report format
+version = 1
+
+profilers = ('cprofile', 'tracemalloc')
+
+_active = contextvars.ContextVar('metrics', default=None)
+
+
+class Metrics:
+    """
+    Measurements of a single conversion
+    """
+    def __init__(self, profile: str = None, top: int = 25):
+        """
+        :param profile: one of profilers, or None
+        :param top: number of functions or allocation sites to report when profiling
+        """
+        if profile is not None and profile not in profilers:
+            raise ValueError(f"Unknown profiler {profile}, expected one of {', '.join(profilers)}")
+        self.profile = profile
+        self.top = top
+        self.stages = {}
+        self.counts = dict(records_in=0, features_in=0, records_out=0)
+        self.outputs = []
+        self.seconds = 0.0
+        self.profiled = None
+        self._stack = []
+        self._last = 0.0
+
+    def _switch(self):
+        # Charge the time since the last switch to the innermost stage
+        now = time.perf_counter()
+        if self._stack:
+            name = self._stack[-1]
+            self.stages[name] = self.stages.get(name, 0.0) + now - self._last
+        self._last = now
+
+    def enter(self, name: str):
+        self._switch()
+        self._stack.append(name)
+
+    def exit(self):
+        self._switch()
+        self._stack.pop()
+
+    def _timed(self, iterator, name: str, counter: Callable):
+        while True:
+            if name:
+                self.enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                if name:
+                    self.exit()
+            if counter:
+                counter(self, item)
+            yield item
+
+    @contextlib.contextmanager
+    def measure(self):
+        """
+        Make this the active measurement of the conversion within the context, and profile it if requested
+        """
+        token = _active.set(self)
+        profiler = self._start_profile()
+        start = time.perf_counter()
+        self.enter('setup')
+        try:
+            yield self
+        finally:
+            while self._stack:
+                self.exit()
+            self.seconds += time.perf_counter() - start
+            self._stop_profile(profiler)
+            _active.reset(token)
+
+    def _start_profile(self):
+        if self.profile == 'cprofile':
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        if self.profile == 'tracemalloc':
+            import tracemalloc
+            tracemalloc.start()
+        return None
+
+    def _stop_profile(self, profiler):
+        if self.profile == 'cprofile':
+            import pstats
+            profiler.disable()
+            functions = sorted(pstats.Stats(profiler).stats.items(), key=lambda item: item[1][2], reverse=True)
+            self.profiled = [dict(function=f"{path}:{line}({name})", calls=calls, seconds=own, cumulative=cumulative)
+                             for (path, line, name), (_, calls, own, cumulative, _) in functions[:self.top]]
+        elif self.profile == 'tracemalloc':
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            # Memory still held at the end of the conversion, such as caches and loaded records
+            self.profiled = dict(peak=peak, held=[dict(location=str(statistic.traceback), bytes=statistic.size,
+                                                       count=statistic.count)
+                                                  for statistic in snapshot.statistics('lineno')[:self.top]])
+
+    def report(self, input_path: pathlib.Path, input_type: str, output_path: pathlib.Path, output_type: str,
+               error: str = '') -> dict:
+        """
+        :param input_path: input of the conversion
+        :param input_type: input format
+        :param output_path: output of the conversion, the base path if split
+        :param output_type: output format
+        :param error: error that stopped the conversion
+        :return: JSON serialisable report. maxrss is the peak resident memory in KiB of this process over its lifetime,
+            children_maxrss that of the largest worker process.
+        """
+        import resource
+        report = dict(
+            version=version, status='failed' if error else 'ok', error=error,
+            input=dict(path=str(input_path), type=input_type, bytes=_size(input_path)),
+            output=dict(path=str(output_path), type=output_type, files=0, bytes=0),
+            seconds=self.seconds, stages=dict(sorted(self.stages.items(), key=lambda item: item[1], reverse=True)),
+            **self.counts,
+            maxrss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            children_maxrss=resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        )
+        sizes = [size for size in map(_size, self.outputs) if size is not None]
+        report['output'].update(files=len(sizes), bytes=sum(sizes))
+        if 'shard' in self.stages:
+            # Records are counted by the worker processes
+            for name in self.counts:
+                report[name] = None
+        if self.profile:
+            report['profile'] = {self.profile: self.profiled}
+        return report
+
+    def write(self, path: pathlib.Path, *args, **kwargs):
+        """
+        Write report() as JSON
+        :param path: path to write to
+        :param args: arguments of report()
+        """
+        with open(path, 'w') as handle:
+            json.dump(self.report(*args, **kwargs), handle, indent=1)
+            handle.write('\n')
+
+
+def _size(path: pathlib.Path):
+    try:
+        return pathlib.Path(path).stat().st_size
+    except OSError:
+        return None
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """
+    Time the context as a stage of the conversion being measured
+    :param name: stage name
+    """
+    metrics = _active.get()
+    if metrics is None:
+        yield
+        return
+    metrics.enter(name)
+    try:
+        yield
+    finally:
+        metrics.exit()
+
+
+def timed(iterable, name: str = None, counter: Callable = None):
+    """
+    Time the iteration of iterable as a stage of the conversion being measured
+    :param iterable: iterable to time
+    :param name: stage name, or None to only count items
+    :param counter: Callable(Metrics, item) called with each item
+    :return: iterable, unaltered if no conversion is being measured
+    """
+    metrics = _active.get()
+    if metrics is None:
+        return iterable
+    return metrics._timed(iter(iterable), name, counter)
+
+
+def timed_function(name: str, func: Callable) -> Callable:
+    """
+    Time calls of func as a stage of the conversion being measured
+    :param name: stage name
+    :param func: Callable to time
+    :return: func, unaltered if no conversion is being measured
+    """
+    metrics = _active.get()
+    if metrics is None:
+        return func
+
+    def timed_func(*args, **kwargs):
+        metrics.enter(name)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics.exit()
+    return timed_func
+
+
+def count(**counts: int):
+    """
+    Add to the counts of the conversion being measured, for stages that do not produce records
+    :param counts: amounts to add to each count
+    """
+    metrics = _active.get()
+    if metrics is not None:
+        for name, value in counts.items():
+            metrics.counts[name] += value
+
+
+def count_input(metrics: Metrics, record):
+    metrics.counts['records_in'] += 1
+    metrics.counts['features_in'] += len(getattr(record, 'features', ()))
+
+
+def count_output(metrics: Metrics, record):
+    metrics.counts['records_out'] += 1
+
+
+def add_output(metrics: Metrics, path: pathlib.Path):
+    metrics.outputs.append(path)
+
+
+def output(path: pathlib.Path):
+    """
+    Record an output path of the conversion being measured, for the bytes written
+    :param path: output path
+    """
+    metrics = _active.get()
+    if metrics is not None:
+        metrics.outputs.append(path)
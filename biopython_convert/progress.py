@@ -0,0 +1,170 @@
+"""
+Progress reports
+Reports how far a conversion is through its input on stderr: the bytes read against the size of the input, the records
+read per second, the bytes read per second, and the estimated time remaining. Compressed inputs are measured by the
+compressed bytes read. Reports are made by a background thread that only reads the position of the input file, so that
+reading records is not slowed down. Reports are either a line of text, redrawn on a terminal, or JSON lines for log
+collection.
+"""
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+import contextvars
+
+styles = ('text', 'json')
+
+_active = contextvars.ContextVar('progress', default=None)
+
+
+def _file(handle) -> tuple:
+    """
+    :param handle: input file handle
+    :return: (file descriptor, size in bytes) of the file read by handle, or None for either if it is not a regular file
+    """
+    try:
+        fd = handle.fileno()
+        size = os.fstat(fd).st_size
+    except (AttributeError, OSError, ValueError):
+        return None, None
+    return fd, size or None
+
+
+def _duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class Progress:
+    """
+    Progress of reading an input, reported at an interval by a background thread
+    """
+    def __init__(self, handle, output=None, style: str = 'text', interval: float = None):
+        """
+        :param handle: input file handle, measured by the position of its file descriptor
+        :param output: text handle to write reports to, defaults to stderr
+        :param style: one of styles
+        :param interval: seconds between reports. Defaults to 0.5 when redrawing a line on a terminal, otherwise 10.
+        """
+        if style not in styles:
+            raise ValueError(f"Unknown progress style {style}, expected one of {', '.join(styles)}")
+        self.output = output or sys.stderr
+        self.style = style
+        self.redraw = style == 'text' and self.output.isatty()
+        self.interval = interval or (0.5 if self.redraw else 10)
+        self.records = 0
+        self.fd, self.total = _file(handle)
+        self.start = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='progress', daemon=True)
+
+    def position(self):
+        """
+        :return: bytes read from the input file, or None if unknown
+        """
+        if self.fd is None:
+            return None
+        try:
+            return os.lseek(self.fd, 0, os.SEEK_CUR)
+        except OSError:
+            return None
+
+    def snapshot(self, done: bool = False) -> dict:
+        """
+        :param done: the conversion has finished
+        :return: dict of elapsed seconds, bytes read, total bytes, records, records_per_second, bytes_per_second,
+            eta in seconds, and done. bytes, total, bytes_per_second, and eta are None if unknown.
+        """
+        elapsed = time.monotonic() - self.start
+        position = self.position()
+        bytes_per_second = position / elapsed if position is not None and elapsed else None
+        eta = None
+        if done:
+            eta = 0
+        elif self.total and bytes_per_second:
+            eta = max(self.total - position, 0) / bytes_per_second
+        return dict(elapsed=elapsed, bytes=position, total=self.total, records=self.records,
+                    records_per_second=self.records / elapsed if elapsed else 0, bytes_per_second=bytes_per_second,
+                    eta=eta, done=done)
+
+    def format(self, snapshot: dict) -> str:
+        """
+        :param snapshot: result of snapshot()
+        :return: report as a line of text without line terminator
+        """
+        parts = []
+        if snapshot['bytes'] is not None:
+            if snapshot['total']:
+                parts.append(f"{100 * min(snapshot['bytes'] / snapshot['total'], 1):5.1f}% "
+                             f"{snapshot['bytes'] / 1e6:.1f} of {snapshot['total'] / 1e6:.1f} MB")
+            else:
+                parts.append(f"{snapshot['bytes'] / 1e6:.1f} MB")
+        parts.append(f"{snapshot['records']} records")
+        parts.append(f"{snapshot['records_per_second']:.1f} records/s")
+        if snapshot['bytes_per_second'] is not None:
+            parts.append(f"{snapshot['bytes_per_second'] / 1e6:.1f} MB/s")
+        if snapshot['done']:
+            parts.append(f"done in {_duration(snapshot['elapsed'])}")
+        elif snapshot['eta'] is not None:
+            parts.append(f"ETA {_duration(snapshot['eta'])}")
+        return ', '.join(parts)
+
+    def write(self, done: bool = False):
+        """
+        Write a report
+        :param done: the conversion has finished
+        """
+        snapshot = self.snapshot(done)
+        if self.style == 'json':
+            self.output.write(json.dumps(snapshot) + '\n')
+        elif self.redraw:
+            # Return to the start of the line and clear it
+            self.output.write(f"\r{self.format(snapshot)}\x1b[K" + ('\n' if done else ''))
+        else:
+            self.output.write(self.format(snapshot) + '\n')
+        self.output.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def counted(self, records):
+        for record in records:
+            self.records += 1
+            yield record
+
+
+@contextlib.contextmanager
+def report(handle, style: str = 'text', output=None, interval: float = None):
+    """
+    Report the progress of reading handle until the context exits, then report that the conversion is done
+    Records are counted by counted() within the context.
+    :param handle: input file handle
+    :param style: one of styles
+    :param output: text handle to write reports to, defaults to stderr
+    :param interval: seconds between reports, see Progress
+    """
+    progress = Progress(handle, output, style, interval)
+    token = _active.set(progress)
+    progress._thread.start()
+    try:
+        yield progress
+    finally:
+        progress._stop.set()
+        progress._thread.join()
+        progress.write(done=True)
+        _active.reset(token)
+
+
+def counted(records):
+    """
+    Count records read while reporting progress
+    :param records: iterable of input records
+    :return: records, unaltered if progress is not being reported
+    """
+    progress = _active.get()
+    if progress is None:
+        return records
+    return progress.counted(records)
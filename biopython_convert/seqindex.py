@@ -0,0 +1,107 @@
+"""
+Indexed input
+Keeps a persistent SQLite index of record offsets, built with Bio.SeqIO.index_db(), so that JMESPath indexes, slices,
+and length(@) on the root list parse only the records they select. Input may be uncompressed or BGZF compressed.
+"""
+import os
+import sqlite3
+import hashlib
+import pathlib
+
+from Bio import SeqIO
+
+from . import JMESPathGen, formats, compression
+
+
+def index_path(input_path: pathlib.Path, cache: pathlib.Path = None) -> pathlib.Path:
+    """
+    Location of the index of an input
+    :param input_path: Path to input dataset
+    :param cache: directory to keep the index in, rather than next to the input
+    :return: path of the index
+    """
+    if cache:
+        key = hashlib.sha256(str(input_path.resolve()).encode()).hexdigest()[:16]
+        return cache / f"{input_path.name}.{key}.idx"
+    return input_path.with_name(input_path.name + '.idx')
+
+
+def open_index(input_path: pathlib.Path, input_type: str, path: pathlib.Path):
+    """
+    Open the index of an input, building it if it is missing, older than the input, or was built for another type
+    The index is built under a temporary name and then moved into place, so concurrent runs never see a partial index.
+    :param input_path: Path to input dataset
+    :param input_type: Format of input dataset
+    :param path: path of the index, see index_path()
+    :return: dict like object of record id to SeqRecord, see Bio.SeqIO.index_db()
+    :raises ValueError: if the input type or compression can not be indexed or record ids are not unique
+    """
+    input_compression = compression.detect(input_path)
+    if input_compression not in ('none', 'bgzf'):
+        raise ValueError(f"{input_compression} compressed input can not be indexed, use BGZF instead")
+    filename = str(input_path.resolve())
+    if path.exists() and path.stat().st_mtime >= input_path.stat().st_mtime:
+        try:
+            return SeqIO.index_db(str(path), filename, input_type)
+        except ValueError:
+            # Index of a different input type or file, rebuild
+            pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}")
+    try:
+        SeqIO.index_db(str(tmp), filename, input_type).close()
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(True)
+    return SeqIO.index_db(str(path), filename, input_type)
+
+
+class IndexedRecords(JMESPathGen.RandomAccessList):
+    """
+    Records of an input in file order, parsing only the records that are accessed by position
+    Iterating parses the whole input sequentially.
+    """
+    def __init__(self, input_path: pathlib.Path, input_type: str, path: pathlib.Path):
+        """
+        :param input_path: Path to input dataset
+        :param input_type: Format of input dataset
+        :param path: path of the index, see index_path()
+        :raises ValueError: if the input type or compression can not be indexed or record ids are not unique
+        """
+        self.input_path = input_path
+        self.input_type = input_type
+        self._index = open_index(input_path, input_type, path)
+        # index_db() assigns rowids 1 to n in file order
+        self._con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        self._length = len(self._index)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self.slice(i))
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError("record index out of range")
+        key, = self._con.execute("SELECT key FROM offset_data WHERE rowid = ?", (i + 1,)).fetchone()
+        return self._index[key]
+
+    def slice(self, s: slice):
+        start, stop, step = s.indices(self._length)
+        if step != 1:
+            yield from super().slice(s)
+            return
+        # Look up the keys of a contiguous slice with a single range query
+        for key, in self._con.execute("SELECT key FROM offset_data WHERE rowid > ? AND rowid <= ? ORDER BY rowid",
+                                      (start, stop)):
+            yield self._index[key]
+
+    def __iter__(self):
+        with compression.open_input(self.input_path, 'r' + formats.get(self.input_type).mode) as handle:
+            yield from SeqIO.parse(handle, self.input_type)
+
+    def close(self):
+        self._con.close()
+        self._index.close()
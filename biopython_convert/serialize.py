@@ -0,0 +1,192 @@
+"""
+Record serialisation
+Converts SeqRecords and query results to the lists, dicts, and scalars written by the json, yaml, and text outputs.
+The converter for each value is chosen once per type rather than testing every value, and the input is never modified.
+
+Schema 1 is the original output of biopython.convert:
+    strings that parse as integers are output as integers, the sequence and location attributes of SeqRecords and
+    FeatureLocations are output without their leading underscore, positions are output as strings or integers,
+    and any other object is output as its attributes.
+Schema 2 outputs only the public attributes of SeqRecords, strings are left as strings, exact positions are output as
+    integers, and fuzzy positions as strings.
+"""
+import sys
+import types
+import collections
+from typing import Callable
+
+from Bio import SeqIO, SeqFeature, Seq
+
+
+class Serializer:
+    """
+    Convert a value and everything it contains without modifying it
+    Converters are resolved from an ordered list of rules on the first value of each type and cached by type.
+    """
+    def __init__(self, rules: list, default: Callable):
+        """
+        :param rules: list of (test, converter) in order of precedence. test is a type, tuple of types, or a
+            Callable(value) -> bool. converter is a Callable(convert, value) returning the converted value, where
+            convert is a Callable(value) to convert the values it contains.
+        :param default: converter for values that match no rule
+        """
+        self._rules = rules
+        self._default = default
+        converters = self._converters = {}
+        resolve = self._resolve
+
+        # A closure is called for every value, avoiding the overhead of calling a bound method
+        def convert(value):
+            converter = converters.get(type(value))
+            if converter is _identity:
+                return value
+            if converter is None:
+                converter = converters[type(value)] = resolve(value)
+            return converter(convert, value)
+        self.convert = convert
+
+    def __call__(self, value):
+        return self.convert(value)
+
+    def _resolve(self, value) -> Callable:
+        for test, converter in self._rules:
+            if isinstance(test, (type, tuple)):
+                if isinstance(value, test):
+                    return converter
+            elif test(value):
+                return converter
+        return self._default
+
+
+def _random_access(v) -> bool:
+    # Lists of JMESPathGen, such as indexed input or a query result kept in a temporary file. Any exists only once
+    # JMESPathGen is imported, which is not imported here so that output without a query does not import jmespath.
+    JMESPathGen = sys.modules.get(f"{__package__}.JMESPathGen")
+    return JMESPathGen is not None and isinstance(v, JMESPathGen.RandomAccessList)
+
+
+def _identity(convert: Callable, v):
+    return v
+
+
+def _str(convert: Callable, v) -> str:
+    return str(v)
+
+
+def _int_or_str(convert: Callable, v: str):
+    # int() accepts leading whitespace, a sign, or any unicode decimal digit. Skip the attempt for any other string,
+    # avoiding a copy of long strings such as sequences.
+    c = v[:1]
+    if c and (c.isdigit() or c in '+-' or c.isspace()):
+        try:
+            return int(v)
+        except ValueError:
+            pass
+    return v
+
+
+def _list(convert: Callable, v) -> list:
+    return [convert(i) for i in v]
+
+
+def _indexed(convert: Callable, v) -> list:
+    return [convert(v[i]) for i in range(len(v))]
+
+
+def _mapping(convert: Callable, v) -> dict:
+    if isinstance(v, dict):
+        return {k: convert(i) for k, i in v.items()}
+    return {k: convert(v[k]) for k in v.keys()}
+
+
+def _attributes(convert: Callable, v) -> dict:
+    return {k: convert(i) for k, i in vars(v).items()}
+
+
+def _record_v1(convert: Callable, v: SeqIO.SeqRecord) -> dict:
+    seq = str(v.seq)
+    result = {k: convert(i) for k, i in vars(v).items() if k != '_seq'}
+    result['seq'] = _int_or_str(convert, seq)
+    return result
+
+
+def _location_v1(convert: Callable, v: SeqFeature.FeatureLocation) -> dict:
+    result = {k: convert(i) for k, i in vars(v).items() if k not in ('_start', '_end', '_strand')}
+    result['start'] = convert(v.start)
+    result['end'] = convert(v.end)
+    result['strand'] = convert(v.strand)
+    return result
+
+
+def _position_v1(convert: Callable, v: SeqFeature.AbstractPosition):
+    return _int_or_str(convert, str(v))
+
+
+def _record_v2(convert: Callable, v: SeqIO.SeqRecord) -> dict:
+    seq = str(v.seq)
+    return {
+        'id': convert(v.id),
+        'name': convert(v.name),
+        'description': convert(v.description),
+        'dbxrefs': convert(v.dbxrefs),
+        'annotations': convert(v.annotations),
+        'letter_annotations': _mapping(convert, v.letter_annotations),
+        'features': convert(v.features),
+        'seq': seq,
+    }
+
+
+def _location_v2(convert: Callable, v: SeqFeature.FeatureLocation) -> dict:
+    return {
+        'start': convert(v.start),
+        'end': convert(v.end),
+        'strand': v.strand,
+        'ref': v.ref,
+        'ref_db': v.ref_db,
+    }
+
+
+def _position_v2(convert: Callable, v: SeqFeature.AbstractPosition):
+    return int(v) if isinstance(v, SeqFeature.ExactPosition) else str(v)
+
+
+_iterables = (types.GeneratorType, map, filter, tuple)
+
+schemas = {
+    1: Serializer([
+        (str, _int_or_str),
+        (Seq.Seq, _str),
+        (_iterables, _list),
+        (SeqIO.SeqRecord, _record_v1),
+        (SeqFeature.FeatureLocation, _location_v1),
+        (SeqFeature.AbstractPosition, _position_v1),
+        (collections.OrderedDict, _mapping),
+        (_random_access, _list),
+        (lambda v: hasattr(v, '__dict__'), _attributes),
+        (lambda v: hasattr(v, 'keys'), _mapping),
+        (list, _list),
+        (lambda v: hasattr(v, '__getitem__'), _indexed),
+    ], _identity),
+    2: Serializer([
+        (str, _identity),
+        ((Seq.Seq, Seq.MutableSeq), _str),
+        ((*_iterables, list), _list),
+        (SeqIO.SeqRecord, _record_v2),
+        (SeqFeature.FeatureLocation, _location_v2),
+        (SeqFeature.AbstractPosition, _position_v2),
+        (lambda v: hasattr(v, 'keys'), _mapping),
+        (_random_access, _list),
+        (lambda v: hasattr(v, '__dict__'), _attributes),
+        (lambda v: hasattr(v, '__getitem__'), _indexed),
+    ], _identity),
+}
+
+# Containers of strings, for text output
+text = Serializer([
+    (str, _identity),
+    ((*_iterables, list), _list),
+    (_random_access, _list),
+    ((Seq.Seq, SeqIO.SeqRecord), _str),
+    (lambda v: hasattr(v, 'keys'), _mapping),
+    (lambda v: hasattr(v, '__getitem__'), _indexed),
+], _str)
@@ -0,0 +1,291 @@
+"""
+Conversion daemon
+Keeps a pool of worker processes with every module already imported, and accepts conversions over a Unix domain
+socket, so that each conversion does not pay for starting the interpreter and importing its dependencies.
+Compiled JMESPath queries are cached between conversions.
+
+The protocol is a line of JSON per request and response. A request is an object holding the arguments of convert(),
+with paths made absolute, stats a boolean, and protocol set to the version below. The response holds status ('ok',
+'failed', or 'unsupported' if the daemon speaks another protocol version), seconds, error, stats (the record details
+text, if requested), and warnings (formatted warning messages).
+"""
+import io
+import os
+import sys
+import json
+import stat
+import time
+import signal
+import socket
+import pathlib
+import tempfile
+import warnings
+import functools
+import threading
+import socketserver
+
+protocol = 3
+
+# Arguments of convert() accepted in requests, and how to convert them from JSON
+_arguments = {
+    'input_path': pathlib.Path, 'input_type': str, 'output_path': pathlib.Path, 'output_type': str, 'split': bool,
+    'jpath': str, 'stats': bool, 'per_record': bool, 'cache': pathlib.Path, 'jobs': int, 'yaml_safe': bool,
+    'schema': int, 'qualifiers': tuple, 'composition': bool, 'gff_directives': bool, 'gff_fasta': bool, 'index': bool,
+    'compress': str, 'metrics': pathlib.Path, 'profile': str, 'query_memory': int, 'cache_size': int,
+}
+_required = ('input_path', 'input_type', 'output_path', 'output_type')
+
+
+def default_socket_path() -> pathlib.Path:
+    """
+    :return: socket path given by $BIOPYTHON_CONVERT_SOCKET, or a per user path in $XDG_RUNTIME_DIR or a per user
+        directory of the temporary directory
+    """
+    if os.environ.get('BIOPYTHON_CONVERT_SOCKET'):
+        return pathlib.Path(os.environ['BIOPYTHON_CONVERT_SOCKET'])
+    if os.environ.get('XDG_RUNTIME_DIR'):
+        return pathlib.Path(os.environ['XDG_RUNTIME_DIR'], 'biopython.convert.sock')
+    return _temporary_directory() / 'daemon.sock'
+
+
+def _temporary_directory() -> pathlib.Path:
+    """
+    :return: per user directory of the temporary directory for the socket, see _private_directory()
+    """
+    return pathlib.Path(tempfile.gettempdir(), f"biopython.convert-{os.getuid()}")
+
+
+def _private_directory(path: pathlib.Path):
+    """
+    Create a directory only accessible to the current user, or check that an existing one is
+    :param path: directory path
+    :raises OSError: if path exists and is not a directory owned by the current user with mode 0700
+    """
+    try:
+        path.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+    status = os.lstat(path)
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid() or stat.S_IMODE(status.st_mode) & 0o077:
+        raise OSError(f"{path} must be a directory owned by the current user and only accessible to them")
+
+
+def _trusted(path: pathlib.Path) -> bool:
+    """
+    :return: True if path is a socket owned by the current user, so a daemon of another user can not receive requests
+    """
+    try:
+        status = os.stat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(status.st_mode) and status.st_uid == os.getuid()
+
+
+def run_job(arguments: dict) -> dict:
+    """
+    Convert in a worker process
+    :param arguments: keyword arguments of convert(), with stats a boolean
+    :return: response without status or seconds
+    """
+    from . import convert
+    stats = io.StringIO() if arguments.pop('stats', False) else None
+    response = dict(error='', stats='', warnings=[])
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('default')
+        try:
+            convert(**arguments, stats=stats)
+        except Exception as e:
+            response['error'] = f"{type(e).__name__}: {e}"
+    response['warnings'] = [warnings.formatwarning(w.message, w.category, w.filename, w.lineno) for w in caught]
+    if stats:
+        response['stats'] = stats.getvalue()
+    return response
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Accepts connections on a Unix domain socket, handling each in a thread that passes its requests to the worker pool
+    """
+    daemon_threads = True
+
+    def __init__(self, path: pathlib.Path, workers: int = 1):
+        """
+        :param path: socket path. A stale socket left by a daemon that is no longer running is replaced.
+        :param workers: number of worker processes
+        :raises OSError: if a daemon is already listening on path
+        """
+        import concurrent.futures
+        from . import JMESPathGen
+        if path.parent == _temporary_directory():
+            _private_directory(path.parent)
+        if path.exists():
+            existing = _connect(path)
+            if existing is not None:
+                existing.close()
+                raise OSError(f"A daemon is already listening on {path}")
+            path.unlink()
+        self.path = path
+        self.workers = workers
+        self.pool = concurrent.futures.ProcessPoolExecutor(workers)
+        self._pool_lock = threading.Lock()
+        self.compile = functools.lru_cache(256)(JMESPathGen.compile)
+        # Only the current user may connect, from the moment the socket is bound
+        umask = os.umask(0o177)
+        try:
+            super().__init__(str(path), Handler)
+        finally:
+            os.umask(umask)
+
+    def submit(self, request: dict) -> dict:
+        """
+        Run a request in the worker pool
+        :param request: decoded request
+        :return: response
+        """
+        start = time.perf_counter()
+        if request.get('protocol') != protocol:
+            return dict(status='unsupported', seconds=0, stats='', warnings=[],
+                        error=f"Protocol {request.get('protocol')} is not supported, the daemon speaks {protocol}")
+        try:
+            arguments = {}
+            for name, value in request.items():
+                if name not in _arguments and name != 'protocol':
+                    raise ValueError(f"Unknown argument {name}")
+                if name in _arguments and value is not None:
+                    arguments[name] = _arguments[name](value)
+            missing = [name for name in _required if name not in arguments]
+            if missing:
+                raise ValueError(f"Missing arguments {', '.join(missing)}")
+            if arguments.get('jpath'):
+                arguments['jpath'] = self.compile(arguments['jpath'])
+            response = self._pool_submit(arguments).result()
+        except Exception as e:
+            response = dict(error=f"{type(e).__name__}: {e}", stats='', warnings=[])
+        response['status'] = 'failed' if response['error'] else 'ok'
+        response['seconds'] = time.perf_counter() - start
+        return response
+
+    def _pool_submit(self, arguments: dict):
+        import concurrent.futures
+        from concurrent.futures.process import BrokenProcessPool
+        with self._pool_lock:
+            try:
+                return self.pool.submit(run_job, arguments)
+            except BrokenProcessPool:
+                # A worker died, replace the pool so later requests still succeed
+                self.pool.shutdown(wait=False)
+                self.pool = concurrent.futures.ProcessPoolExecutor(self.workers)
+                return self.pool.submit(run_job, arguments)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+        self.path.unlink(True)
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("Request must be a JSON object")
+            except ValueError as e:
+                response = dict(status='failed', seconds=0, error=f"Invalid request: {e}", stats='', warnings=[])
+            else:
+                response = self.server.submit(request)
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+            self.wfile.flush()
+
+
+def serve(path: pathlib.Path = None, workers: int = 1):
+    """
+    Run the daemon until interrupted or terminated
+    :param path: socket path, defaults to default_socket_path()
+    :param workers: number of worker processes
+    """
+    path = path or default_socket_path()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    with Server(path, workers) as server:
+        print(f"Listening on {path} with {workers} workers", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def _connect(path: pathlib.Path):
+    """
+    :return: socket connected to a daemon listening on path, or None if there is none or it belongs to another user
+    """
+    if not _trusted(path):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(path))
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def request(path: pathlib.Path, arguments: dict):
+    """
+    Send a conversion to the daemon
+    :param path: socket path, defaults to default_socket_path()
+    :param arguments: keyword arguments of convert(). stats is a boolean.
+    :return: response, or None if no daemon of the current user is listening, it speaks another protocol, or it stopped
+        before responding
+    """
+    client = _connect(path or default_socket_path())
+    if client is None:
+        return None
+    arguments = {name: (str(pathlib.Path(value).absolute()) if _arguments[name] is pathlib.Path and value is not None
+                        else value) for name, value in arguments.items()}
+    arguments['protocol'] = protocol
+    try:
+        with client, client.makefile('rwb') as handle:
+            handle.write(json.dumps(arguments).encode() + b'\n')
+            handle.flush()
+            line = handle.readline()
+    except OSError:
+        return None
+    if not line:
+        return None
+    response = json.loads(line)
+    return None if response['status'] == 'unsupported' else response
+
+
+def client_main(socket_path: pathlib.Path, input_path: pathlib.Path, input_type: str, output_path: pathlib.Path,
+                output_type: str, split: bool = False, jpath: str = '', stats=None, per_record: bool = False,
+                cache: pathlib.Path = None, jobs: int = 1, yaml_safe: bool = False, schema: int = 1,
+                qualifiers: tuple = None, composition: bool = False, gff_directives: bool = False,
+                gff_fasta: bool = False, index: bool = False, compress: str = None, metrics: pathlib.Path = None,
+                profile: str = None, progress: str = None, query_memory: int = None,
+                cache_size: int = None) -> int:
+    """
+    Convert the command line arguments returned by get_args() with the daemon if one is running, otherwise locally
+    Arguments following socket_path are those of convert(). Conversions reporting progress are always local.
+    :param socket_path: socket path, defaults to default_socket_path()
+    :return: exit status
+    """
+    arguments = dict(input_path=input_path, input_type=input_type, output_path=output_path, output_type=output_type,
+                     split=split, jpath=jpath, per_record=per_record, cache=cache, jobs=jobs,
+                     yaml_safe=yaml_safe, schema=schema, qualifiers=qualifiers, composition=composition,
+                     gff_directives=gff_directives, gff_fasta=gff_fasta, index=index, compress=compress, metrics=metrics,
+                     profile=profile, query_memory=query_memory, cache_size=cache_size)
+    response = None if progress else request(socket_path, dict(arguments, stats=bool(stats)))
+    if response is None:
+        from . import convert
+        if qualifiers is None:
+            del arguments['qualifiers']
+        convert(**arguments, stats=stats, progress=progress)
+        return 0
+    for message in response['warnings']:
+        sys.stderr.write(message)
+    if stats and response['stats']:
+        stats.write(response['stats'])
+    if response['error']:
+        print(response['error'], file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,165 @@
+"""
+Sharded conversion
+Splits a single input file into byte ranges at record boundaries and converts each range in its own process.
+The outputs of each range are concatenated in input order, producing the same output as converting the whole file at once.
+"""
+import io
+import mmap
+import shutil
+import pathlib
+import tempfile
+import concurrent.futures
+
+from . import formats, writers, info, compression
+
+# Byte strings that begin a record when found at the start of a line
+record_markers = {
+    'genbank': b'LOCUS ',
+    'gb': b'LOCUS ',
+    'embl': b'ID   ',
+    'imgt': b'ID   ',
+    'fasta': b'>',
+    'fasta-2line': b'>',
+}
+
+
+def supported(input_path: pathlib.Path, input_type: str, output_type: str, jpath: str = '', per_record: bool = False,
+              options: writers.Options = writers.Options()) -> bool:
+    """
+    Check if a conversion can be sharded
+    :param input_path: Path to input dataset
+    :param input_type: Format of input dataset
+    :param output_type: Format of output dataset
+    :param jpath: JMESPath query, must be empty unless per_record is True
+    :param per_record: jpath is applied to each record individually
+    :param options: writer options
+    :return: True if convert_sharded() will produce the same output as convert()
+    """
+    output_format = formats.get(output_type)
+    # GFF3 directives and the ##FASTA section are written once per output
+    if output_format.writer is writers.gff_writer and options.gff_directives:
+        return False
+    return (input_type in record_markers and output_format.concatenable and (not jpath or per_record)
+            and input_path.is_file() and compression.detect(input_path) == 'none')
+
+
+def boundaries(input_path: pathlib.Path, input_type: str, shards: int) -> list:
+    """
+    Find byte offsets that divide input into roughly equal ranges, each starting at a record
+    :param input_path: Path to input dataset
+    :param input_type: Format of input dataset
+    :param shards: maximum number of ranges
+    :return: list of offsets, starting with 0 and ending with the file size
+    """
+    size = input_path.stat().st_size
+    offsets = [0]
+    if size:
+        marker = b'\n' + record_markers[input_type]
+        with input_path.open('rb') as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for i in range(1, shards):
+                # Search from the byte before the target so that a record starting exactly at the target is found
+                found = data.find(marker, max(size * i // shards, offsets[-1] + 1) - 1)
+                if found == -1:
+                    break
+                offsets.append(found + 1)
+    offsets.append(size)
+    return offsets
+
+
+class RangeReader(io.RawIOBase):
+    """
+    Read only bytes [start, end) of a file
+    """
+    def __init__(self, path: pathlib.Path, start: int, end: int):
+        super().__init__()
+        self._handle = open(path, 'rb')
+        self._handle.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:self._remaining]
+        count = self._handle.readinto(view)
+        self._remaining -= count
+        return count
+
+    def close(self):
+        self._handle.close()
+        super().close()
+
+
+def convert_range(input_path: pathlib.Path, input_type: str, start: int, end: int, output_path: pathlib.Path,
+                  output_type: str, jpath: str = '', per_record: bool = False, stats: bool = False,
+                  options: writers.Options = writers.Options(), composition: bool = False) -> tuple:
+    """
+    Convert the records within a byte range of the input
+    :param input_path: Path to input dataset
+    :param input_type: Format of input dataset
+    :param start: offset of the first byte of the range
+    :param end: offset following the last byte of the range
+    :param output_path: Path to output dataset
+    :param output_type: Format of output dataset
+    :param jpath: JMESPath query to apply to each record
+    :param per_record: must be True if jpath is provided
+    :param stats: collect GFF3 summary of output records
+    :param options: writer options
+    :param composition: include the sequence composition of each record in the GFF3 summary
+    :return: (stats, summary, complete) where stats is a string of GFF3 lines or None, summary is the info.Summary of the
+        output records or None, and complete is False if output stopped at a record without a defined sequence
+    """
+    from . import get_records, _get_xform, _write
+    xform = _get_xform(output_type, per_record)
+    stats = info.Report(io.StringIO(), composition) if stats else None
+    with io.TextIOWrapper(io.BufferedReader(RangeReader(input_path, start, end))) as handle:
+        # Parts are compressed as they are combined into the output
+        complete = _write(get_records(handle, input_type, jpath, xform, per_record), output_path, output_type, stats,
+                          options._replace(compression='none'))
+    if stats:
+        return stats.handle.getvalue(), stats.summary, complete
+    return None, None, complete
+
+
+def convert_sharded(input_path: pathlib.Path, input_type: str, output_path: pathlib.Path, output_type: str,
+                    jpath: str = '', stats=None, per_record: bool = False, jobs: int = 2,
+                    options: writers.Options = writers.Options()):
+    """
+    Convert a single input using a pool of worker processes. See supported() for the conversions allowed.
+    The input is divided into 4 ranges per job to balance uneven record sizes.
+    :param input_path: Path to input dataset
+    :param input_type: Format of input dataset
+    :param output_path: Path to output dataset
+    :param output_type: Format of output dataset
+    :param jpath: JMESPath query to apply to each input record
+    :param stats: info.Report of output records
+    :param per_record: must be True if jpath is provided
+    :param jobs: number of worker processes
+    :param options: writer options
+    :return: None
+    """
+    offsets = boundaries(input_path, input_type, jobs * 4)
+    # Keep shard outputs on the same file system as the output
+    with tempfile.TemporaryDirectory(dir=output_path.parent) as tmp, \
+            concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+        parts = [pathlib.Path(tmp, str(i)) for i in range(len(offsets) - 1)]
+        results = [
+            pool.submit(convert_range, input_path, input_type, start, end, part, output_type, jpath, per_record, bool(stats),
+                        options, bool(stats and stats.composition))
+            for start, end, part in zip(offsets, offsets[1:], parts)
+        ]
+        with compression.open_output(output_path, 'wb', options.compression) as output_handle:
+            for result, part in zip(results, parts):
+                part_stats, part_summary, complete = result.result()
+                if part_stats:
+                    stats.handle.write(part_stats)
+                    stats.summary.merge(part_summary)
+                with part.open('rb') as part_handle:
+                    shutil.copyfileobj(part_handle, output_handle)
+                if not complete:
+                    # A single process stops writing at the first record without a sequence
+                    for remaining in results:
+                        remaining.cancel()
+                    break
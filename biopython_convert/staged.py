@@ -0,0 +1,121 @@
+"""
+Staged reading of GenBank and EMBL
+When a query starts by filtering the input records on their header alone, such as their id, name, description, or
+annotations, each record's header is parsed first and the filter applied. Rejected records are skipped to their `//`
+terminator without parsing their features or sequence.
+"""
+import io
+import warnings
+from typing import Callable
+
+from Bio import SeqIO
+
+from . import JMESPathGen
+
+# Fields of a SeqRecord that are parsed from the header, with the annotations that are parsed after the feature table
+header_fields = {
+    'id': None,
+    'name': None,
+    'description': None,
+    'dbxrefs': None,
+    'annotations': ('contig', 'wgs', 'wgs_scafld'),
+}
+
+
+class _Layout:
+    """
+    Lines delimiting the header of a record
+    """
+    def __init__(self, start: str, header_end: tuple, terminator: str):
+        """
+        :param start: prefix of the first line of a record
+        :param header_end: prefixes of lines following the header
+        :param terminator: lines to append to a header so that it parses as a record without features or sequence
+        """
+        self.start = start
+        self.header_end = header_end + ('//',)
+        self.terminator = terminator
+
+
+layouts = {
+    'genbank': _Layout('LOCUS', ('FEATURES', 'BASE COUNT', 'ORIGIN', 'CONTIG'), 'ORIGIN\n//\n'),
+    'embl': _Layout('ID   ', ('FH', 'FT', 'SQ', 'CO'), 'SQ   \n//\n'),
+}
+layouts['gb'] = layouts['genbank']
+
+
+def header_filter(jpath, input_type: str, options=None):
+    """
+    Find a filter of the input records that only reads their header
+    :param jpath: JMESPath query applied to the list of input records, or the result of JMESPathGen.compile()
+    :param input_type: Format of input dataset
+    :param options: JMESPathGen.Options to evaluate the filter with
+    :return: Callable taking a header record and returning True if the query keeps the record, or None if the query
+        has no such filter or input_type has no header
+    """
+    if input_type not in layouts:
+        return None
+    condition = JMESPathGen.root_filter(jpath, header_fields)
+    if condition is None:
+        return None
+    return JMESPathGen.predicate(condition, options)
+
+
+def _read(lines: list, input_type: str):
+    return SeqIO.read(io.StringIO(''.join(lines)), input_type)
+
+
+def _header(lines: list, input_type: str):
+    """
+    :param lines: header lines of a record
+    :param input_type: Format of input dataset
+    :return: SeqRecord without features or sequence, or None if the header does not parse alone
+    """
+    try:
+        with warnings.catch_warnings():
+            # Warnings are issued when the whole record is parsed
+            warnings.simplefilter('ignore')
+            return _read(lines + [layouts[input_type].terminator], input_type)
+    except ValueError:
+        return None
+
+
+def parse(input_handle, input_type: str, keep: Callable):
+    """
+    Parse the records kept by a filter of their header
+    :param input_handle: text file handle to read data from
+    :param input_type: Format of input dataset, one of layouts
+    :param keep: Callable taking a SeqRecord parsed from the header of a record, returning True to parse the whole
+        record, see header_filter()
+    :return: generator of SeqRecords
+    """
+    layout = layouts[input_type]
+    lines = iter(input_handle)
+    for line in lines:
+        if not line.startswith(layout.start):
+            # Between records
+            continue
+        record = [line]
+        following = None
+        for line in lines:
+            if line.startswith(layout.header_end):
+                following = line
+                break
+            record.append(line)
+
+        header = _header(record, input_type)
+        if header is not None and not keep(header):
+            if following is not None and not following.startswith('//'):
+                for line in lines:
+                    if line.startswith('//'):
+                        break
+            continue
+
+        if following is not None:
+            record.append(following)
+            if not following.startswith('//'):
+                for line in lines:
+                    record.append(line)
+                    if line.startswith('//'):
+                        break
+        yield _read(record, input_type)
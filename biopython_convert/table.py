@@ -0,0 +1,138 @@
+"""
+Feature tables
+Flattens the features of records into a table with one row per location part, for loading into dataframes.
+Rows are written in batches so that memory use does not depend on the size of the input.
+TSV output is always available, Arrow IPC and Parquet outputs require pyarrow.
+"""
+import io
+import itertools
+from typing import Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from Bio import SeqIO
+
+tsv_types = ['features-tsv']
+arrow_types = ['features-arrow', 'features-parquet']
+table_types = tsv_types + arrow_types
+
+columns = ['seqid', 'type', 'start', 'end', 'strand', 'part']
+default_qualifiers = ('locus_tag', 'gene', 'product')
+
+# Separates the values of qualifiers with more than one value
+value_separator = '|'
+
+# Rows per TSV write, Arrow record batch, or Parquet row group
+batch_size = 65536
+
+
+def _qualifier_value(value):
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        return value_separator.join(map(str, value))
+    return str(value)
+
+
+def rows(records: Iterable['SeqIO.SeqRecord'], qualifiers: tuple = default_qualifiers):
+    """
+    Flatten features of records into rows
+    Each part of a compound location is a row, numbered by the part column.
+    :param records: iterable of SeqRecords
+    :param qualifiers: qualifiers to output as columns after the columns in `columns`
+    :return: Generator of tuples of column values, None if the feature has no location or lacks the qualifier
+    """
+    for record in records:
+        for feature in record.features:
+            values = tuple(_qualifier_value(feature.qualifiers.get(qualifier)) for qualifier in qualifiers)
+            if feature.location is None:
+                yield (record.id, feature.type, None, None, None, 0) + values
+                continue
+            for part, location in enumerate(feature.location.parts):
+                yield (record.id, feature.type, int(location.start), int(location.end), location.strand, part) + values
+
+
+def batches(records: Iterable['SeqIO.SeqRecord'], qualifiers: tuple = default_qualifiers, size: int = batch_size):
+    """
+    Group rows of records into lists of at most size rows
+    :param records: iterable of SeqRecords
+    :param qualifiers: qualifiers to output as columns
+    :param size: maximum rows per batch
+    :return: Generator of lists of rows
+    """
+    iterator = rows(records, qualifiers)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _tsv_value(value) -> str:
+    if value is None:
+        return ''
+    return str(value).replace('\t', ' ').replace('\n', ' ')
+
+
+def tsv_writer(records, handle, output_type: str, qualifiers: tuple = default_qualifiers):
+    """
+    Write features of records as tab separated values with a header line
+    Tabs and new lines within values are replaced with spaces. Missing values are empty.
+    :param records: iterable of SeqRecords
+    :param handle: file handle to write to
+    :param output_type: output format, ignored
+    :param qualifiers: qualifiers to output as columns
+    :return: None
+    """
+    handle.write('\t'.join(columns + list(qualifiers)) + '\n')
+    for batch in batches(records, qualifiers):
+        handle.writelines('\t'.join(map(_tsv_value, row)) + '\n' for row in batch)
+
+
+def arrow_schema(qualifiers: tuple = default_qualifiers):
+    """
+    Arrow schema of the feature table
+    :param qualifiers: qualifiers to output as columns
+    :return: pyarrow.Schema
+    """
+    import pyarrow
+    return pyarrow.schema([
+        ('seqid', pyarrow.string()),
+        ('type', pyarrow.string()),
+        ('start', pyarrow.int64()),
+        ('end', pyarrow.int64()),
+        ('strand', pyarrow.int8()),
+        ('part', pyarrow.int32()),
+    ] + [(qualifier, pyarrow.string()) for qualifier in qualifiers])
+
+
+def arrow_writer(records, handle, output_type: str, qualifiers: tuple = default_qualifiers):
+    """
+    Write features of records as an Arrow IPC file or Parquet file, depending on output_type
+    :param records: iterable of SeqRecords
+    :param handle: binary file handle to write to
+    :param output_type: 'features-arrow' or 'features-parquet'
+    :param qualifiers: qualifiers to output as columns
+    :return: None
+    """
+    if isinstance(handle, io.TextIOBase):
+        from Bio import StreamModeError
+        raise StreamModeError(f"{output_type} files must be opened in binary mode.")
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(f"{output_type} output requires pyarrow, install biopython.convert[arrow]") from e
+
+    schema = arrow_schema(qualifiers)
+    if output_type == 'features-parquet':
+        writer = pyarrow.parquet.ParquetWriter(handle, schema)
+    else:
+        writer = pyarrow.ipc.new_file(handle, schema)
+    with writer:
+        for batch in batches(records, qualifiers):
+            # Each batch is written as its own row group, or record batch
+            writer.write_batch(pyarrow.RecordBatch.from_arrays(
+                [pyarrow.array(column, type=field.type) for column, field in zip(zip(*batch), schema)],
+                schema=schema,
+            ))
@@ -0,0 +1,231 @@
+"""
+Writers
+Every writer is a Callable(records, handle, output_type, options) writing an iterable of records or query results to an
+open handle. See formats for the writer, and handle mode, of each output type.
+"""
+import io
+import types
+import functools
+from typing import NamedTuple, TYPE_CHECKING
+
+from . import table
+
+if TYPE_CHECKING:
+    from Bio import SeqIO
+
+
+class Options(NamedTuple):
+    """
+    Output options shared by all writers
+    """
+    # Use the faster YAML safe representer. Output must only contain mappings, lists, and scalars.
+    yaml_safe: bool = False
+    # Version of the json and yaml representation of records, see serialize
+    schema: int = 1
+    # Qualifiers to output as columns of feature tables
+    qualifiers: tuple = table.default_qualifiers
+    # Include GFF3 directives and output a line per part of compound locations, see gff.gff_writer()
+    gff_directives: bool = False
+    # End GFF3 output with a ##FASTA section of the record sequences
+    gff_fasta: bool = False
+    # Compression of output files, one of compression.compression_types, None to choose by the output suffix
+    compression: str = None
+
+
+def seqio_writer(records, handle, output_type: str, options: Options = Options()):
+    """
+    Write SeqRecords using Biopython
+    :param records: iterable of SeqRecord instances
+    :param handle: file handle to write to
+    :param output_type: SeqIO format
+    :param options: ignored
+    :return: None
+    """
+    from Bio import SeqIO
+    SeqIO.write(records, handle, output_type)
+
+
+def gff_writer(records: ['SeqIO.SeqRecord'], handle, output_type: str, options: Options = Options()):
+    """
+    Write the features of SeqRecords as GFF3, see gff.gff_writer()
+    :param handle: file handle to write to
+    :param records: iterable of SeqRecord instances
+    :param output_type: output format, ignored
+    :param options: gff_directives and gff_fasta select directives and the ##FASTA section
+    :return: None
+    """
+    from . import gff
+    gff.gff_writer(records, handle, output_type, options.gff_directives, options.gff_fasta)
+
+
+def text_writer(records, handle, output_type: str, options: Options = Options()):
+    """
+    Write each record or query result as a line of text, serialising one record at a time
+    Output is the same as handle.write("\n".join(map(str, to_strings(records))) + "\n")
+    :param records: iterable of records or query results
+    :param handle: file handle to write to
+    :param output_type: output format, ignored
+    :param options: ignored
+    :return: None
+    """
+    from . import serialize, instrument
+    if isinstance(records, (types.GeneratorType, map, filter, tuple, list)):
+        records = map(instrument.timed_function('serialize', serialize.text), records)
+    else:
+        # A single query result is output as its items
+        records = serialize.text(records)
+    empty = True
+    for record in records:
+        handle.write(str(record))
+        handle.write('\n')
+        empty = False
+    if empty:
+        handle.write('\n')
+
+
+def json_writer(records, handle, output_type: str, options: Options = Options()):
+    """
+    Write records as a JSON array, serialising one record at a time
+    Output is the same as json.dump(to_dicts(records), handle, indent=True). Each record is serialised before anything
+    is written for it, so output stops after the last record that could be.
+    :param records: iterable of records or query results
+    :param handle: file handle to write to
+    :param output_type: output format, ignored
+    :param options: schema selects the representation of records
+    :return: None
+    """
+    import json
+    from . import serialize, instrument
+    serializer = instrument.timed_function('serialize', serialize.schemas[options.schema])
+    separator = '[\n '
+    for record in records:
+        text = json.dumps(serializer(record), skipkeys=True, indent=True).replace('\n', '\n ')
+        handle.write(separator)
+        handle.write(text)
+        separator = ',\n '
+    handle.write('[]' if separator == '[\n ' else '\n]')
+
+
+def jsonl_writer(records, handle, output_type: str, options: Options = Options()):
+    """
+    Write records as JSON Lines, one compact JSON document per record
+    :param records: iterable of records or query results
+    :param handle: file handle to write to
+    :param output_type: output format, ignored
+    :param options: schema selects the representation of records
+    :return: None
+    """
+    import json
+    from . import serialize, instrument
+    serializer = instrument.timed_function('serialize', serialize.schemas[options.schema])
+    for record in records:
+        handle.write(json.dumps(serializer(record), skipkeys=True, separators=(',', ':')) + '\n')
+
+
+def get_yaml(safe: bool = False, **kwargs):
+    """
+    Create YAML emitter
+    :param safe: Use the safe representer and the C emitter if available, rather than the unsafe pure Python emitter.
+        The safe representer only supports mappings, lists, and scalars.
+    :param kwargs: attributes to set on the YAML instance
+    :return: ruamel.yaml.YAML
+    """
+    from ruamel.yaml import YAML
+    yml = YAML(typ='safe', pure=False) if safe else YAML(typ='unsafe')
+    for k, v in kwargs.items():
+        setattr(yml, k, v)
+    return yml
+
+
+@functools.lru_cache()
+def _cached_yaml(safe: bool, explicit_start: bool):
+    # Creating the emitter is costly relative to writing a single record of split output
+    return get_yaml(safe, explicit_start=explicit_start) if explicit_start else get_yaml(safe)
+
+
+def yaml_writer(records, handle, output_type: str, options: Options = Options()):
+    """
+    Write records as a YAML list, serialising one record at a time
+    Output is the same as yml.dump(to_dicts(records), handle). Each record is emitted before anything is written for
+    it, so output stops after the last record that could be.
+    :param records: iterable of records or query results
+    :param handle: file handle to write to
+    :param output_type: output format, ignored
+    :param options: yaml_safe selects the representer, schema selects the representation of records
+    :return: None
+    """
+    from . import serialize, instrument
+    yml = _cached_yaml(options.yaml_safe, False)
+    serializer = instrument.timed_function('serialize', serialize.schemas[options.schema])
+    empty = True
+    for record in records:
+        value = [serializer(record)]
+        text = io.StringIO()
+        try:
+            yml.dump(value, text)
+        except BaseException:
+            # The cached emitter is left unusable
+            _cached_yaml.cache_clear()
+            raise
+        handle.write(text.getvalue())
+        empty = False
+    if empty:
+        yml.dump([], handle)
+
+
+def yaml_stream_writer(records, handle, output_type: str, options: Options = Options()):
+    """
+    Write records as a YAML stream of documents, one document per record
+    Every document starts with '---' so that streams can be concatenated.
+    :param records: iterable of records or query results
+    :param handle: file handle to write to
+    :param output_type: output format, ignored
+    :param options: yaml_safe selects the representer, schema selects the representation of records
+    :return: None
+    """
+    from . import serialize, instrument
+    yml = _cached_yaml(options.yaml_safe, True)
+    serializer = instrument.timed_function('serialize', serialize.schemas[options.schema])
+    failed = []
+
+    def serialized():
+        # A record that fails to serialise ends the stream, rather than raising within dump_all(), which leaves the
+        # cached emitter unusable
+        for record in records:
+            try:
+                yield serializer(record)
+            except Exception as e:
+                failed.append(e)
+                return
+    # dump_all() reuses a single emitter for all documents, consuming records as they are emitted
+    try:
+        yml.dump_all(serialized(), handle)
+    except BaseException:
+        _cached_yaml.cache_clear()
+        raise
+    if failed:
+        raise failed[0]
+
+
+def tsv_writer(records, handle, output_type: str, options: Options = Options()):
+    """
+    Write the features of records as a tab separated table, see table.tsv_writer()
+    :param records: iterable of SeqRecord instances
+    :param handle: file handle to write to
+    :param output_type: output format, ignored
+    :param options: qualifiers selects the qualifier columns
+    :return: None
+    """
+    table.tsv_writer(records, handle, output_type, options.qualifiers)
+
+
+def arrow_writer(records, handle, output_type: str, options: Options = Options()):
+    """
+    Write the features of records as an Arrow IPC or Parquet table, see table.arrow_writer()
+    :param records: iterable of SeqRecord instances
+    :param handle: binary file handle to write to
+    :param output_type: 'features-arrow' or 'features-parquet'
+    :param options: qualifiers selects the qualifier columns
+    :return: None
+    """
+    table.arrow_writer(records, handle, output_type, options.qualifiers)
@@ -3,3 +3,20 @@ Unit tests
 """
 
 from .test_convert import *
+from .test_jmespathgen import *
+from .test_gff import *
+from .test_shard import *
+from .test_serialize import *
+from .test_table import *
+from .test_formats import *
+from .test_info import *
+from .test_seqindex import *
+from .test_compression import *
+from .test_batch import *
+from .test_serve import *
+from .test_startup import *
+from .test_instrument import *
+from .test_progress import *
+from .test_staged import *
+from .test_fasta import *
+from .test_fastq import *
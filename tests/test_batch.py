@@ -0,0 +1,69 @@
+import io
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from biopython_convert import batch, convert, JMESPathGen
+
+input_path = Path('test-data/no_seq.gbff')
+
+
+class TestBatch(TestCase):
+    def setUp(self) -> None:
+        self.workdir = TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.dir = Path(self.workdir.name)
+        for i in range(3):
+            (self.dir / f"input{i}.gbff").write_bytes(input_path.read_bytes())
+
+    def test_manifest(self):
+        tsv = self.dir / 'manifest.tsv'
+        tsv.write_text(f"#{chr(9).join(batch.columns)}\n\n{self.dir / 'input0.gbff'}\tgenbank\tout.gff3\tgff3\n")
+        self.assertEqual([batch.Job(self.dir / 'input0.gbff', 'genbank', Path('out.gff3'), 'gff3')],
+                         batch.read_manifest(tsv))
+        manifest = self.dir / 'manifest.json'
+        manifest.write_text(json.dumps([dict(input_file='a', input_type='genbank', output_file='b', output_type='embl')]))
+        self.assertEqual([batch.Job(Path('a'), 'genbank', Path('b'), 'embl')], batch.read_manifest(manifest))
+        tsv.write_text("a\tgenbank\tb\n")
+        with self.assertRaisesRegex(ValueError, ':1:'):
+            batch.read_manifest(tsv)
+
+    def test_glob(self):
+        jobs = batch.glob_jobs(str(self.dir / 'input*.gbff'), 'genbank', str(self.dir / 'out' / '{stem}.json'), 'json')
+        self.assertEqual([self.dir / 'out' / f"input{i}.json" for i in range(3)], [job.output_path for job in jobs])
+        with self.assertRaisesRegex(ValueError, 'both output to'):
+            batch.glob_jobs(str(self.dir / 'input*.gbff'), 'genbank', str(self.dir / 'out.json'), 'json')
+        with self.assertRaises(ValueError):
+            batch.glob_jobs(str(self.dir / 'input*.gbff'), 'genbank', '{suffix}', 'json')
+
+    def test_run(self):
+        """
+        Outputs are the same as converting each input alone, and failures do not stop the batch
+        """
+        jpath = '[*].{id: id, type: annotations.molecule_type}'
+        expected = self.dir / 'expected.json'
+        convert(input_path, 'genbank', expected, 'json', jpath=jpath)
+        jobs = batch.glob_jobs(str(self.dir / 'input*.gbff'), 'genbank', str(self.dir / 'out' / '{stem}.json'), 'json')
+        jobs.insert(1, batch.Job(self.dir / 'missing.gbff', 'genbank', self.dir / 'missing.json', 'json'))
+        for workers in (1, 2):
+            report = io.StringIO()
+            results = batch.run(jobs, workers, report, jpath)
+            self.assertEqual(jobs, [result.job for result in results])
+            self.assertListEqual([True, False, True, True], [result.ok for result in results])
+            self.assertIn('FileNotFoundError', results[1].error)
+            for job in jobs[2:]:
+                self.assertEqual(expected.read_text(), job.output_path.read_text())
+            lines = report.getvalue().splitlines()
+            self.assertEqual('\t'.join(batch.report_columns), lines[0])
+            self.assertEqual(len(jobs) + 1, len(lines))
+            self.assertEqual('failed', lines[2].split('\t')[2])
+
+    def test_compiled(self):
+        """
+        Compiled queries are accepted wherever a query string is
+        """
+        expression = JMESPathGen.compile('[0]')
+        self.assertIs(expression, JMESPathGen.compile(expression))
+        self.assertFalse(JMESPathGen.plan(expression).streamable)
+        self.assertEqual(1, JMESPathGen.search(expression, [1, 2]))
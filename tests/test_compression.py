@@ -0,0 +1,144 @@
+import io
+import gzip
+import warnings
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, skipUnless
+
+from Bio import bgzf
+
+from biopython_convert import compression, convert, JMESPathGen
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+input_path = Path('test-data/no_seq.gbff')
+
+
+class TestCompression(TestCase):
+    def setUp(self) -> None:
+        self.workdir = TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        # Several BGZF blocks of varied data
+        self.data = b''.join(f">seq{i}\n{'ACGT' * (i % 50)}\n".encode() for i in range(20000))
+
+    def path(self, name: str) -> Path:
+        return Path(self.workdir.name, name)
+
+    def write(self, name: str, compression_type: str = None, threads: int = None) -> Path:
+        path = self.path(name)
+        with compression.open_output(path, 'wb', compression_type, threads) as handle:
+            handle.write(self.data)
+        return path
+
+    def test_detect(self):
+        for name, compression_type in (('plain.txt', 'none'), ('out.gz', 'bgzf'), ('out.bgz', 'bgzf'),
+                                       ('out.bz2', 'bz2')):
+            self.assertEqual(compression_type, compression.detect(self.write(name)), name)
+        self.assertEqual('gzip', compression.detect(self.write('out.gzip', 'gzip')))
+        self.assertEqual('none', compression.from_suffix(Path('out.fasta')))
+
+    def test_bgzf(self):
+        for threads in (1, 3):
+            path = self.write(f'out{threads}.gz', threads=threads)
+            self.assertGreater(len(self.data), 2 * compression.bgzf_block_size)
+            with gzip.open(path, 'rb') as handle:
+                self.assertEqual(self.data, handle.read())
+            with bgzf.BgzfReader(str(path), 'rb') as handle:
+                self.assertEqual(self.data, handle.read(len(self.data) + 1))
+            with compression.open_input(path, 'rb', threads) as handle:
+                self.assertEqual(self.data, handle.read())
+
+    def test_bgzf_seek(self):
+        path = self.write('out.gz')
+        with compression.open_input(path, 'rb') as handle:
+            self.assertEqual(self.data[:100], handle.read(100))
+            handle.seek(100000)
+            self.assertEqual(self.data[100000:100010], handle.read(10))
+            handle.seek(0)
+            self.assertEqual(self.data, handle.read())
+
+    def test_corrupt(self):
+        path = self.write('out.gz')
+        data = bytearray(path.read_bytes())
+        data[-40] ^= 0xff
+        path.write_bytes(bytes(data))
+        with self.assertRaises(ValueError):
+            with compression.open_input(path, 'rb') as handle:
+                handle.read()
+
+    def test_text(self):
+        for compression_type in ('bgzf', 'gzip', 'bz2'):
+            path = self.path(f'out.{compression_type}')
+            with compression.open_output(path, 'w', compression_type) as handle:
+                handle.write(self.data.decode())
+            with compression.open_input(path) as handle:
+                self.assertIsInstance(handle, io.TextIOBase)
+                self.assertEqual(self.data.decode(), handle.read(), compression_type)
+
+    @skipUnless(zstandard, "zstandard not installed")
+    def test_zstd(self):
+        path = self.write('out.zst')
+        self.assertEqual('zstd', compression.detect(path))
+        with compression.open_input(path, 'rb') as handle:
+            self.assertEqual(self.data, handle.read())
+
+    def test_convert(self):
+        """
+        Compressed inputs and outputs convert to the same records as uncompressed
+        """
+        expected = self.path('expected.embl')
+        convert(input_path, 'genbank', expected, 'embl')
+        for suffix in ('.gz', '.bz2'):
+            compressed_input = self.path('input.gbff' + suffix)
+            with compression.open_output(compressed_input, 'wb') as handle:
+                handle.write(input_path.read_bytes())
+            output = self.path('output.embl' + suffix)
+            convert(compressed_input, 'genbank', output, 'embl')
+            with compression.open_input(output, 'rb') as handle:
+                self.assertEqual(expected.read_bytes(), handle.read(), suffix)
+        output = self.path('output.embl')
+        convert(input_path, 'genbank', output, 'embl', compress='gzip')
+        self.assertEqual('gzip', compression.detect(output))
+
+    def test_sharded(self):
+        """
+        Compressed input is converted without sharding, compressed output still allows it
+        """
+        expected = self.path('expected.embl')
+        convert(input_path, 'genbank', expected, 'embl')
+        output = self.path('output.embl.gz')
+        convert(input_path, 'genbank', output, 'embl', jobs=2)
+        with compression.open_input(output, 'rb') as handle:
+            self.assertEqual(expected.read_bytes(), handle.read())
+        compressed_input = self.path('input.gbff.gz')
+        with compression.open_output(compressed_input, 'wb') as handle:
+            handle.write(input_path.read_bytes())
+        output = self.path('output.embl')
+        convert(compressed_input, 'genbank', output, 'embl', jobs=2)
+        self.assertEqual(expected.read_bytes(), output.read_bytes())
+
+    def test_index(self):
+        """
+        BGZF input can be indexed, other compression falls back to reading sequentially
+        """
+        fasta = ''.join(f">seq{i}\n{'ACGT' * i}\n" for i in range(1, 50))
+        expected = self.path('expected.fasta')
+        plain = self.path('input.fasta')
+        plain.write_text(fasta)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', JMESPathGen.MaterializationWarning)
+            convert(plain, 'fasta', expected, 'fasta', jpath='[-1]')
+        output = self.path('output.fasta')
+        for name, compression_type in (('input.fasta.gz', 'bgzf'), ('input.fasta.bz2', 'bz2')):
+            path = self.path(name)
+            with compression.open_output(path, 'w', compression_type) as handle:
+                handle.write(fasta)
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                convert(path, 'fasta', output, 'fasta', jpath='[-1]', index=True)
+            self.assertEqual(expected.read_text(), output.read_text(), name)
+            unable = [w for w in caught if 'Unable to index' in str(w.message)]
+            self.assertEqual(compression_type != 'bgzf', bool(unable), name)
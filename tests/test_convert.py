@@ -1,13 +1,39 @@
 import difflib
 import io
+import json
 from unittest import TestCase
 from hashlib import sha256
 from tempfile import TemporaryDirectory
 from pathlib import Path
 
+from ruamel.yaml import YAML
+from Bio import SeqIO
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+from Bio.SeqFeature import SeqFeature, FeatureLocation
+
 from biopython_convert import convert
 
 
+def write_records(path: Path):
+    """
+    Write a genbank file of three records with sequences, the last two of them plasmids
+    """
+    records = []
+    for i in range(3):
+        qualifiers = {'organism': ['Example bacterium']}
+        if i:
+            qualifiers['plasmid'] = [f"p{i}"]
+        records.append(SeqRecord(
+            Seq('ACGTTGCA' * (50 + i * 10)), id=f"REC{i}.1", name=f"REC{i}", description=f"Example record {i}",
+            annotations={'molecule_type': 'DNA', 'taxonomy': ['Bacteria', f"Group{i}"], 'organism': 'Example bacterium'},
+            features=[
+                SeqFeature(FeatureLocation(0, 400 + i * 80, 1), type='source', qualifiers=qualifiers),
+                SeqFeature(FeatureLocation(10, 100, -1), type='CDS', qualifiers={'locus_tag': [f"T{i}"]}),
+            ]))
+    SeqIO.write(records, path, 'genbank')
+
+
 class TestConvert(TestCase):
     input_path = Path('test-data/has_plasmids.gbff')
     noseq_path = Path('test-data/no_seq.gbff')
@@ -16,6 +42,16 @@ class TestConvert(TestCase):
     convert_type = 'embl'
     filter = "[?!(features[?type=='source'].qualifiers.plasmid)]"
 
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.records_dir = TemporaryDirectory()
+        cls.records_path = Path(cls.records_dir.name, 'records.gbff')
+        write_records(cls.records_path)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.records_dir.cleanup()
+
     def setUp(self) -> None:
         self.workdir = TemporaryDirectory()
 
@@ -29,6 +65,15 @@ class TestConvert(TestCase):
                 diffs = list(difflib.unified_diff(a_stream.readlines(), b_stream.readlines(), fromfile=str(a), tofile=str(b)))
                 self.assertEqual(0, len(diffs), ''.join(diffs))
 
+    def generated(self, name: str, output_type: str, **kwargs) -> str:
+        """
+        Convert the generated records
+        :return: output
+        """
+        output_path = Path(self.workdir.name, name)
+        convert(self.records_path, self.input_type, output_path, output_type, **kwargs)
+        return output_path.read_text()
+
     def tearDown(self) -> None:
         self.workdir.cleanup()
 
@@ -52,6 +97,15 @@ class TestConvert(TestCase):
         convert(self.input_path, self.input_type, output_path, self.convert_type)
         self.compare_files(Path.joinpath(self.output_path, 'convert'), output_path)
 
+    def test_convert_sharded(self):
+        self.assertEqual(self.generated('convert', self.convert_type),
+                         self.generated('convert_sharded', self.convert_type, jobs=4))
+
+    def test_noseq_sharded(self):
+        output_path = Path(self.workdir.name, 'no_seq')
+        convert(self.noseq_path, self.input_type, output_path, 'fasta', jobs=2)
+        self.compare_files(Path.joinpath(self.output_path, 'no_seq'), output_path)
+
     def test_noseq(self):
         output_path = Path(self.workdir.name, 'no_seq')
         convert(self.noseq_path, self.input_type, output_path, 'fasta')
@@ -73,6 +127,25 @@ class TestConvert(TestCase):
         for a, b in zip(truth_files, files):
             self.compare_files(a, b)
 
+    def test_split_parallel(self):
+        parallel_stats = io.StringIO()
+        serial_stats = io.StringIO()
+        with TemporaryDirectory() as serial_dir:
+            convert(self.records_path, self.input_type, Path(self.workdir.name, 'record'), self.input_type, split=True, stats=parallel_stats, jobs=2)
+            convert(self.records_path, self.input_type, Path(serial_dir, 'record'), self.input_type, split=True, stats=serial_stats)
+            files = sorted(Path(self.workdir.name).glob('*'))
+            truth_files = sorted(Path(serial_dir).glob('*'))
+            self.assertEqual(3, len(truth_files))
+            self.assertListEqual([f.name for f in truth_files], [f.name for f in files])
+            for a, b in zip(truth_files, files):
+                self.compare_files(a, b)
+        self.assertEqual(serial_stats.getvalue(), parallel_stats.getvalue())
+
+    def test_split_parallel_noseq(self):
+        output_path = Path(self.workdir.name, 'no_seq')
+        convert(self.noseq_path, self.input_type, output_path, 'fasta', split=True, jobs=2)
+        self.assertListEqual([], list(Path(self.workdir.name).glob('*')))
+
     def test_gff(self):
         output_path = Path(self.workdir.name, 'gff')
         convert(self.input_path, self.input_type, output_path, 'gff3')
@@ -88,6 +161,10 @@ class TestConvert(TestCase):
         convert(self.input_path, self.input_type, output_path, 'text', jpath="[0].[join(' - 1..', [description, to_string(length(seq))]), join(' ', [to_string(length(features[?type=='CDS' && qualifiers.translation])), 'proteins']), join(`\"\\t\"`, ['Location', 'Strand', 'Length', 'PID', 'Gene', 'Synonym', 'Code', 'COG', 'Product']), (features[?type=='CDS' && qualifiers.translation].[join('..', [to_string(sum([location.start, `1`])), to_string(location.end)]), [location.strand][?@==`1`] && '+' || '-', length(qualifiers.translation[0]), (qualifiers.db_xref[?starts_with(@, 'GI')].split(':', @)[1])[0] || '-', qualifiers.gene[0] || '-', qualifiers.locus_tag[0] || '-', '-', '-', qualifiers.product[0] ] | [*].join(`\"\\t\"`, [*].to_string(@)) )] | []")
         self.compare_files(Path.joinpath(self.output_path, 'ptt'), output_path)
 
+    def test_txt_per_record(self):
+        self.assertEqual(self.generated('txt', 'text', jpath='[*].annotations.taxonomy'),
+                         self.generated('txt_per_record', 'text', jpath='annotations.taxonomy', per_record=True))
+
     def test_txt_stats(self):
         output_path = Path(self.workdir.name, 'txt')
         stats = io.StringIO()
@@ -110,6 +187,34 @@ class TestConvert(TestCase):
         convert(self.input_path, self.input_type, output_path, 'json', jpath='[*].{id: id, type: annotations.molecule_type}')
         self.compare_files(Path.joinpath(self.output_path, 'json_jpath'), output_path)
 
+    def test_jsonl(self):
+        jpath = '[*].{id: id, type: annotations.molecule_type}'
+        expected = json.loads(self.generated('json_jpath', 'json', jpath=jpath))
+        self.assertEqual(3, len(expected))
+        self.assertListEqual(expected, [json.loads(line) for line in self.generated('jsonl', 'jsonl', jpath=jpath).splitlines()])
+
+    def test_yaml_stream(self):
+        expected = json.loads(self.generated('json_jpath', 'json', jpath='[*].{id: id, type: annotations.molecule_type}'))
+        output = self.generated('yaml_stream', 'yaml-stream', jpath='{id: id, type: annotations.molecule_type}', per_record=True)
+        self.assertEqual(3, len(expected))
+        self.assertListEqual(expected, list(YAML(typ='safe', pure=True).load_all(output)))
+
+    def test_yaml_safe(self):
+        jpath = '[*].{id: id, type: annotations.molecule_type}'
+        expected = json.loads(self.generated('json_jpath', 'json', jpath=jpath))
+        output = self.generated('yaml_safe', 'yaml', jpath=jpath, yaml_safe=True)
+        self.assertEqual(3, len(expected))
+        self.assertListEqual(expected, YAML(typ='safe', pure=True).load(output))
+
+    def test_json_jpath_per_record(self):
+        self.assertEqual(self.generated('json_jpath', 'json', jpath='[*].{id: id, type: annotations.molecule_type}'),
+                         self.generated('json_jpath_per_record', 'json', jpath='{id: id, type: annotations.molecule_type}', per_record=True))
+
+    def test_filter_per_record(self):
+        expected = self.generated('filter', self.input_type, jpath=self.filter)
+        self.assertEqual(1, expected.count('LOCUS'))
+        self.assertEqual(expected, self.generated('filter_per_record', self.input_type, jpath=f"[@]{self.filter}", per_record=True))
+
     def test_json_jpath_split(self):
         output_path = Path(self.workdir.name, 'json_jpath_split')
         convert(self.input_path, self.input_type, output_path, 'json', jpath='[*].{id: split(\'.\', id), type: annotations.molecule_type}')
@@ -0,0 +1,87 @@
+import io
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from Bio import SeqIO
+
+from biopython_convert import fasta, convert
+
+long_sequence = 'ACGTTGCA' * 1000 + 'ACG'
+
+inputs = {
+    'wrapped': f">a one\n{long_sequence[:60]}\n{long_sequence[60:100]}\n>b\nACGT\n",
+    'wrapped 70': '>long\n' + '\n'.join(long_sequence[i:i + 70] for i in range(0, len(long_sequence), 70)) + '\n',
+    'wrapped 60': '>long\n' + '\n'.join(long_sequence[i:i + 60] for i in range(0, 6000, 60)) + '\n',
+    'two line': f">a\n{long_sequence}\n>b\nAC\n>empty\n\n",
+    'spaces': ">a  \nAC GT \n\tAC\n\n>b\n  \n",
+    'leading text': "comment\n\n>a\nACGT",
+    'empty titles': ">\nAC\n>\n>c\n",
+    'lower case': ">a b\tc\nacgtnnACGT\n",
+    'no newline': ">a\nACGT\n>b",
+    'non ascii': ">café  \nACGT \n",
+    'no records': "nothing here\n",
+}
+
+
+class TestFasta(TestCase):
+    def setUp(self) -> None:
+        self.workdir = TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.dir = Path(self.workdir.name)
+
+    def expected(self, text: str, input_type: str, output_type: str) -> bytes:
+        handle = io.StringIO()
+        SeqIO.write(SeqIO.parse(io.StringIO(text), input_type), handle, output_type)
+        return handle.getvalue().encode()
+
+    def fast(self, text: str, input_type: str, output_type: str) -> bytes:
+        handle = io.BytesIO()
+        fasta.write(text.encode(), handle, input_type, output_type)
+        return handle.getvalue()
+
+    def test_same_output(self):
+        for name, text in inputs.items():
+            for output_type in fasta.output_widths:
+                self.assertEqual(self.expected(text, 'fasta', output_type), self.fast(text, 'fasta', output_type),
+                                 f"{name} to {output_type}")
+
+    def test_two_line_input(self):
+        for text in (inputs['two line'], ">a\nACGT\n>b\nAC"):
+            for output_type in fasta.output_widths:
+                self.assertEqual(self.expected(text, 'fasta-2line', output_type),
+                                 self.fast(text, 'fasta-2line', output_type), text)
+        for name in ('wrapped', 'spaces', 'leading text', 'no newline'):
+            with self.assertRaises(ValueError):
+                self.expected(inputs[name], 'fasta-2line', 'fasta')
+            with self.assertRaises(ValueError):
+                self.fast(inputs[name], 'fasta-2line', 'fasta')
+
+    def test_wrap(self):
+        for length in (0, 1, 59, 60, 61, 3599, 3600, 3601, 7261):
+            seq = long_sequence[:length].encode()
+            expected = b''.join(seq[i:i + 60] + b'\n' for i in range(0, length, 60))
+            self.assertEqual(expected, fasta.wrap(seq, 60), length)
+
+    def test_convert(self):
+        input_path = self.dir / 'input.fasta'
+        input_path.write_text(inputs['wrapped 70'])
+        output_path = self.dir / 'output.fasta'
+        with patch.object(fasta, 'write', side_effect=fasta.write) as mock:
+            convert(input_path, 'fasta', output_path, 'fasta')
+            mock.assert_called_once()
+        self.assertEqual(self.expected(inputs['wrapped 70'], 'fasta', 'fasta'), output_path.read_bytes())
+
+    def test_supported(self):
+        path = self.dir / 'input.fasta'
+        path.write_bytes(b'>a\r\nACGT\r\n')
+        self.assertFalse(fasta.supported(path, 'fasta', 'fasta'))
+        path.write_bytes(b'>a\nACGT\n')
+        self.assertTrue(fasta.supported(path, 'fasta', 'fasta-2line'))
+        self.assertFalse(fasta.supported(path, 'fasta', 'genbank'))
+        self.assertFalse(fasta.supported(path, 'fastq', 'fasta'))
+        path.write_bytes(b'')
+        self.assertTrue(fasta.supported(path, 'fasta', 'fasta'))
+        convert(path, 'fasta', self.dir / 'output.fasta', 'fasta')
+        self.assertEqual(b'', (self.dir / 'output.fasta').read_bytes())
@@ -0,0 +1,117 @@
+import io
+from random import Random
+import warnings
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from Bio import SeqIO
+
+from biopython_convert import fastq, convert
+
+qualities = ''.join(map(chr, range(ord('@'), ord('~') + 1)))
+
+inputs = {
+    'four line': f"@a one\n{'ACGT' * 16}\n+\n{qualities}I\n@b\nAC\n+b\nhh\n",
+    'wrapped': f"@a\nACGTA\nCGT\n+\n@@@@\n@@@@\n@b  \nA\n+\n@\n",
+    'long': f"@long\n{'ACGT' * 100}\n+long\n{qualities * 6}{qualities[:22]}\n",
+    'spaces': "@ a\tb \nAC \n\n+\nhh\n\n",
+    'empty sequence': "@empty\n\n+\n\n@b\nA\n+\nI",
+    'no records': "",
+}
+sanger = "@high\nACGTACGTA\n+\n!+5?I^hs~\n"
+solexa = "@low\nACGTACGT\n+\n;<=>?@AB\n"
+
+
+class TestFastq(TestCase):
+    def setUp(self) -> None:
+        self.workdir = TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.dir = Path(self.workdir.name)
+
+    def expected(self, text: str, input_type: str, output_type: str) -> bytes:
+        handle = io.StringIO()
+        SeqIO.write(SeqIO.parse(io.StringIO(text), input_type), handle, output_type)
+        return handle.getvalue().encode()
+
+    def fast(self, text: str, input_type: str, output_type: str) -> bytes:
+        handle = io.BytesIO()
+        fastq.write(text.encode(), handle, input_type, output_type)
+        return handle.getvalue()
+
+    def test_same_output(self):
+        for name, text in inputs.items():
+            for input_type in fastq.input_types:
+                for output_type in fastq.output_types:
+                    self.assertEqual(self.expected(text, input_type, output_type),
+                                     self.fast(text, input_type, output_type),
+                                     f"{name} {input_type} to {output_type}")
+
+    def test_qual_width(self):
+        """
+        Scores that would fill a 60 character line are wrapped, as Bio.SeqIO.QualityIO.as_qual()
+        """
+        text = f"@exact\n{'A' * 21}\n+\n{'J' * 19}**\n@over\n{'A' * 26}\n+\n{'J' * 19}**{'J' * 5}\n"
+        self.assertIn(b'\n' + b'41 ' * 19 + b'9\n9\n', self.expected(text, 'fastq', 'qual'))
+        random = Random(0)
+        for length in range(1, 120):
+            quality = ''.join(random.choice(qualities[:64]) for _ in range(length))
+            text += f"@r{length}\n{'A' * length}\n+\n{quality}\n"
+        self.assertEqual(self.expected(text, 'fastq', 'qual'), self.fast(text, 'fastq', 'qual'))
+
+    def test_encodings(self):
+        for text, input_type in ((sanger, 'fastq-sanger'), (solexa, 'fastq-solexa')):
+            for output_type in fastq.output_types:
+                with warnings.catch_warnings(record=True) as expected_warnings:
+                    warnings.simplefilter('always')
+                    expected = self.expected(text, input_type, output_type)
+                with warnings.catch_warnings(record=True) as fast_warnings:
+                    warnings.simplefilter('always')
+                    self.assertEqual(expected, self.fast(text, input_type, output_type), output_type)
+                self.assertEqual({str(w.message) for w in expected_warnings},
+                                 {str(w.message) for w in fast_warnings}, output_type)
+
+    def test_blocks(self):
+        text = inputs['four line'] * 5 + inputs['wrapped'] + inputs['long'] * 3 + inputs['spaces'] + inputs['four line']
+        with patch.object(fastq, 'batch_size', 3), patch.object(fastq, 'block_size', 500):
+            for output_type in fastq.output_types:
+                self.assertEqual(self.expected(text, 'fastq-illumina', output_type),
+                                 self.fast(text, 'fastq-illumina', output_type), output_type)
+
+    def test_invalid(self):
+        for text, input_type in (
+                (sanger, 'fastq-illumina'),
+                (solexa, 'fastq-illumina'),
+                ("a\nA\n+\nI\n", 'fastq'),
+                ("@a\nAC\n+\nI\n", 'fastq'),
+                ("@a\nAC\n+b\nII\n", 'fastq'),
+                ("@a\nA C\n+\nIII\n", 'fastq'),
+                ("@a\nAC\n", 'fastq'),
+                ("@a\nAC\n+\n", 'fastq'),
+                ("@a\nAC\n+\nI I\n", 'fastq'),
+        ):
+            with self.assertRaises(ValueError):
+                self.expected(text, input_type, 'fastq')
+            with self.assertRaises(ValueError, msg=text):
+                self.fast(text, input_type, 'fastq')
+
+    def test_convert(self):
+        input_path = self.dir / 'input.fastq'
+        input_path.write_text(inputs['wrapped'])
+        output_path = self.dir / 'output.fastq'
+        with patch.object(fastq, 'write', side_effect=fastq.write) as mock:
+            convert(input_path, 'fastq-illumina', output_path, 'fastq-solexa')
+            mock.assert_called_once()
+        self.assertEqual(self.expected(inputs['wrapped'], 'fastq-illumina', 'fastq-solexa'), output_path.read_bytes())
+
+    def test_supported(self):
+        path = self.dir / 'input.fastq'
+        path.write_bytes(b'@a\r\nA\r\n+\r\nI\r\n')
+        self.assertFalse(fastq.supported(path, 'fastq', 'fasta'))
+        path.write_bytes('@café\nA\n+\nI\n'.encode())
+        self.assertFalse(fastq.supported(path, 'fastq', 'fasta'))
+        path.write_bytes(b'@a\nA\n+\nI\n')
+        self.assertTrue(fastq.supported(path, 'fastq', 'qual'))
+        self.assertFalse(fastq.supported(path, 'fastq', 'genbank'))
+        self.assertFalse(fastq.supported(path, 'fasta', 'fastq'))
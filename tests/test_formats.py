@@ -0,0 +1,68 @@
+import importlib.util
+import warnings
+from unittest import TestCase, skipUnless
+from tempfile import TemporaryDirectory
+from pathlib import Path
+
+from Bio import SeqIO
+
+from biopython_convert import convert, formats, _write
+
+
+class TestFormats(TestCase):
+    noseq_path = Path('test-data/no_seq.gbff')
+
+    def test_registry(self):
+        self.assertIn('abi', formats.input_types())
+        self.assertNotIn('abi', formats.output_types())
+        self.assertNotIn('json', formats.input_types())
+        self.assertIn('json', formats.output_types())
+        self.assertTrue(formats.get('sff').binary)
+        self.assertFalse(formats.get('clustal').streaming)
+        self.assertTrue(formats.get('gff3').concatenable)
+
+    def test_unregistered(self):
+        fmt = formats.get('embl-cds')
+        self.assertTrue(fmt.readable and fmt.writable)
+        self.assertEqual('', fmt.mode)
+
+    @skipUnless(importlib.util.find_spec('pyarrow'), "requires pyarrow")
+    def test_binary_once(self):
+        """
+        Binary output is opened in binary mode up front, consuming the records once
+        """
+        import pyarrow.ipc
+        with TemporaryDirectory() as workdir:
+            output_path = Path(workdir, 'features')
+            records = SeqIO.parse(str(self.noseq_path), 'genbank')
+            self.assertTrue(_write(records, output_path, 'features-arrow'))
+            self.assertEqual(5872, pyarrow.ipc.open_file(str(output_path)).read_all().num_rows)
+
+    def test_no_sequence(self):
+        with TemporaryDirectory() as workdir:
+            gff_path = Path(workdir, 'no_seq.gff3')
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                convert(self.noseq_path, 'genbank', gff_path, 'gff3')
+            with self.assertWarnsRegex(UserWarning, 'no sequences'):
+                convert(gff_path, 'gff3', Path(workdir, 'fasta'), 'fasta')
+
+    def test_undefined_sequence(self):
+        """
+        Output of serialised formats stops after the last record with a defined sequence
+        """
+        from Bio.Seq import Seq
+        from Bio.SeqRecord import SeqRecord
+        defined = SeqRecord(Seq('ACGT'), id='defined', annotations={'molecule_type': 'DNA'})
+        undefined = next(SeqIO.parse(str(self.noseq_path), 'genbank'))
+        with TemporaryDirectory() as workdir:
+            output_path = Path(workdir, 'output')
+            for output_type in ('json', 'jsonl', 'yaml', 'yaml-stream'):
+                self.assertTrue(_write((defined,), output_path, output_type))
+                expected = output_path.read_text()
+                if output_type == 'json':
+                    expected = expected[:-len('\n]')]
+                self.assertFalse(_write((undefined,), output_path, output_type))
+                self.assertEqual('', output_path.read_text(), output_type)
+                self.assertFalse(_write((defined, undefined), output_path, output_type))
+                self.assertEqual(expected, output_path.read_text(), output_type)
@@ -0,0 +1,254 @@
+import io
+from collections import defaultdict
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+from pathlib import Path
+from unittest.mock import patch
+
+from Bio import SeqIO
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+from Bio.SeqFeature import SeqFeature, FeatureLocation, CompoundLocation, BeforePosition, AfterPosition
+from gffutils import biopython_integration
+
+from biopython_convert import convert, get_args, gff
+
+
+class Unseekable(io.StringIO):
+    """
+    Text handle that can not be rewound, as a pipe, recording the lines read
+    """
+    def __init__(self, text: str):
+        super().__init__(text)
+        self.read_lines = []
+
+    def seekable(self) -> bool:
+        return False
+
+    def __next__(self) -> str:
+        line = super().__next__()
+        self.read_lines.append(line)
+        return line
+
+
+class TestGFFReader(TestCase):
+    noseq_path = Path('test-data/no_seq.gbff')
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.workdir = TemporaryDirectory()
+        cls.gff_path = Path(cls.workdir.name, 'no_seq.gff3')
+        convert(cls.noseq_path, 'genbank', cls.gff_path, 'gff3')
+        with cls.gff_path.open() as handle:
+            cls.lines = handle.readlines()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.workdir.cleanup()
+
+    def features(self, records, ids=True):
+        features = defaultdict(list)
+        for record in records:
+            features[record.id].extend((f.id if ids else None, f.type, int(f.location.start), int(f.location.end), f.location.strand, sorted(f.qualifiers.items())) for f in record.features)
+        return {seqid: sorted(f) for seqid, f in features.items()}
+
+    def test_grouped(self):
+        with self.gff_path.open() as handle:
+            records = list(gff.parse(handle))
+        self.assertListEqual(['NC_014334.1', 'NC_011352.1'], [r.id for r in records])
+        self.assertEqual(5872, sum(len(r.features) for r in records))
+        with self.gff_path.open() as handle:
+            self.assertDictEqual(self.features(gff.parse_unsorted(handle)), self.features(records))
+
+    def test_streaming(self):
+        """
+        Each record of unseekable input is output once the next seqid is read, without reading ahead
+        """
+        handle = Unseekable(''.join(self.lines))
+        records = gff.parse(handle)
+        first = next(records)
+        self.assertEqual('NC_014334.1', first.id)
+        self.assertFalse(any(line.startswith('NC_014334.1') for line in self.lines[len(handle.read_lines):]))
+        self.assertTrue(handle.read_lines[-1].startswith('NC_011352.1'))
+
+    def test_unique_ids(self):
+        """
+        Ids are unique across seqids, as in a gffutils database
+        """
+        lines = "a\t.\tgene\t1\t10\t.\t+\t.\tID=g\nb\t.\tgene\t1\t10\t.\t+\t.\tID=g\nb\t.\tCDS\t1\t10\t.\t+\t.\t\n"
+        records = list(gff.parse(io.StringIO(lines)))
+        self.assertListEqual([['g'], ['g_1', 'CDS_1']], [[f.id for f in r.features] for r in records])
+        self.assertDictEqual(self.features(gff.parse_unsorted(io.StringIO(lines))), self.features(records))
+
+    def test_unsorted(self):
+        """
+        Seekable input is loaded into a database once a seqid reappears, giving a record per seqid
+        """
+        lines = self.lines[:10] + self.lines[-10:] + self.lines[10:-10]
+        with self.gff_path.open() as truth:
+            truth = list(gff.parse(truth))
+        records = list(gff.parse(io.StringIO(''.join(lines))))
+        self.assertListEqual(['NC_011352.1', 'NC_014334.1'], [r.id for r in records])
+        # Generated ids depend on input order
+        self.assertDictEqual(self.features(truth, False), self.features(records, False))
+        with Path('test-data/unsorted.gff3').open() as handle:
+            records = list(gff.parse(handle))
+        self.assertListEqual([('chr1', 2000, ['gene1', 'cds1']), ('chr2', 1000, ['gene2', 'cds2'])],
+                             [(r.id, len(r), [f.id for f in r.features]) for r in records])
+
+    def test_unsorted_unseekable(self):
+        """
+        Unseekable input loads the input after a reappearing seqid into a database, splitting the records of the seqid
+        """
+        lines = self.lines[:10] + self.lines[-10:] + self.lines[10:-10]
+        with self.gff_path.open() as truth:
+            truth = list(gff.parse(truth))
+        with self.assertWarns(UserWarning):
+            records = list(gff.parse(Unseekable(''.join(lines))))
+        self.assertListEqual(['NC_014334.1', 'NC_011352.1', 'NC_011352.1', 'NC_014334.1'], [r.id for r in records])
+        ids = [f.id for r in records for f in r.features]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertDictEqual(self.features(truth, False), self.features(records, False))
+
+    def test_unsorted_grouped(self):
+        lines = self.lines[:10] + self.lines[-10:] + self.lines[10:-10]
+        with self.assertRaises(ValueError):
+            list(gff.parse_grouped(iter(lines)))
+
+    def test_cache(self):
+        with TemporaryDirectory() as cache_dir:
+            cache = gff.DBCache(Path(cache_dir))
+            with self.gff_path.open() as handle:
+                first = self.features(cache.parse(handle))
+            entries = list(Path(cache_dir).glob('*.db'))
+            self.assertEqual(1, len(entries))
+            mtime = entries[0].stat().st_mtime_ns
+            with self.gff_path.open() as handle:
+                self.assertDictEqual(first, self.features(cache.parse(handle)))
+            self.assertListEqual(entries, list(Path(cache_dir).glob('*.db')))
+            self.assertLessEqual(mtime, entries[0].stat().st_mtime_ns)
+            with self.gff_path.open() as handle:
+                self.assertDictEqual(self.features(gff.parse(handle)), first)
+
+    def test_cache_order(self):
+        """
+        Cached features keep the file order within each seqid, as streamed features do
+        """
+        path = Path(self.workdir.name, 'order.gff3')
+        path.write_text(''.join(f"{seqid}\t.\tgene\t{start}\t{start + 10}\t.\t+\t.\tID={seqid}{start}\n"
+                                for seqid in ('b', 'a') for start in (500, 20, 300, 1)))
+        with TemporaryDirectory() as cache_dir, path.open() as handle:
+            cached = {r.id: [f.id for f in r.features] for r in gff.DBCache(Path(cache_dir)).parse(handle)}
+        with path.open() as handle:
+            streamed = {r.id: [f.id for f in r.features] for r in gff.parse(handle)}
+        self.assertDictEqual({'b': ['b500', 'b20', 'b300', 'b1'], 'a': ['a500', 'a20', 'a300', 'a1']}, streamed)
+        self.assertDictEqual(streamed, cached)
+
+    def test_cache_evict(self):
+        with TemporaryDirectory() as cache_dir:
+            other = Path(self.workdir.name, 'other.gff3')
+            with other.open('w') as handle:
+                handle.writelines(self.lines[:100])
+            cache = gff.DBCache(Path(cache_dir), max_size=0)
+            with self.gff_path.open() as handle:
+                list(cache.parse(handle))
+            with other.open() as handle:
+                list(cache.parse(handle))
+                key = cache.content_key(handle)
+            self.assertListEqual([f"{key}.db"], [p.name for p in Path(cache_dir).glob('*.db')])
+            # Lock files are kept, as other processes may be waiting on them
+            self.assertEqual(2, len([p for p in Path(cache_dir).glob('*.lock') if p.name != '.evict.lock']))
+            self.assertEqual(1, len(list(Path(cache_dir).glob('*.key'))))
+
+    def test_cache_hash(self):
+        """
+        Input is only hashed when its path, size, or modification time is new, or its entry was removed
+        """
+        with TemporaryDirectory() as cache_dir:
+            cache = gff.DBCache(Path(cache_dir))
+            with patch.object(gff.DBCache, 'content_key', wraps=gff.DBCache.content_key) as content_key:
+                for _ in range(2):
+                    with self.gff_path.open() as handle:
+                        list(cache.parse(handle))
+                self.assertEqual(1, content_key.call_count)
+                copy = Path(self.workdir.name, 'copy.gff3')
+                copy.write_text(self.gff_path.read_text())
+                with copy.open() as handle:
+                    list(cache.parse(handle))
+                self.assertEqual(2, content_key.call_count)
+                # The copy shares the entry of the original
+                self.assertEqual(1, len(list(Path(cache_dir).glob('*.db'))))
+                self.assertEqual(2, len(list(Path(cache_dir).glob('*.key'))))
+                for dbfn in Path(cache_dir).glob('*.db'):
+                    dbfn.unlink()
+                with self.gff_path.open() as handle:
+                    list(cache.parse(handle))
+                self.assertEqual(3, content_key.call_count)
+
+    def test_cache_size(self):
+        with TemporaryDirectory() as cache_dir:
+            arguments = get_args(['-c', cache_dir, '--cache-size', '5', 'in.gff3', 'gff3', 'out.json', 'json'])
+            self.assertEqual(5 << 20, arguments.cache_size)
+            with patch('sys.stderr', io.StringIO()), self.assertRaises(SystemExit):
+                get_args(['--cache-size', '5', 'in.gff3', 'gff3', 'out.json', 'json'])
+            other = Path(self.workdir.name, 'sized.gff3')
+            other.write_text(''.join(self.lines[:100]))
+            for path in (self.gff_path, other):
+                convert(path, 'gff3', Path(self.workdir.name, 'out.gff3'), 'gff3', cache=Path(cache_dir), cache_size=0)
+            self.assertEqual(1, len(list(Path(cache_dir).glob('*.db'))))
+
+
+class TestGFFWriter(TestCase):
+    def setUp(self) -> None:
+        self.record = SeqRecord(Seq('ACGT' * 30), id='rec.1', features=[
+            SeqFeature(FeatureLocation(BeforePosition(5), AfterPosition(50), 1), type='gene',
+                       qualifiers={'note': ['a;b=c,d', '%x'], 'pseudo': [''], 'score': ['3.5'], 'frame': ['1']}),
+            SeqFeature(CompoundLocation([FeatureLocation(60, 70, -1), FeatureLocation(10, 20, -1)]), type='CDS',
+                       qualifiers={'product': ['p\tq']}),
+        ])
+
+    def test_gffutils(self):
+        """
+        Lines are identical to printing features converted to gffutils
+        """
+        records = list(SeqIO.parse('test-data/no_seq.gbff', 'genbank')) + [self.record]
+        expected = []
+        for record in records:
+            for feature in record.features:
+                feature = biopython_integration.from_seqfeature(feature)
+                feature.seqid = record.id
+                feature.source = 'biopython.convert'
+                expected.append(f"{feature}\n")
+        output = io.StringIO()
+        gff.gff_writer(records, output, 'gff3')
+        self.assertEqual(''.join(expected), output.getvalue())
+
+    def test_directives(self):
+        output = io.StringIO()
+        gff.gff_writer([self.record, SeqRecord(Seq(None, 5), id='rec.2')], output, 'gff3', directives=True, fasta=True)
+        self.assertEqual(
+            "##gff-version 3\n"
+            "##sequence-region rec.1 1 120\n"
+            "rec.1\tbiopython.convert\tgene\t6\t50\t3.5\t+\t1\tnote=a%3Bb%3Dc%2Cd,%25x;pseudo\n"
+            "rec.1\tbiopython.convert\tCDS\t61\t70\t.\t-\t.\tID=rec.1:1;product=p%09q\n"
+            "rec.1\tbiopython.convert\tCDS\t11\t20\t.\t-\t.\tID=rec.1:1;product=p%09q\n"
+            "##sequence-region rec.2 1 5\n"
+            "##FASTA\n"
+            ">rec.1\n" + "ACGT" * 15 + "\n" + "ACGT" * 15 + "\n",
+            output.getvalue()
+        )
+        records = list(gff.parse(io.StringIO(output.getvalue())))
+        self.assertEqual(120, len(records[0]))
+        self.assertListEqual([(60, 70), (10, 20)], [(int(f.location.start), int(f.location.end)) for f in records[0].features[1:]])
+
+    def test_convert(self):
+        """
+        Directives are written once per output, so sharding is not used
+        """
+        with TemporaryDirectory() as workdir:
+            output_path = Path(workdir, 'out.gff3')
+            convert(Path('test-data/no_seq.gbff'), 'genbank', output_path, 'gff3', jobs=2, gff_directives=True)
+            with output_path.open() as handle:
+                lines = handle.readlines()
+        self.assertEqual(1, lines.count("##gff-version 3\n"))
+        self.assertEqual(2, sum(line.startswith('##sequence-region') for line in lines))
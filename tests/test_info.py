@@ -0,0 +1,80 @@
+import io
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import gffutils
+from Bio import SeqIO
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+from biopython_convert import info, convert
+
+
+class TestInfo(TestCase):
+    def test_format_line(self):
+        """
+        Lines are identical to those formatted by gffutils
+        """
+        attributes = {
+            'Name': ['rec'],
+            'desc': ['a, b; c=d\te%'],
+            'source_note': [['x;y', ';'], ['z']],
+            'features': [],
+            'empty': [''],
+        }
+        expected = str(gffutils.Feature('rec.1', 'biopython.convert', 'sequence', start=1, end=10,
+                                        attributes={k: list(v) for k, v in attributes.items()}))
+        self.assertEqual(expected, info.format_line('rec.1', 1, 10, attributes))
+
+    def test_composition(self):
+        composition = info.Composition(info.byte_counts(Seq('ACGTNNRYacgt')))
+        self.assertEqual(12, composition.length)
+        self.assertEqual(0.5, composition.gc)
+        self.assertEqual(2, composition.n)
+        self.assertEqual(2, composition.ambiguous)
+        self.assertEqual(4 / 12, composition.masked)
+        self.assertIsNone(info.byte_counts(Seq(None, 10)))
+
+    def test_summary(self):
+        summary = info.Summary()
+        for length in (100, 500, 2000):
+            summary.add(length, info.byte_counts(Seq('G' * length)))
+        other = info.Summary()
+        other.add(50)
+        summary.merge(other)
+        attributes = summary.attributes()
+        self.assertEqual(['4'], attributes['records'])
+        self.assertEqual(['2650'], attributes['length'])
+        self.assertEqual(['2000'], attributes['N50'])
+        self.assertEqual(['1'], attributes['L50'])
+        self.assertEqual(['10:1', '100:2', '1000:1'], attributes['length_histogram'])
+        self.assertEqual(['1.0000'], attributes['gc'])
+
+    def test_report(self):
+        stats = io.StringIO()
+        report = info.Report(stats, composition=True)
+        report.add(SeqRecord(Seq('ACGTNn'), id='a', name='a', description=''))
+        report.add(SeqRecord(Seq(None, 4), id='b', name='b', description=''))
+        report.write_summary()
+        self.assertEqual(
+            "a\tbiopython.convert\tsequence\t1\t6\t.\t.\t.\tName=a;features;gc=0.5000;N=2;ambiguous=0;masked=0.1667\n"
+            "b\tbiopython.convert\tsequence\t1\t4\t.\t.\t.\tName=b;features\n"
+            "#summary records=2;length=10;N50=6;L50=1;length_histogram=1:2;gc=0.5000;N=2;ambiguous=0;masked=0.1667\n",
+            stats.getvalue()
+        )
+
+    def test_convert(self):
+        """
+        The default report is unchanged by composition, other than the added attributes and summary
+        """
+        input_path = Path('test-data/no_seq.gbff')
+        with TemporaryDirectory() as workdir:
+            plain, extended = io.StringIO(), io.StringIO()
+            convert(input_path, 'genbank', Path(workdir, 'plain'), 'gff3', stats=plain)
+            convert(input_path, 'genbank', Path(workdir, 'extended'), 'gff3', stats=extended, composition=True)
+        lines = extended.getvalue().splitlines(keepends=True)
+        self.assertEqual(plain.getvalue(), ''.join(lines[:-1]))
+        self.assertTrue(lines[-1].startswith('#summary records='))
+        with open(input_path) as handle:
+            self.assertEqual(sum(1 for _ in SeqIO.parse(handle, 'genbank')) + 2, len(lines))
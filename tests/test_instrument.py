@@ -0,0 +1,93 @@
+import io
+import json
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from Bio import SeqIO
+
+from biopython_convert import instrument, convert
+
+input_path = Path('test-data/no_seq.gbff')
+gff_path = Path('test-data/unsorted.gff3')
+
+
+class TestInstrument(TestCase):
+    def setUp(self) -> None:
+        self.workdir = TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.dir = Path(self.workdir.name)
+        self.records = list(SeqIO.parse(str(input_path), 'genbank'))
+
+    def report(self, *args, **kwargs) -> dict:
+        metrics = self.dir / 'metrics.json'
+        convert(*args, metrics=metrics, **kwargs)
+        return json.loads(metrics.read_text())
+
+    def test_report(self):
+        output = self.dir / 'output.gff3'
+        report = self.report(input_path, 'genbank', output, 'gff3', jpath='[?id]')
+        self.assertEqual('ok', report['status'])
+        self.assertEqual(len(self.records), report['records_in'])
+        self.assertEqual(sum(len(record.features) for record in self.records), report['features_in'])
+        self.assertEqual(len(self.records), report['records_out'])
+        self.assertEqual(input_path.stat().st_size, report['input']['bytes'])
+        self.assertEqual(dict(path=str(output), type='gff3', files=1, bytes=output.stat().st_size), report['output'])
+        self.assertLessEqual({'setup', 'parse', 'query', 'write'}, set(report['stages']))
+        self.assertAlmostEqual(report['seconds'], sum(report['stages'].values()), places=3)
+        self.assertGreater(report['maxrss'], 0)
+
+    def test_serialize(self):
+        report = self.report(input_path, 'genbank', self.dir / 'output.json', 'json', jpath='[*].{id: id}')
+        self.assertIn('serialize', report['stages'])
+        self.assertEqual(len(self.records), report['records_out'])
+
+    def test_split(self):
+        output = self.dir / 'output.gff3'
+        report = self.report(input_path, 'genbank', output, 'gff3', split=True, stats=io.StringIO())
+        self.assertIn('stats', report['stages'])
+        self.assertEqual(len(self.records), report['records_out'])
+        self.assertEqual(len(self.records), report['output']['files'])
+        self.assertEqual(sum(path.stat().st_size for path in self.dir.glob('output.*.gff3')), report['output']['bytes'])
+
+    def test_gff_db(self):
+        report = self.report(gff_path, 'gff3', self.dir / 'output.gff3', 'gff3')
+        self.assertIn('gff-db', report['stages'])
+
+    def test_failure(self):
+        metrics = self.dir / 'metrics.json'
+        with self.assertRaises(FileNotFoundError):
+            convert(self.dir / 'missing', 'genbank', self.dir / 'output.gff3', 'gff3', metrics=metrics)
+        report = json.loads(metrics.read_text())
+        self.assertEqual('failed', report['status'])
+        self.assertIn('FileNotFoundError', report['error'])
+
+    def test_profile(self):
+        report = self.report(input_path, 'genbank', self.dir / 'output.gff3', 'gff3', profile='cprofile')
+        self.assertTrue(any('gff_writer' in function['function'] for function in report['profile']['cprofile']))
+        report = self.report(input_path, 'genbank', self.dir / 'output.gff3', 'gff3', profile='tracemalloc')
+        self.assertGreater(report['profile']['tracemalloc']['peak'], 0)
+        with self.assertRaises(ValueError):
+            instrument.Metrics('perf')
+
+    def test_exclusive(self):
+        """
+        Time spent in an inner stage is not counted towards the stage waiting for it
+        """
+        def slow(items):
+            for item in items:
+                time.sleep(0.01)
+                yield item
+
+        metrics = instrument.Metrics()
+        with metrics.measure():
+            with instrument.stage('write'):
+                self.assertEqual([0, 1, 2], list(instrument.timed(slow(range(3)), 'parse')))
+        self.assertGreaterEqual(metrics.stages['parse'], 0.03)
+        self.assertLess(metrics.stages['write'], 0.01)
+
+    def test_inactive(self):
+        items = iter(())
+        self.assertIs(items, instrument.timed(items, 'parse'))
+        self.assertIs(len, instrument.timed_function('serialize', len))
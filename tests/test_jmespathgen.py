@@ -0,0 +1,264 @@
+import pickle
+import inspect
+from unittest import TestCase
+from unittest.mock import patch
+
+import jmespath.ast
+
+from biopython_convert import JMESPathGen
+
+
+class TestPlanner(TestCase):
+    def assertStreamable(self, expression, random_access=False):
+        plan = JMESPathGen.plan(expression, random_access)
+        self.assertTrue(plan.streamable, str(plan))
+
+    def assertMaterializes(self, expression, node_type, random_access=False):
+        plan = JMESPathGen.plan(expression, random_access)
+        self.assertFalse(plan.streamable, str(plan))
+        self.assertEqual(node_type, plan.materializations[0].node['type'])
+
+    def test_streamable(self):
+        self.assertStreamable("[?!(features[?type=='source'].qualifiers.plasmid)]")
+        self.assertStreamable("[*].annotations.taxonomy")
+        self.assertStreamable("[*].length(features)")
+        self.assertStreamable("[1:3]")
+        self.assertStreamable("[@, [{seq: 'AAAA'}]] | []")
+        self.assertStreamable("[*].let({seq: seq}, &features[0])")
+
+    def test_index(self):
+        self.assertMaterializes("[0]", 'index')
+        self.assertMaterializes("[*].id | [0]", 'index')
+
+    def test_function(self):
+        self.assertMaterializes("length(@)", 'function_expression')
+        self.assertMaterializes("sort_by(@, &id)", 'function_expression')
+
+    def test_let(self):
+        # Variables may be read more than once
+        self.assertMaterializes("let({records: @}, &records[0])", 'function_expression')
+        self.assertMaterializes("let({records: [*].id}, &records)", 'function_expression')
+        self.assertStreamable("[*].let({features: features}, &features[0])")
+        self.assertStreamable("let({records: @}, &records[0])", True)
+
+    def test_random_access(self):
+        self.assertStreamable("[0]", True)
+        self.assertStreamable("[-1].id", True)
+        self.assertStreamable("length(@)", True)
+        self.assertStreamable("[10:20].id", True)
+        self.assertMaterializes("[*].id | [0]", 'index', True)
+        self.assertMaterializes("[1:3] | [0]", 'index', True)
+        self.assertMaterializes("sort_by(@, &id)", 'function_expression', True)
+
+    def test_root_filter(self):
+        fields = {'id': None, 'annotations': ('contig',)}
+        for expression in ("[?id=='a']", "[?id=='a'].features", "[?annotations.organism=='a'] | [0]",
+                           "[?contains(id, 'a')][]", "[?!(annotations.taxonomy[?@=='a'])]",
+                           "[?id=='a' || annotations.date]"):
+            self.assertIsNotNone(JMESPathGen.root_filter(expression, fields), expression)
+        for expression in ("[*].id", "[?name=='a']", "[?features[?type=='CDS']]", "[?annotations.contig]",
+                           "[?annotations]", "[?@]", "[*].features[?id=='a']", "[?let({a: id}, &a)]",
+                           "sort_by(@, &id)[?id=='a']"):
+            self.assertIsNone(JMESPathGen.root_filter(expression, fields), expression)
+        matches = JMESPathGen.predicate(JMESPathGen.root_filter("[?id=='a']", fields))
+        self.assertTrue(matches({'id': 'a'}))
+        self.assertFalse(matches({'id': 'b'}))
+
+
+class TestRandomAccess(TestCase):
+    class Squares(JMESPathGen.RandomAccessList):
+        def __init__(self, n):
+            self.n = n
+            self.accessed = []
+
+        def __len__(self):
+            return self.n
+
+        def __getitem__(self, i):
+            if not -self.n <= i < self.n:
+                raise IndexError(i)
+            i %= self.n
+            self.accessed.append(i)
+            return {'value': i * i}
+
+    def test_search(self):
+        squares = self.Squares(1000)
+        self.assertEqual({'value': 998001}, JMESPathGen.search('[-1]', squares))
+        self.assertEqual(1000, JMESPathGen.search('length(@)', squares))
+        self.assertListEqual([100, 121], list(JMESPathGen.search('[10:12].value', squares)))
+        self.assertIsNone(JMESPathGen.search('[1000]', squares))
+        self.assertListEqual([999, 10, 11], squares.accessed)
+
+
+def _materialize(value):
+    if isinstance(value, JMESPathGen._array_types):
+        return [_materialize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _materialize(v) for k, v in value.items()}
+    return value
+
+
+class TestCompiler(TestCase):
+    records = [
+        {'id': 'a', 'length': 3, 'features': [{'type': 'CDS', 'qualifiers': {'product': ['x']}},
+                                             {'type': 'gene', 'qualifiers': {}}]},
+        {'id': 'b', 'length': 0, 'features': [{'type': 'gene', 'qualifiers': {'product': ['y']}}]},
+        {'id': 'c', 'length': 10, 'features': []},
+    ]
+
+    expressions = [
+        "[?features[?type=='CDS' && qualifiers.product]]",
+        "[?!(features[?type=='CDS'])].id",
+        "[*].features[?type=='gene'].qualifiers.product[]",
+        "[*].features[].type",
+        "[?length > `2`].id",
+        "[?length <= `3` || id == 'c'].id",
+        "[1:3].{name: id, n: length(features)}",
+        "[*].[id, length]",
+        "[*].features[0].type",
+        "[*].let({rid: id}, &features[*].[rid, type])",
+        "let({records: @}, &records[-1].id)",
+        "sort_by(@, &length)[*].id",
+        "max_by(@, &length).id",
+        "[*].features[*].qualifiers.*[]",
+        "[*].missing",
+        "length(@)",
+        "[0]",
+        "@ | [*].id | [1]",
+        "[?!length].id",
+    ]
+
+    def search(self, expression, closures):
+        compiled = JMESPathGen.compile(expression, closures)
+        return _materialize(compiled.search((record for record in self.records)))
+
+    def test_same_results(self):
+        for expression in self.expressions:
+            self.assertEqual(self.search(expression, False), self.search(expression, True), expression)
+
+    def test_node_types(self):
+        # Every node type of the parser has a closure
+        for name, builder in inspect.getmembers(jmespath.ast, inspect.isfunction):
+            node = builder(*[None] * len(inspect.signature(builder).parameters))
+            self.assertTrue(hasattr(JMESPathGen.Compiler, f"visit_{node['type']}"), node['type'])
+
+    def test_interpreted(self):
+        # Node types without a closure are walked by the interpreter
+        with patch.object(JMESPathGen.Compiler, 'visit_not_expression', JMESPathGen.Compiler.default_visit), \
+                patch.object(JMESPathGen.Compiler, 'visit_field', JMESPathGen.Compiler.default_visit):
+            for expression in ("[?!length].id", "[*].let({rid: id}, &features[*].[rid, type])"):
+                self.assertEqual(self.search(expression, False), self.search(expression, True), expression)
+
+    def test_compile(self):
+        parsed = JMESPathGen.compile("[*].id")
+        self.assertNotIsInstance(parsed, JMESPathGen.CompiledResult)
+        compiled = JMESPathGen.compile(parsed, closures=True)
+        self.assertIsInstance(compiled, JMESPathGen.CompiledResult)
+        self.assertIs(compiled, JMESPathGen.compile(compiled))
+        self.assertEqual(parsed.parsed, compiled.parsed)
+
+    def test_pickle(self):
+        compiled = JMESPathGen.compile("[*].id", closures=True)
+        self.assertEqual(['a', 'b', 'c'], list(compiled.search(self.records)))
+        unpickled = pickle.loads(pickle.dumps(compiled))
+        self.assertEqual(['a', 'b', 'c'], list(unpickled.search(self.records)))
+
+    def test_streaming(self):
+        consumed = []
+
+        def records():
+            for record in self.records:
+                consumed.append(record['id'])
+                yield record
+
+        result = JMESPathGen.compile("[?length > `0`].id", closures=True).search(records())
+        self.assertEqual([], consumed)
+        self.assertEqual('a', next(result))
+        self.assertEqual(['a'], consumed)
+
+    def test_random_access(self):
+        squares = TestRandomAccess.Squares(1000)
+        compiled = JMESPathGen.compile('[998:].value', closures=True)
+        self.assertListEqual([996004, 998001], list(compiled.search(squares)))
+        self.assertListEqual([998, 999], squares.accessed)
+
+    def test_peeked(self):
+        # Truth tests of generators take their first element, which must still be generated afterwards
+        for expression, expected in (("[?length > `0`].id || `[]`", ['a', 'c']),
+                                     ("[*].features[?type=='gene'].type || `1`", [['gene'], ['gene'], []]),
+                                     ("[*].id || `1` | [0]", 'a'),
+                                     ("!([?length > `0`]) || `1`", 1),
+                                     ("[?length > `0`].id && `1`", 1)):
+            for closures in (False, True):
+                self.assertEqual(expected, self.search(expression, closures), expression)
+
+    def test_peeked_replacement(self):
+        interpreter = JMESPathGen.TreeInterpreterGenerator()
+        generator = (i for i in range(3))
+        self.assertFalse(interpreter._is_false(generator))
+        replacement = interpreter._resolve(generator)
+        self.assertIs(replacement, interpreter._resolve(generator))
+        self.assertEqual(0, next(replacement))
+        # Once started, the peeked element is not generated again
+        self.assertIs(generator, interpreter._resolve(generator))
+        self.assertEqual([1, 2], list(replacement))
+
+    def test_let(self):
+        for expression, expected in (("let({g: [*].features[].type}, &{a: !g, b: g})",
+                                       {'a': False, 'b': ['CDS', 'gene', 'gene']}),
+                                      ("let({g: [*].id}, &[g || `1`, (g || `2`)])", [['a', 'b', 'c'], ['a', 'b', 'c']]),
+                                      ("{g: [*].id} | [!g, g]", [False, ['a', 'b', 'c']])):
+            for closures in (False, True):
+                self.assertEqual(expected, self.search(expression, closures), expression)
+
+    def test_custom_slice(self):
+        from Bio.SeqRecord import SeqRecord
+        from Bio.Seq import Seq
+        record = SeqRecord(Seq('ACGTACGT'), id='r')
+        options = JMESPathGen.Options(custom_functions=JMESPathGen.ExtendedFunctions(),
+                                      custom_slice_types=(SeqRecord,))
+        compiled = JMESPathGen.Compiler().compile({'type': 'slice', 'children': [2, 5, None]})
+        result = compiled(record, JMESPathGen.TreeInterpreterGenerator(options), None)
+        self.assertIsInstance(result, SeqRecord)
+        self.assertEqual('GTA', str(result.seq))
+
+
+class TestSpillList(TestCase):
+    records = [{'id': str(i), 'seq': 'ACGT' * i} for i in range(100)]
+
+    def test_spill(self):
+        spilled = JMESPathGen.SpillList(iter(self.records), 1000)
+        self.addCleanup(spilled.close)
+        self.assertEqual(100, len(spilled))
+        self.assertLess(0, spilled.spilled)
+        self.assertLess(spilled.spilled, 100)
+        self.assertEqual(self.records[99], spilled[-1])
+        self.assertEqual(self.records[0], spilled[0])
+        self.assertEqual(self.records[10:13], spilled[10:13])
+        self.assertEqual(self.records, list(spilled))
+
+    def test_unpicklable(self):
+        elements = [lambda: None, *self.records]
+        spilled = JMESPathGen.SpillList(iter(elements), 0)
+        self.addCleanup(spilled.close)
+        self.assertIs(elements[0], spilled[0])
+        self.assertEqual(100, spilled.spilled)
+
+    def test_search(self):
+        options = JMESPathGen.Options(custom_functions=JMESPathGen.ExtendedFunctions(), memory_budget=1000)
+        for expression in ("length(@)", "[-1].id", "[[0].id, length(@)]", "sort_by(@, &seq)[-2].id", "type(@)",
+                           "to_array(@)[5].id", "reverse(@)[*].id | [0]", "let({records: @}, &records[50].id)"):
+            for closures in (False, True):
+                compiled = JMESPathGen.compile(expression, closures)
+                self.assertEqual(_materialize(compiled.search((r for r in self.records))),
+                                 _materialize(compiled.search((r for r in self.records), options)), expression)
+
+    def test_released(self):
+        interpreter = JMESPathGen.TreeInterpreterGenerator(
+            JMESPathGen.Options(custom_functions=JMESPathGen.ExtendedFunctions(), memory_budget=1000))
+        records = (r for r in self.records)
+        spilled = interpreter._gen_to_list(records)
+        self.assertIsInstance(spilled, JMESPathGen.SpillList)
+        self.assertIs(spilled, interpreter._gen_to_list(records))
+        del records, spilled
+        self.assertEqual(0, len(interpreter._generators))
@@ -0,0 +1,72 @@
+import io
+import json
+import contextlib
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from Bio import SeqIO
+
+from biopython_convert import progress, compression, convert
+
+input_path = Path('test-data/no_seq.gbff')
+
+
+class TestProgress(TestCase):
+    def setUp(self) -> None:
+        self.workdir = TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.dir = Path(self.workdir.name)
+        self.count = sum(1 for _ in SeqIO.parse(str(input_path), 'genbank'))
+
+    def convert(self, path: Path, **kwargs) -> list:
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            convert(path, 'genbank', self.dir / 'output.gff3', 'gff3', progress='json', **kwargs)
+        return [json.loads(line) for line in stderr.getvalue().splitlines()]
+
+    def test_convert(self):
+        for kwargs in ({}, {'split': True}):
+            *_, done = self.convert(input_path, **kwargs)
+            self.assertTrue(done['done'])
+            self.assertEqual(self.count, done['records'])
+            self.assertEqual(input_path.stat().st_size, done['total'])
+            self.assertEqual(done['total'], done['bytes'])
+            self.assertEqual(0, done['eta'])
+
+    def test_compressed(self):
+        """
+        Compressed input is measured by the compressed bytes read
+        """
+        for compression_type in ('bgzf', 'gzip', 'bz2'):
+            path = self.dir / f"input.{compression_type}"
+            with compression.open_output(path, 'wb', compression_type) as handle:
+                handle.write(input_path.read_bytes())
+            *_, done = self.convert(path)
+            self.assertEqual(path.stat().st_size, done['total'], compression_type)
+            self.assertEqual(self.count, done['records'], compression_type)
+
+    def test_report(self):
+        output = io.StringIO()
+        with input_path.open() as handle:
+            with progress.report(handle, 'text', output, interval=0.01) as reporter:
+                handle.read(100)
+                self.assertEqual(handle.buffer.raw.tell(), reporter.snapshot()['bytes'])
+                self.assertEqual(['a', 'b'], list(progress.counted(['a', 'b'])))
+                self.assertIsNotNone(reporter.snapshot()['eta'])
+        lines = output.getvalue().splitlines()
+        self.assertIn('2 records', lines[-1])
+        self.assertIn('done in', lines[-1])
+        self.assertIn('%', lines[-1])
+        # Records are not counted outside of a report
+        records = iter(())
+        self.assertIs(records, progress.counted(records))
+
+    def test_unknown_size(self):
+        reporter = progress.Progress(io.StringIO('not a file'), io.StringIO())
+        snapshot = reporter.snapshot()
+        self.assertIsNone(snapshot['bytes'])
+        self.assertIsNone(snapshot['eta'])
+        self.assertEqual('0 records, 0.0 records/s', reporter.format(snapshot))
+        with self.assertRaises(ValueError):
+            progress.Progress(io.StringIO(), style='xml')
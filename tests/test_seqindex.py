@@ -0,0 +1,90 @@
+import os
+import warnings
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+from pathlib import Path
+
+from biopython_convert import convert, seqindex, JMESPathGen
+
+
+class TestSeqIndex(TestCase):
+    def setUp(self) -> None:
+        self.workdir = TemporaryDirectory()
+        self.input_path = Path(self.workdir.name, 'input.fasta')
+        self.write_input(50)
+
+    def tearDown(self) -> None:
+        self.workdir.cleanup()
+
+    def write_input(self, count: int, prefix: str = 'seq'):
+        with self.input_path.open('w') as handle:
+            for i in range(count):
+                handle.write(f">{prefix}{i} record {i}\nACGT{'A' * i}\n")
+
+    def open(self, cache: Path = None) -> seqindex.IndexedRecords:
+        records = seqindex.IndexedRecords(self.input_path, 'fasta', seqindex.index_path(self.input_path, cache))
+        self.addCleanup(records.close)
+        return records
+
+    def test_access(self):
+        records = self.open()
+        self.assertTrue(Path(self.workdir.name, 'input.fasta.idx').exists())
+        self.assertEqual(50, len(records))
+        self.assertEqual('seq0', records[0].id)
+        self.assertEqual('seq49', records[-1].id)
+        self.assertEqual(53, len(records[49]))
+        self.assertListEqual(['seq10', 'seq11'], [r.id for r in records.slice(slice(10, 12))])
+        self.assertListEqual(['seq49', 'seq47'], [r.id for r in records.slice(slice(None, -4, -2))][:2])
+        self.assertListEqual([f"seq{i}" for i in range(50)], [r.id for r in records])
+        with self.assertRaises(IndexError):
+            records[50]
+
+    def test_rebuild(self):
+        self.open()
+        index_path = seqindex.index_path(self.input_path)
+        self.write_input(5, 'other')
+        # Make the input newer than the index
+        mtime = index_path.stat().st_mtime
+        os.utime(self.input_path, (mtime + 1, mtime + 1))
+        records = self.open()
+        self.assertEqual(5, len(records))
+        self.assertEqual('other4', records[-1].id)
+
+    def test_cache(self):
+        cache = Path(self.workdir.name, 'cache')
+        self.open(cache)
+        self.assertFalse(seqindex.index_path(self.input_path).exists())
+        self.assertEqual(1, len(list(cache.glob('input.fasta.*.idx'))))
+
+    def test_convert(self):
+        for jpath in ('[-1]', '[10:12]', "[?id=='seq3']"):
+            expected_path = Path(self.workdir.name, 'expected')
+            output_path = Path(self.workdir.name, 'output')
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', JMESPathGen.MaterializationWarning)
+                convert(self.input_path, 'fasta', expected_path, 'fasta', jpath=jpath)
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                convert(self.input_path, 'fasta', output_path, 'fasta', jpath=jpath, index=True)
+            self.assertEqual(expected_path.read_text(), output_path.read_text(), jpath)
+
+    def test_serialize(self):
+        """
+        The indexed root list is output as its records
+        """
+        for output_type in ('json', 'yaml', 'text'):
+            expected_path = Path(self.workdir.name, 'expected')
+            output_path = Path(self.workdir.name, 'output')
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', JMESPathGen.MaterializationWarning)
+                convert(self.input_path, 'fasta', expected_path, output_type, jpath='[length(@), @]')
+            convert(self.input_path, 'fasta', output_path, output_type, jpath='[length(@), @]', index=True)
+            self.assertEqual(expected_path.read_text(), output_path.read_text(), output_type)
+
+    def test_duplicate_ids(self):
+        with self.input_path.open('a') as handle:
+            handle.write(">seq0\nAAAA\n")
+        output_path = Path(self.workdir.name, 'output')
+        with self.assertWarnsRegex(UserWarning, 'reading sequentially'):
+            convert(self.input_path, 'fasta', output_path, 'fasta', jpath='[-1]', index=True)
+        self.assertEqual(">seq0\nAAAA\n", output_path.read_text())
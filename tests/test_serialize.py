@@ -0,0 +1,71 @@
+import pickle
+from collections import OrderedDict
+from unittest import TestCase
+
+from Bio import SeqIO
+from Bio.Seq import Seq, UndefinedSequenceError
+from Bio.SeqRecord import SeqRecord
+from Bio.SeqFeature import SeqFeature, FeatureLocation, CompoundLocation, BeforePosition
+
+from biopython_convert import serialize
+
+
+class TestSerializer(TestCase):
+    def setUp(self) -> None:
+        self.record = SeqRecord(Seq('ACGTACGTAC'), id='rec.1', name='rec', description='test record',
+                                annotations={'molecule_type': 'DNA', 'gi': '0123'}, features=[
+            SeqFeature(FeatureLocation(BeforePosition(0), 4, 1), type='gene',
+                       qualifiers=OrderedDict(locus_tag=['L_0001'], codon_start=['1'])),
+            SeqFeature(CompoundLocation([FeatureLocation(0, 2, -1), FeatureLocation(6, 8, -1)]), type='CDS'),
+        ])
+
+    def test_unmodified(self):
+        before = pickle.dumps(self.record)
+        for schema in serialize.schemas.values():
+            schema(self.record)
+            schema((self.record.features, map(str, range(3))))
+        serialize.text([self.record.annotations, self.record.features[0].qualifiers])
+        self.assertEqual(before, pickle.dumps(self.record))
+
+    def test_schema1(self):
+        record = serialize.schemas[1](self.record)
+        self.assertListEqual(['id', 'name', 'description', 'dbxrefs', 'annotations', '_per_letter_annotations',
+                              'features', 'seq'], list(record))
+        self.assertEqual('ACGTACGTAC', record['seq'])
+        self.assertEqual(123, record['annotations']['gi'])
+        self.assertDictEqual({'_length': 10}, record['_per_letter_annotations'])
+        gene, cds = record['features']
+        self.assertDictEqual({'ref': None, 'ref_db': None, 'start': '<0', 'end': 4, 'strand': 1}, gene['location'])
+        self.assertDictEqual({'locus_tag': ['L_0001'], 'codon_start': [1]}, gene['qualifiers'])
+        self.assertEqual('join', cds['location']['operator'])
+        self.assertListEqual([6, 8], [cds['location']['parts'][1]['start'], cds['location']['parts'][1]['end']])
+        self.assertListEqual([[1, 2, 'x'], [3, '']], serialize.schemas[1]([('1', '+2', 'x'), (s for s in [' 3 ', ''])]))
+
+    def test_schema2(self):
+        record = serialize.schemas[2](self.record)
+        self.assertListEqual(['id', 'name', 'description', 'dbxrefs', 'annotations', 'letter_annotations',
+                              'features', 'seq'], list(record))
+        self.assertEqual('0123', record['annotations']['gi'])
+        self.assertDictEqual({}, record['letter_annotations'])
+        gene = record['features'][0]
+        self.assertDictEqual({'start': '<0', 'end': 4, 'strand': 1, 'ref': None, 'ref_db': None}, gene['location'])
+        self.assertDictEqual({'locus_tag': ['L_0001'], 'codon_start': ['1']}, gene['qualifiers'])
+
+    def test_text(self):
+        self.assertListEqual([{'a': ['1', 'None']}, 'ACGT'], serialize.text(({'a': (1, None)}, Seq('ACGT'))))
+
+    def test_undefined(self):
+        record = next(SeqIO.parse('test-data/no_seq.gbff', 'genbank'))
+        for schema in serialize.schemas.values():
+            with self.assertRaises(UndefinedSequenceError):
+                schema(record)
+
+    def test_spilled(self):
+        from biopython_convert import JMESPathGen
+        values = [{'id': str(i), 'seq': 'ACGT' * i} for i in range(20)]
+        spilled = JMESPathGen.SpillList((value for value in values), 100)
+        self.addCleanup(spilled.close)
+        self.assertLess(0, spilled.spilled)
+        for schema in serialize.schemas.values():
+            self.assertListEqual([20, schema(values)], schema([len(spilled), spilled]))
+        self.assertListEqual(serialize.text(values), serialize.text(spilled))
@@ -0,0 +1,139 @@
+import io
+import os
+import json
+import stat
+import socket
+import threading
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from biopython_convert import serve, convert
+
+input_path = Path('test-data/no_seq.gbff')
+
+
+class TestServe(TestCase):
+    def setUp(self) -> None:
+        self.workdir = TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.dir = Path(self.workdir.name)
+        self.socket_path = self.dir / 'daemon.sock'
+
+    def start(self) -> serve.Server:
+        server = serve.Server(self.socket_path, 1)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            thread.join()
+            server.server_close()
+        self.addCleanup(stop)
+        return server
+
+    def test_request(self):
+        """
+        Outputs and stats are the same as converting locally
+        """
+        self.start()
+        expected, expected_stats = self.dir / 'expected.gff3', io.StringIO()
+        convert(input_path, 'genbank', expected, 'gff3', jpath='[?id]', stats=expected_stats)
+        for _ in range(2):
+            output = self.dir / 'output.gff3'
+            response = serve.request(self.socket_path, dict(input_path=input_path, input_type='genbank',
+                                                            output_path=output, output_type='gff3', jpath='[?id]',
+                                                            stats=True))
+            self.assertEqual('ok', response['status'], response['error'])
+            self.assertEqual(expected.read_text(), output.read_text())
+            self.assertEqual(expected_stats.getvalue(), response['stats'])
+
+    def test_failure(self):
+        self.start()
+        response = serve.request(self.socket_path, dict(input_path=self.dir / 'missing', input_type='genbank',
+                                                        output_path=self.dir / 'output', output_type='fasta'))
+        self.assertEqual('failed', response['status'])
+        self.assertIn('FileNotFoundError', response['error'])
+        response = serve.request(self.socket_path, dict(input_path=input_path, input_type='genbank',
+                                                        output_path=self.dir / 'output', output_type='fasta',
+                                                        jpath='[?'))
+        self.assertEqual('failed', response['status'])
+        # The connection survives bad requests
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(str(self.socket_path))
+            handle = client.makefile('rwb')
+            handle.write(b'not json\n{"protocol": 0}\n')
+            handle.flush()
+            self.assertEqual('failed', json.loads(handle.readline())['status'])
+            self.assertEqual('unsupported', json.loads(handle.readline())['status'])
+            handle.close()
+
+    def test_warnings(self):
+        self.start()
+        response = serve.request(self.socket_path, dict(input_path=input_path, input_type='genbank',
+                                                        output_path=self.dir / 'output', output_type='fasta',
+                                                        jpath='[0]'))
+        self.assertEqual('ok', response['status'], response['error'])
+        self.assertTrue(any('MaterializationWarning' in w for w in response['warnings']))
+
+    def test_fallback(self):
+        """
+        Without a daemon the conversion runs locally, and a stale socket does not stop a new daemon
+        """
+        self.assertIsNone(serve.request(self.socket_path, {}))
+        output = self.dir / 'output.embl'
+        self.assertEqual(0, serve.client_main(self.socket_path, input_path, 'genbank', output, 'embl'))
+        expected = self.dir / 'expected.embl'
+        convert(input_path, 'genbank', expected, 'embl')
+        self.assertEqual(expected.read_text(), output.read_text())
+
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(str(self.socket_path))
+        stale.close()
+        self.start()
+        with self.assertRaises(OSError):
+            serve.Server(self.socket_path)
+
+    def test_other_user(self):
+        """
+        Conversions are not sent to a socket of another user, or to a path that is not a socket
+        """
+        server = self.start()
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(self.socket_path).st_mode))
+        output = self.dir / 'output.embl'
+        with patch.object(server, 'submit') as submit, patch('os.getuid', return_value=os.getuid() + 1):
+            self.assertIsNone(serve.request(self.socket_path, dict(input_path=input_path, input_type='genbank',
+                                                                   output_path=output, output_type='embl')))
+            self.assertEqual(0, serve.client_main(self.socket_path, input_path, 'genbank', output, 'embl'))
+            submit.assert_not_called()
+        self.assertTrue(output.exists())
+        regular = self.dir / 'regular'
+        regular.touch()
+        self.assertIsNone(serve.request(regular, {}))
+
+    def test_private_directory(self):
+        with patch('tempfile.gettempdir', return_value=str(self.dir)), patch.dict(os.environ, clear=True):
+            path = serve.default_socket_path()
+            self.assertEqual(self.dir, path.parent.parent)
+            with serve.Server(path):
+                self.assertEqual(0o700, stat.S_IMODE(os.stat(path.parent).st_mode))
+            path.parent.chmod(0o755)
+            with self.assertRaises(OSError):
+                serve.Server(path)
+
+    def test_arguments(self):
+        """
+        The daemon is started with -j workers, and not at all if arguments are invalid
+        """
+        from biopython_convert import __main__
+        with patch.object(serve, 'serve') as daemon, patch('sys.argv', ['biopython.convert', '--serve', '-j', '3']):
+            __main__.main()
+            daemon.assert_called_once_with(None, 3)
+        with patch.object(serve, 'serve') as daemon, \
+                patch('sys.argv', ['biopython.convert', '--serve', '--query-memory', '0']), \
+                patch('sys.stderr', io.StringIO()) as stderr, self.assertRaises(SystemExit) as exited:
+            __main__.main()
+        self.assertEqual(1, exited.exception.code)
+        daemon.assert_not_called()
+        self.assertIn('--query-memory', stderr.getvalue())
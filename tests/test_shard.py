@@ -0,0 +1,51 @@
+import io
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+from pathlib import Path
+
+from biopython_convert import convert, shard
+
+
+class TestShard(TestCase):
+    noseq_path = Path('test-data/no_seq.gbff')
+
+    def setUp(self) -> None:
+        self.workdir = TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.workdir.cleanup()
+
+    def test_boundaries(self):
+        offsets = shard.boundaries(self.noseq_path, 'genbank', 8)
+        self.assertEqual(0, offsets[0])
+        self.assertEqual(self.noseq_path.stat().st_size, offsets[-1])
+        self.assertListEqual(sorted(set(offsets)), offsets)
+        with self.noseq_path.open('rb') as handle:
+            for offset in offsets[:-1]:
+                handle.seek(offset)
+                self.assertEqual(b'LOCUS ', handle.read(6))
+
+    def test_supported(self):
+        self.assertTrue(shard.supported(self.noseq_path, 'genbank', 'embl'))
+        self.assertTrue(shard.supported(self.noseq_path, 'genbank', 'gff3', '{id: id}', True))
+        self.assertFalse(shard.supported(self.noseq_path, 'genbank', 'gff3', '[0]'))
+        self.assertFalse(shard.supported(self.noseq_path, 'genbank', 'json'))
+        self.assertFalse(shard.supported(self.noseq_path, 'fastq', 'fasta'))
+
+    def test_convert(self):
+        serial_path = Path(self.workdir.name, 'serial')
+        sharded_path = Path(self.workdir.name, 'sharded')
+        serial_stats = io.StringIO()
+        sharded_stats = io.StringIO()
+        convert(self.noseq_path, 'genbank', serial_path, 'gff3', stats=serial_stats)
+        convert(self.noseq_path, 'genbank', sharded_path, 'gff3', stats=sharded_stats, jobs=2)
+        self.assertEqual(serial_path.read_bytes(), sharded_path.read_bytes())
+        self.assertEqual(serial_stats.getvalue(), sharded_stats.getvalue())
+
+    def test_convert_jsonl(self):
+        serial_path = Path(self.workdir.name, 'serial')
+        sharded_path = Path(self.workdir.name, 'sharded')
+        convert(self.noseq_path, 'genbank', serial_path, 'ndjson', jpath='{id: id, features: length(features)}', per_record=True)
+        convert(self.noseq_path, 'genbank', sharded_path, 'ndjson', jpath='{id: id, features: length(features)}', per_record=True, jobs=2)
+        self.assertEqual(serial_path.read_bytes(), sharded_path.read_bytes())
+        self.assertEqual(2, len(sharded_path.read_bytes().splitlines()))
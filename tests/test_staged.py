@@ -0,0 +1,49 @@
+import io
+from unittest import TestCase
+from unittest.mock import patch
+from tempfile import TemporaryDirectory
+from pathlib import Path
+
+from Bio import SeqIO
+
+from biopython_convert import convert, staged, _jmespath_options
+
+
+class TestStaged(TestCase):
+    noseq_path = Path('test-data/no_seq.gbff')
+
+    def setUp(self) -> None:
+        self.workdir = TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.dir = Path(self.workdir.name)
+
+    def test_header_filter(self):
+        self.assertIsNotNone(staged.header_filter("[?id=='NC_011352.1']", 'genbank'))
+        self.assertIsNotNone(staged.header_filter("[?annotations.organism=='x'].features", 'embl'))
+        self.assertIsNone(staged.header_filter("[?id=='NC_011352.1']", 'fasta'))
+        self.assertIsNone(staged.header_filter("[?length(features) > `100`]", 'genbank'))
+        self.assertIsNone(staged.header_filter("[?annotations.contig]", 'genbank'))
+
+    def test_parse(self):
+        for input_type in ('genbank', 'embl'):
+            path = self.dir / f"input.{input_type}"
+            SeqIO.convert(str(self.noseq_path), 'genbank', str(path), input_type)
+            expected = [r for r in SeqIO.parse(str(path), input_type) if r.id == 'NC_011352.1']
+            keep = staged.header_filter("[?id=='NC_011352.1']", input_type, _jmespath_options())
+            with path.open() as handle:
+                records = list(staged.parse(handle, input_type, keep))
+            self.assertEqual([r.id for r in expected], [r.id for r in records], input_type)
+            self.assertEqual(len(expected[0].features), len(records[0].features), input_type)
+            self.assertEqual(expected[0].annotations, records[0].annotations, input_type)
+
+    def test_skipped(self):
+        """
+        Rejected records are not fully parsed
+        """
+        read = staged._read
+        with patch.object(staged, '_read', side_effect=read) as mock:
+            output_path = self.dir / 'output.txt'
+            convert(self.noseq_path, 'genbank', output_path, 'text', jpath="[?name=='NC_011352'].id")
+            # Two headers and one whole record
+            self.assertEqual(3, mock.call_count)
+            self.assertEqual('NC_011352.1', output_path.read_text().strip())
@@ -0,0 +1,74 @@
+import sys
+import subprocess
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+# Budgets for a cold start, raise them deliberately if an import is worth its cost
+seconds_budget = 0.1
+modules_budget = 100
+
+# Only imported when the conversion needs them
+heavy_packages = {'Bio', 'gffutils', 'jmespath', 'numpy', 'ruamel', 'pyarrow', 'zstandard'}
+
+_measure = """
+import sys, time, runpy
+before = set(sys.modules)
+start = time.perf_counter()
+sys.argv = ['biopython.convert'] + sys.argv[1:]
+try:
+    {}
+except SystemExit:
+    pass
+print(time.perf_counter() - start)
+print(' '.join(sorted(set(sys.modules) - before)))
+"""
+
+
+def measure(statement: str, *args) -> tuple:
+    """
+    Run a statement in a fresh interpreter
+    :param statement: statement to time
+    :param args: command line arguments available to the statement
+    :return: (seconds, set of modules imported by the statement)
+    """
+    result = subprocess.run([sys.executable, '-c', _measure.format(statement), *args], capture_output=True, text=True,
+                            check=True, cwd=Path(__file__).parent.parent)
+    seconds, modules = result.stdout.splitlines()[-2:]
+    return float(seconds), set(modules.split())
+
+
+def packages(modules: set) -> set:
+    return {module.split('.')[0] for module in modules}
+
+
+class TestStartup(TestCase):
+    def test_import(self):
+        seconds, modules = min(measure('import biopython_convert') for _ in range(3))
+        self.assertFalse(packages(modules) & heavy_packages)
+        self.assertLessEqual(len(modules), modules_budget)
+        self.assertLessEqual(seconds, seconds_budget)
+
+    def test_usage(self):
+        seconds, modules = min(measure("runpy.run_module('biopython_convert', run_name='__main__')") for _ in range(3))
+        self.assertFalse(packages(modules) & heavy_packages)
+        self.assertLessEqual(len(modules), modules_budget)
+        self.assertLessEqual(seconds, seconds_budget)
+
+    def test_convert(self):
+        """
+        Conversions only import what they use
+        """
+        with TemporaryDirectory() as workdir:
+            input_path = Path(workdir, 'input.fasta')
+            input_path.write_text(">a\nACGT\n")
+            _, modules = measure("runpy.run_module('biopython_convert', run_name='__main__')", str(input_path), 'fasta',
+                                 str(Path(workdir, 'output.tab')), 'tab')
+            self.assertEqual('a\tACGT\n', Path(workdir, 'output.tab').read_text())
+            self.assertIn('Bio', packages(modules))
+            self.assertFalse(packages(modules) & {'gffutils', 'jmespath', 'ruamel', 'pyarrow'})
+            # FASTA to FASTA does not parse records
+            _, modules = measure("runpy.run_module('biopython_convert', run_name='__main__')", str(input_path), 'fasta',
+                                 str(Path(workdir, 'output.fasta')), 'fasta')
+            self.assertEqual('>a\nACGT\n', Path(workdir, 'output.fasta').read_text())
+            self.assertFalse(packages(modules) & heavy_packages)
@@ -0,0 +1,77 @@
+import io
+import gzip
+import importlib.util
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, skipIf, skipUnless
+
+from Bio import StreamModeError
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+from Bio.SeqFeature import SeqFeature, FeatureLocation, CompoundLocation
+
+from biopython_convert import table, convert
+
+
+class TestFeatureTable(TestCase):
+    def setUp(self) -> None:
+        self.records = [SeqRecord(Seq(None, 100), id='rec.1', features=[
+            SeqFeature(FeatureLocation(0, 40, 1), type='gene', qualifiers={'locus_tag': ['L_1'], 'gene': ['abc']}),
+            SeqFeature(CompoundLocation([FeatureLocation(60, 70, -1), FeatureLocation(10, 20, -1)]), type='CDS',
+                       qualifiers={'locus_tag': ['L_2'], 'product': ['hypothetical\tprotein'], 'gene': ['a', 'b']}),
+        ])]
+
+    def test_rows(self):
+        self.assertListEqual([
+            ('rec.1', 'gene', 0, 40, 1, 0, 'L_1', 'abc', None),
+            ('rec.1', 'CDS', 60, 70, -1, 0, 'L_2', 'a|b', 'hypothetical\tprotein'),
+            ('rec.1', 'CDS', 10, 20, -1, 1, 'L_2', 'a|b', 'hypothetical\tprotein'),
+        ], list(table.rows(self.records)))
+
+    def test_batches(self):
+        self.assertListEqual([2, 1], list(map(len, table.batches(self.records, size=2))))
+
+    def test_tsv(self):
+        output = io.StringIO()
+        table.tsv_writer(self.records, output, 'features-tsv', ('product',))
+        self.assertEqual(
+            "seqid\ttype\tstart\tend\tstrand\tpart\tproduct\n"
+            "rec.1\tgene\t0\t40\t1\t0\t\n"
+            "rec.1\tCDS\t60\t70\t-1\t0\thypothetical protein\n"
+            "rec.1\tCDS\t10\t20\t-1\t1\thypothetical protein\n",
+            output.getvalue()
+        )
+
+    @skipUnless(importlib.util.find_spec('pyarrow'), "requires pyarrow")
+    def test_arrow(self):
+        import pyarrow.ipc
+        import pyarrow.parquet
+        with TemporaryDirectory() as workdir:
+            for output_type, read in (('features-arrow', lambda p: pyarrow.ipc.open_file(p).read_all()),
+                                      ('features-parquet', pyarrow.parquet.read_table)):
+                output_path = Path(workdir, output_type)
+                convert(Path('test-data/no_seq.gbff'), 'genbank', output_path, output_type, qualifiers=('locus_tag',))
+                result = read(str(output_path))
+                self.assertListEqual(table.columns + ['locus_tag'], result.column_names)
+                self.assertEqual(5872, result.num_rows)
+                self.assertDictEqual({'seqid': 'NC_014334.1', 'type': 'gene', 'start': 0, 'end': 1350, 'strand': 1,
+                                      'part': 0, 'locus_tag': 'LCAZH_0001'}, result.slice(1, 1).to_pylist()[0])
+            output_path = Path(workdir, 'features.arrow.gz')
+            convert(Path('test-data/no_seq.gbff'), 'genbank', output_path, 'features-arrow', compress='gzip')
+            with gzip.open(output_path) as handle:
+                self.assertEqual(5872, pyarrow.ipc.open_file(pyarrow.py_buffer(handle.read())).read_all().num_rows)
+
+    def test_arrow_text(self):
+        with self.assertRaises(StreamModeError):
+            table.arrow_writer(self.records, io.StringIO(), 'features-arrow')
+
+    @skipIf(importlib.util.find_spec('pyarrow'), "requires pyarrow to be missing")
+    def test_arrow_missing(self):
+        """
+        Compressed output, where the handle mode is not a string, reports the missing dependency
+        """
+        with TemporaryDirectory() as workdir:
+            for output_type in ('features-arrow', 'features-parquet'):
+                with self.assertRaisesRegex(ImportError, 'requires pyarrow'):
+                    convert(Path('test-data/no_seq.gbff'), 'genbank', Path(workdir, output_type), output_type,
+                            compress='gzip')